@@ -44,16 +44,8 @@ module.exports = {
           }
         };
 
-        // Add compression
-        const CompressionPlugin = require('compression-webpack-plugin');
-        webpackConfig.plugins.push(
-          new CompressionPlugin({
-            algorithm: 'gzip',
-            test: /\.(js|css|html|svg)$/,
-            threshold: 8192,
-            minRatio: 0.8
-          })
-        );
+        // Brotli/gzip variants are produced by the deploy pipeline
+        // (deployment/scripts/precompress.py), not by webpack
       }
 
       // Development optimizations
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Offline Upload Benchmark
+========================
+
+Measures how the deploy upload path scales without touching AWS. Synthetic
+build trees shaped like a Create React App ``build/`` (hashed JS/CSS chunks
+with source maps, media, a few top-level files) are generated for each size
+and uploaded to a local S3-compatible stand-in: a ``moto`` server started on
+a free port, or any endpoint given with ``--endpoint-url`` (e.g. MinIO).
+
+A scenario is one (objects, strategy, concurrency) combination. Strategies:
+
+- ``release``: ``ReleaseManager.publish`` (what deploy.py does); files
+  already held by the live release are reused, nothing is copied
+- ``sync``: ``DeltaUploader.upload`` at the bucket root against the stored
+  manifest (the pre-release upload path)
+
+Every scenario runs in its own worker process against a fresh bucket, so the
+reported peak memory belongs to that scenario alone. Phases:
+
+- ``hash``:  build the manifest of the tree (cold, no digest cache)
+- ``full``:  first upload, every object is new
+- ``delta``: about 1% of the files rewritten, uploaded again
+- ``noop``:  the same tree once more, nothing to transfer
+
+Each phase reports files/s, MB/s and the S3 requests sent by operation.
+Results are written as JSON; ``--compare`` checks them against an earlier
+run and exits non-zero when a phase got slower than the threshold allows.
+
+Usage:
+    python deployment/benchmarks/bench_upload.py [--sizes 1000,10000,100000] [--strategies release,sync]
+                                                 [--concurrency 16] [--endpoint-url URL] [--output FILE]
+                                                 [--compare BASELINE.json] [--regression-threshold 0.25]
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+DEPLOYMENT_DIR = BENCHMARKS_DIR.parent
+sys.path.insert(0, str(DEPLOYMENT_DIR / "scripts"))
+
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    stream=sys.stderr
+)
+logger = logging.getLogger("bench_upload")
+
+KB = 1024
+MB = 1024 * KB
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = [1000, 10000, 100000]
+STRATEGIES = ["release", "sync"]
+REGION = "us-east-1"
+DELTA_FRACTION = 0.01
+
+# (directory, name suffix, share of objects, median bytes, log-normal sigma), after a CRA build/
+TREE_SHAPE = [
+    ("static/js", ".chunk.js", 0.30, 12 * KB, 1.2),
+    ("static/js", ".chunk.js.map", 0.30, 40 * KB, 1.2),
+    ("static/js", ".chunk.js.LICENSE.txt", 0.05, 1 * KB, 0.5),
+    ("static/css", ".chunk.css", 0.10, 4 * KB, 1.0),
+    ("static/css", ".chunk.css.map", 0.10, 10 * KB, 1.0),
+    ("static/media", ".svg", 0.08, 3 * KB, 1.0),
+    ("static/media", ".png", 0.05, 30 * KB, 1.3),
+    ("static/media", ".woff2", 0.02, 25 * KB, 0.4),
+]
+TOP_LEVEL_FILES = {
+    "index.html": 3 * KB,
+    "asset-manifest.json": 8 * KB,
+    "manifest.json": 1 * KB,
+    "robots.txt": 100,
+    "favicon.ico": 4 * KB,
+    "sw.js": 2 * KB,
+}
+MAX_OBJECT_SIZE = 4 * MB
+# Shared filler so generating a large tree is bounded by disk speed, not the RNG
+FILLER = random.Random(0).getrandbits(8 * MAX_OBJECT_SIZE).to_bytes(MAX_OBJECT_SIZE, "little")
+
+
+def tree_files(objects: int, seed: int, size_scale: float) -> Dict[str, int]:
+    """Relative path -> size of a synthetic CRA build tree with the given number of objects"""
+    rng = random.Random(seed)
+    files = dict(TOP_LEVEL_FILES)
+    weights = [shape[2] for shape in TREE_SHAPE]
+    while len(files) < objects:
+        directory, suffix, _, median, sigma = rng.choices(TREE_SHAPE, weights)[0]
+        size = min(MAX_OBJECT_SIZE, max(64, int(rng.lognormvariate(math.log(median), sigma) * size_scale)))
+        files[f"{directory}/{len(files)}.{rng.getrandbits(32):08x}{suffix}"] = size
+    return files
+
+
+def write_file(path: Path, size: int, marker: str) -> None:
+    header = f"{marker}\n".encode()
+    offset = zlib.crc32(path.name.encode()) % (MAX_OBJECT_SIZE - size + 1)
+    with open(path, "wb") as f:
+        f.write(header[:size])
+        f.write(FILLER[offset:offset + max(0, size - len(header))])
+
+
+def generate_tree(work_dir: Path, objects: int, seed: int, size_scale: float) -> Path:
+    """Create (or reuse) a synthetic build tree and return its directory"""
+    root = work_dir / f"tree-{objects}-{seed}-{size_scale:g}"
+    build_dir = root / "build"
+    complete = root / "complete.json"
+    if complete.exists():
+        return build_dir
+
+    files = tree_files(objects, seed, size_scale)
+    logger.warning(f"Generating {objects} objects ({sum(files.values()) / MB:.1f} MB) in {build_dir}")
+    for relative, size in files.items():
+        path = build_dir / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_file(path, size, relative)
+    complete.write_text(json.dumps({"objects": len(files), "bytes": sum(files.values())}), encoding="utf-8")
+    return build_dir
+
+
+def rewrite_fraction(build_dir: Path, fraction: float) -> int:
+    """Change the content (not the size) of every 1/fraction-th file; returns how many"""
+    paths = sorted(p for p in build_dir.rglob("*") if p.is_file())
+    step = max(1, round(1 / fraction))
+    token = uuid.uuid4().hex
+    for path in paths[::step]:
+        write_file(path, path.stat().st_size, f"{path.name}:{token}")
+    return len(paths[::step])
+
+
+class RequestCounter:
+    """Count S3 requests actually sent, by operation (retries included)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Counter = Counter()
+
+    def __call__(self, event_name: str, **kwargs) -> None:
+        with self._lock:
+            self.counts[event_name.rsplit(".", 1)[-1]] += 1
+
+    def take(self) -> Dict[str, int]:
+        with self._lock:
+            counts, self.counts = dict(self.counts), Counter()
+        return counts
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (MB if sys.platform == "darwin" else KB), 1)
+
+
+def run_scenario(scenario: Dict[str, Any]) -> Dict[str, Any]:
+    """Run every phase of one scenario (inside a worker process)"""
+    from hashing import FileHasher
+    from manifest import DeltaUploader, build_manifest
+    from releases import ReleaseManager
+    from transfer import FileTransfer, TransferEngine
+
+    build_dir = Path(scenario["build_dir"])
+    engine = TransferEngine(max_concurrency=scenario["concurrency"], region_name=REGION)
+    counter = RequestCounter()
+    engine.s3.meta.events.register("before-send.s3", counter)
+
+    bucket_name = f"bench-{scenario['objects']}-{scenario['strategy']}-{uuid.uuid4().hex[:8]}"
+    engine.s3.create_bucket(Bucket=bucket_name)
+    counter.take()
+
+    releases = ReleaseManager(engine, bucket_name)
+    uploader = DeltaUploader(engine, bucket_name, build_dir)
+
+    def upload(build_id: str) -> Callable[[], List[FileTransfer]]:
+        if scenario["strategy"] == "release":
+            def publish() -> List[FileTransfer]:
+                result = releases.publish(build_id, build_dir)
+                releases.activate(build_id)
+                return result.transfers
+            return publish
+
+        def delta_upload() -> List[FileTransfer]:
+            uploader.upload()
+            return uploader.transfers
+        return delta_upload
+
+    phases = []
+
+    def measure(name: str, action: Callable[[], List[FileTransfer]]) -> None:
+        start = time.perf_counter()
+        transfers = action()
+        seconds = time.perf_counter() - start
+        uploaded_bytes = sum(transfer.size for transfer in transfers)
+        requests = counter.take()
+        phases.append({
+            "phase": name,
+            "seconds": round(seconds, 3),
+            "files": scenario["tree_objects"],
+            "files_uploaded": len(transfers),
+            "bytes_uploaded": uploaded_bytes,
+            # Files of the tree processed (hashed, diffed, uploaded or copied) per second
+            "files_per_second": round(scenario["tree_objects"] / seconds, 1) if seconds else None,
+            "mb_per_second": round(uploaded_bytes / MB / seconds, 2) if seconds else None,
+            "request_count": sum(requests.values()),
+            "requests": requests,
+        })
+
+    def hash_tree() -> List[FileTransfer]:
+        build_manifest(build_dir, FileHasher())
+        return []
+
+    measure("hash", hash_tree)
+    measure("full", upload("bench-full"))
+    rewrite_fraction(build_dir, DELTA_FRACTION)
+    measure("delta", upload("bench-delta"))
+    measure("noop", upload("bench-delta"))
+
+    return {"scenario": {key: scenario[key] for key in ("objects", "strategy", "concurrency")},
+            "tree_bytes": scenario["tree_bytes"], "peak_rss_mb": peak_rss_mb(), "phases": phases}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_moto_server(timeout: float = 30.0):
+    """Start a local moto S3 server and return (process, endpoint URL)"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-H", "127.0.0.1", "-p", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("moto server exited, install it with: pip install -r deployment/benchmarks/requirements.txt")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"moto server did not start within {timeout:.0f}s")
+
+
+def run_worker(scenario: Dict[str, Any], endpoint_url: str) -> Dict[str, Any]:
+    """Run a scenario in a fresh process pointed at the S3 stand-in"""
+    env = os.environ.copy()
+    # Honoured by botocore >= 1.31 for every S3 client the deploy code creates
+    env["AWS_ENDPOINT_URL_S3"] = endpoint_url
+    env.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    env.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    env["AWS_DEFAULT_REGION"] = REGION
+    result = subprocess.run(
+        [sys.executable, __file__, "--worker", json.dumps(scenario)],
+        env=env, stdout=subprocess.PIPE, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Scenario {scenario['objects']}/{scenario['strategy']}/{scenario['concurrency']} "
+                           f"failed with exit code {result.returncode}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def phase_key(result: Dict[str, Any], phase: Dict[str, Any]) -> tuple:
+    scenario = result["scenario"]
+    return scenario["objects"], scenario["strategy"], scenario["concurrency"], phase["phase"]
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Phases that took longer than baseline * (1 + threshold)"""
+    previous = {phase_key(result, phase): phase for result in baseline["results"] for phase in result["phases"]}
+    regressions = []
+    for result in results["results"]:
+        for phase in result["phases"]:
+            before = previous.get(phase_key(result, phase))
+            if before and before["seconds"] and phase["seconds"] > before["seconds"] * (1 + threshold):
+                objects, strategy, concurrency, name = phase_key(result, phase)
+                regressions.append(
+                    f"{objects} objects / {strategy} / concurrency {concurrency} / {name}: "
+                    f"{before['seconds']:.2f}s -> {phase['seconds']:.2f}s "
+                    f"(+{phase['seconds'] / before['seconds'] - 1:.0%})"
+                )
+    return regressions
+
+
+def format_table(results: Dict[str, Any]) -> str:
+    lines = [f"{'objects':>8} {'strategy':<8} {'conc':>4} {'phase':<6} {'seconds':>8} "
+             f"{'files/s':>9} {'MB/s':>7} {'requests':>8} {'peak MB':>8}"]
+    for result in results["results"]:
+        scenario = result["scenario"]
+        for phase in result["phases"]:
+            lines.append(
+                f"{scenario['objects']:>8} {scenario['strategy']:<8} {scenario['concurrency']:>4} "
+                f"{phase['phase']:<6} {phase['seconds']:>8.2f} {phase['files_per_second'] or 0:>9.1f} "
+                f"{phase['mb_per_second'] or 0:>7.2f} {phase['request_count']:>8} "
+                f"{result['peak_rss_mb'] if result['peak_rss_mb'] is not None else '-':>8}"
+            )
+    return "\n".join(lines)
+
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the deploy upload path against a local S3 stand-in")
+    parser.add_argument("--sizes", type=parse_int_list, default=DEFAULT_SIZES,
+                        help="Comma-separated object counts of the synthetic trees (default: 1000,10000,100000)")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES),
+                        help=f"Comma-separated upload strategies to run ({', '.join(STRATEGIES)})")
+    parser.add_argument("--concurrency", type=parse_int_list, default=[16],
+                        help="Comma-separated transfer concurrency values (default: 16)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the synthetic tree layout")
+    parser.add_argument("--size-scale", type=float, default=1.0,
+                        help="Multiply every synthetic file size, e.g. 0.1 for a quick run")
+    parser.add_argument("--endpoint-url", help="Existing S3-compatible endpoint instead of a moto server")
+    parser.add_argument("--work-dir", type=Path, default=DEPLOYMENT_DIR / ".cache" / "bench-upload",
+                        help="Where synthetic trees are generated and reused")
+    parser.add_argument("--output", type=Path,
+                        help="Results JSON (default: deployment/logs/bench-upload-<timestamp>.json)")
+    parser.add_argument("--compare", type=Path, metavar="BASELINE", help="Earlier results JSON to compare with")
+    parser.add_argument("--regression-threshold", type=float, default=0.25,
+                        help="Flag phases slower than the baseline by more than this fraction (default: 0.25)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_scenario(json.loads(args.worker))))
+        return 0
+
+    strategies = [strategy.strip() for strategy in args.strategies.split(",") if strategy.strip()]
+    unknown = set(strategies) - set(STRATEGIES)
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(sorted(unknown))}")
+
+    server = None
+    endpoint_url = args.endpoint_url
+    if not endpoint_url:
+        server, endpoint_url = start_moto_server()
+
+    results: Dict[str, Any] = {
+        "version": RESULTS_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "revision": None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "endpoint": "moto" if server else endpoint_url,
+        "seed": args.seed,
+        "size_scale": args.size_scale,
+        "results": [],
+    }
+    try:
+        from profiler import current_revision
+        results["revision"] = current_revision(DEPLOYMENT_DIR.parent)
+
+        for objects in args.sizes:
+            build_dir = generate_tree(args.work_dir, objects, args.seed, args.size_scale)
+            tree = json.loads((build_dir.parent / "complete.json").read_text(encoding="utf-8"))
+            for strategy in strategies:
+                for concurrency in args.concurrency:
+                    print(f"Running {objects} objects / {strategy} / concurrency {concurrency}...", flush=True)
+                    results["results"].append(run_worker({
+                        "objects": objects,
+                        "strategy": strategy,
+                        "concurrency": concurrency,
+                        "build_dir": str(build_dir),
+                        "tree_objects": tree["objects"],
+                        "tree_bytes": tree["bytes"],
+                    }, endpoint_url))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    output = args.output or DEPLOYMENT_DIR / "logs" / f"bench-upload-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(format_table(results))
+    print(f"Results written to {output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.regression_threshold)
+        if regressions:
+            print(f"REGRESSION {len(regressions)} phase(s) slower than {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"OK No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Input-Hash Build Cache
+======================
+
+Fingerprints everything that can change the output of ``npm run build`` and
+keeps finished ``build/`` trees in a local cache keyed by that fingerprint.
+When the inputs are identical to a previous build, the tree is restored from
+the cache instead of running ``react-scripts build`` again.
+
+Inputs: ``src/``, ``public/``, ``package.json``, ``package-lock.json``,
+``craco.config.js``, the ``.env`` files CRA reads for a production build plus
+``.env.<environment>``, and every ``REACT_APP_*`` value the build will see.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from hashing import FileHasher
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = "v1"
+INPUT_DIRS = ["src", "public"]
+INPUT_FILES = ["package.json", "package-lock.json", "craco.config.js"]
+# Files CRA loads when NODE_ENV=production
+PRODUCTION_ENV_FILES = [".env", ".env.local", ".env.production", ".env.production.local"]
+
+
+class BuildCache:
+    """Content-addressed cache of build/ trees keyed by an input fingerprint"""
+
+    def __init__(self, project_root: Path, cache_dir: Path, environment: str, max_entries: int = 5,
+                 hasher: Optional[FileHasher] = None):
+        self.project_root = project_root
+        self.cache_dir = cache_dir / CACHE_VERSION
+        self.environment = environment
+        self.max_entries = max_entries
+        self.hasher = hasher or FileHasher()
+
+    def input_files(self) -> List[Path]:
+        """All files that feed into the build, in a stable order"""
+        files = []
+        for name in INPUT_DIRS:
+            directory = self.project_root / name
+            if directory.exists():
+                files.extend(p for p in directory.rglob("*") if p.is_file())
+
+        env_files = PRODUCTION_ENV_FILES + [f".env.{self.environment}"]
+        for name in INPUT_FILES + env_files:
+            path = self.project_root / name
+            if path.is_file():
+                files.append(path)
+
+        return sorted(set(files))
+
+    def fingerprint(self, build_env: Dict[str, str]) -> str:
+        """Hash the build inputs and the REACT_APP_* environment"""
+        digest = hashlib.sha256(f"build-cache:{CACHE_VERSION}\n".encode())
+
+        files = self.input_files()
+        digests = self.hasher.hash_files(files)
+        self.hasher.save()
+        for path in files:
+            relative = path.relative_to(self.project_root).as_posix()
+            digest.update(f"file:{relative}:{digests[str(path)].sha256}\n".encode())
+
+        for name in sorted(build_env):
+            if name.startswith("REACT_APP_") or name in ("NODE_ENV", "PUBLIC_URL", "GENERATE_SOURCEMAP"):
+                digest.update(f"env:{name}={build_env[name]}\n".encode())
+
+        return digest.hexdigest()
+
+    def archive_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.tar"
+
+    def restore(self, key: str, build_dir: Path) -> bool:
+        """Replace build_dir with the cached tree for key; return False on a miss"""
+        archive = self.archive_path(key)
+        if not archive.exists():
+            return False
+
+        if build_dir.exists():
+            shutil.rmtree(build_dir)
+        build_dir.mkdir(parents=True)
+        with tarfile.open(archive) as tar:
+            if hasattr(tarfile, "data_filter"):
+                tar.extractall(build_dir, filter="data")
+            else:
+                tar.extractall(build_dir)
+
+        # Touch so pruning keeps recently used entries
+        os.utime(archive)
+        return True
+
+    def store(self, key: str, build_dir: Path) -> None:
+        """Archive build_dir under key and prune old entries"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-", suffix=".tar")
+        os.close(fd)
+        try:
+            with tarfile.open(tmp_path, "w") as tar:
+                for path in sorted(build_dir.rglob("*")):
+                    tar.add(path, arcname=path.relative_to(build_dir).as_posix(), recursive=False)
+            os.replace(tmp_path, self.archive_path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.prune()
+
+    def prune(self) -> None:
+        """Remove the least recently used archives beyond max_entries"""
+        archives = sorted(self.cache_dir.glob("*.tar"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for archive in archives[self.max_entries:]:
+            logger.debug(f"Pruning cached build {archive.name}")
+            archive.unlink()
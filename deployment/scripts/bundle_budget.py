@@ -0,0 +1,285 @@
+"""
+Bundle Size Budget Gate
+=======================
+
+Reads ``build/asset-manifest.json`` after the build and measures every JS
+and CSS chunk (``vendors``, ``ai-components``, ``comparison-components``,
+``main`` and the lazily loaded pages, see craco.config.js) raw, gzip and
+Brotli. The compressed sizes come from the variants written by the
+precompression stage. Each chunk's source map is decoded to attribute its
+bytes to the source modules inside it; ``node_modules`` files are grouped by
+package. Compressed module sizes are the module's share of the chunk's
+compressed size. Chunks without a source map (the .env files build with
+``GENERATE_SOURCEMAP=false``) are measured as a whole and listed as
+unattributed, with a warning.
+
+The report is checked against the per-chunk budgets in
+``deployment/bundle-budgets.json`` and against the report stored with the
+live release. A chunk that grew beyond the allowed threshold fails the
+deploy, with a list of the modules that grew.
+"""
+
+import gzip
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import brotli
+
+from errors import DeploymentError
+from precompress import BROTLI_QUALITY, ENCODING_SUFFIXES, GZIP_LEVEL
+
+logger = logging.getLogger(__name__)
+
+ASSET_MANIFEST = "asset-manifest.json"
+REPORT_KEY = ".bundle-report.json"
+REPORT_VERSION = 1
+
+SIZE_FIELDS = ("raw", "gzip", "brotli")
+UNMAPPED = "[unmapped]"
+# Modules listed per grown chunk
+MAX_GROWTH_LINES = 10
+
+# static/js/vendors.3f2a9c1d.chunk.js -> vendors.js, static/js/787.0b1c2d3e.chunk.js -> 787.js
+CHUNK_FILE = re.compile(r"^(?:.*/)?(?P<name>[^/]+?)(?:\.[0-9a-f]{8,})?(?:\.chunk)?\.(?P<ext>js|css)$")
+VLQ_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+VLQ_VALUES = {char: value for value, char in enumerate(VLQ_CHARS)}
+
+
+def chunk_id(path: str) -> Optional[str]:
+    """Stable chunk name of a hashed JS/CSS file, e.g. "vendors.js" """
+    match = CHUNK_FILE.match(path)
+    if not match:
+        return None
+    return f"{match.group('name')}.{match.group('ext')}"
+
+
+def build_path(url: str) -> str:
+    """Build-relative path of an asset-manifest URL (drops PUBLIC_URL)"""
+    if "/static/" in url:
+        return "static/" + url.split("/static/", 1)[1]
+    return url.lstrip("/")
+
+
+def module_name(source: str) -> str:
+    """Readable module name of a source map entry; node_modules are grouped by package"""
+    path = re.sub(r"^webpack://[^/]*/", "", source)
+    path = re.sub(r"^(\./)+", "", path).split("?", 1)[0]
+    if "node_modules/" in path:
+        parts = path.rsplit("node_modules/", 1)[1].split("/")
+        package = "/".join(parts[:2]) if parts[0].startswith("@") else parts[0]
+        return f"node_modules/{package}"
+    return path
+
+
+def decode_mappings(mappings: str) -> Iterator[Tuple[int, int, Optional[int]]]:
+    """Yield (generated line, generated column, source index or None) for each segment"""
+    source = 0
+    for line_number, line in enumerate(mappings.split(";")):
+        column = 0
+        for segment in line.split(","):
+            if not segment:
+                continue
+            fields = []
+            value = shift = 0
+            for char in segment:
+                digit = VLQ_VALUES[char]
+                value += (digit & 31) << shift
+                if digit & 32:
+                    shift += 5
+                else:
+                    fields.append(-(value >> 1) if value & 1 else value >> 1)
+                    value = shift = 0
+            column += fields[0]
+            if len(fields) > 1:
+                source += fields[1]
+                yield line_number, column, source
+            else:
+                yield line_number, column, None
+
+
+def attribute_bytes(code: str, source_map: Dict) -> Dict[str, int]:
+    """Generated bytes per module, following the segments of the source map"""
+    sources = [module_name(source) for source in source_map.get("sources", [])]
+    lines = code.split("\n")
+    sizes: Dict[str, int] = {}
+
+    def add(name: str, line: str, start: int, end: int) -> None:
+        if end > start:
+            size = end - start if line.isascii() else len(line[start:end].encode("utf-8"))
+            sizes[name] = sizes.get(name, 0) + size
+
+    segments: Dict[int, List[Tuple[int, Optional[int]]]] = {}
+    for line_number, column, source in decode_mappings(source_map.get("mappings", "")):
+        segments.setdefault(line_number, []).append((column, source))
+
+    for line_number, line in enumerate(lines):
+        previous_column, previous_source = 0, None
+        for column, source in sorted(segments.get(line_number, [])):
+            add(sources[previous_source] if previous_source is not None else UNMAPPED, line, previous_column, column)
+            previous_column, previous_source = column, source
+        add(sources[previous_source] if previous_source is not None else UNMAPPED, line, previous_column, len(line))
+    # Newlines between lines
+    if len(lines) > 1:
+        sizes[UNMAPPED] = sizes.get(UNMAPPED, 0) + len(lines) - 1
+    return sizes
+
+
+class BundleAnalyzer:
+    """Measure the chunks listed in the build's asset manifest"""
+
+    def __init__(self, build_dir: Path):
+        self.build_dir = build_dir
+
+    def chunk_files(self) -> Dict[str, str]:
+        """Chunk name -> build-relative file for every JS/CSS chunk"""
+        manifest_path = self.build_dir / ASSET_MANIFEST
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            raise DeploymentError(f"{ASSET_MANIFEST} not found in {self.build_dir}, cannot check bundle sizes")
+        chunks = {}
+        for url in manifest.get("files", {}).values():
+            path = build_path(url)
+            name = chunk_id(path)
+            if name and (self.build_dir / path).is_file():
+                chunks[name] = path
+        return chunks
+
+    def compressed_size(self, path: Path, data: bytes, encoding: str) -> int:
+        variant = Path(f"{path}{ENCODING_SUFFIXES[encoding]}")
+        if variant.is_file():
+            return variant.stat().st_size
+        if encoding == "br":
+            return len(brotli.compress(data, quality=BROTLI_QUALITY))
+        return len(gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0))
+
+    def measure_chunk(self, relative: str) -> Dict:
+        path = self.build_dir / relative
+        data = path.read_bytes()
+        chunk = {
+            "file": relative,
+            "raw": len(data),
+            "gzip": self.compressed_size(path, data, "gzip"),
+            "brotli": self.compressed_size(path, data, "br"),
+            "modules": {},
+        }
+
+        map_path = Path(f"{path}.map")
+        if not map_path.is_file():
+            logger.debug(f"No source map for {relative}, module sizes unavailable")
+            return chunk
+        try:
+            source_map = json.loads(map_path.read_text(encoding="utf-8"))
+            raw_sizes = attribute_bytes(data.decode("utf-8"), source_map)
+        except (ValueError, KeyError, IndexError) as e:
+            logger.warning(f"Could not read source map {map_path.name}: {e}")
+            return chunk
+
+        total = sum(raw_sizes.values()) or 1
+        chunk["modules"] = {
+            name: {
+                "raw": size,
+                "gzip": round(size * chunk["gzip"] / total),
+                "brotli": round(size * chunk["brotli"] / total),
+            }
+            for name, size in sorted(raw_sizes.items(), key=lambda item: item[1], reverse=True)
+        }
+        return chunk
+
+    def analyze(self, build_id: Optional[str] = None) -> Dict:
+        """Size report of every chunk and the modules inside it"""
+        chunks = {name: self.measure_chunk(path) for name, path in sorted(self.chunk_files().items())}
+        unattributed = [name for name, chunk in chunks.items() if not chunk["modules"]]
+        if unattributed:
+            logger.warning(f"Module attribution unavailable for {len(unattributed)} of {len(chunks)} chunk(s): "
+                           f"no source maps in the build (GENERATE_SOURCEMAP=false)")
+        return {
+            "version": REPORT_VERSION,
+            "build_id": build_id,
+            "chunks": chunks,
+            "unattributed": unattributed,
+        }
+
+
+def load_budgets(path: Path) -> Dict:
+    """Budget configuration; an empty one when the file does not exist"""
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        logger.warning(f"No bundle budgets at {path}, only checking growth against the previous release")
+        return {}
+
+
+def budget_for(budgets: Dict, name: str) -> Dict[str, int]:
+    """Limits of a chunk: its own entry, else the "*.js"/"*.css" default"""
+    chunks = budgets.get("chunks", {})
+    return chunks.get(name) or chunks.get(f"*.{name.rsplit('.', 1)[-1]}", {})
+
+
+def format_kb(size: int) -> str:
+    return f"{size / 1024:.1f} KB"
+
+
+def check_budgets(report: Dict, budgets: Dict) -> List[str]:
+    """Chunks larger than their budget"""
+    problems = []
+    for name, chunk in report["chunks"].items():
+        for field, limit in budget_for(budgets, name).items():
+            if field in SIZE_FIELDS and chunk[field] > limit:
+                problems.append(f"{name} is {format_kb(chunk[field])} {field}, "
+                                f"budget {format_kb(limit)} (+{format_kb(chunk[field] - limit)})")
+    return problems
+
+
+def module_growth(previous: Dict, current: Dict, field: str) -> List[str]:
+    """Modules of a chunk that grew, largest growth first"""
+    before, after = previous.get("modules", {}), current.get("modules", {})
+    growth = []
+    for name in set(before) | set(after):
+        delta = after.get(name, {}).get(field, 0) - before.get(name, {}).get(field, 0)
+        if delta > 0:
+            note = " (new)" if name not in before else ""
+            growth.append((delta, f"+{format_kb(delta)} {name}{note}"))
+    return [line for _, line in sorted(growth, reverse=True)[:MAX_GROWTH_LINES]]
+
+
+def compare_reports(previous: Dict, report: Dict, budgets: Dict) -> List[str]:
+    """Chunks that grew beyond the allowed threshold since the previous release, with module diffs"""
+    field = budgets.get("compare", "gzip")
+    threshold = budgets.get("regression_threshold", 0.05)
+    min_bytes = budgets.get("min_regression_bytes", 1024)
+
+    problems = []
+    for name, chunk in report["chunks"].items():
+        before = previous.get("chunks", {}).get(name)
+        if before is None:
+            continue
+        delta = chunk[field] - before[field]
+        if delta > min_bytes and delta > before[field] * threshold:
+            lines = [f"{name} grew {format_kb(before[field])} -> {format_kb(chunk[field])} {field} "
+                     f"(+{delta / before[field]:.1%})"]
+            if chunk["modules"]:
+                lines.extend(f"    {line}" for line in module_growth(before, chunk, field))
+            else:
+                lines.append("    module attribution unavailable (no source map)")
+            problems.append("\n".join(lines))
+    return problems
+
+
+def summary_lines(report: Dict, previous: Optional[Dict] = None) -> List[str]:
+    """One line per chunk with its sizes and the change since the previous release"""
+    lines = []
+    for name, chunk in sorted(report["chunks"].items(), key=lambda item: item[1]["gzip"], reverse=True):
+        line = (f"  {name:<32} {format_kb(chunk['raw']):>10} raw {format_kb(chunk['gzip']):>10} gzip "
+                f"{format_kb(chunk['brotli']):>10} br")
+        before = (previous or {}).get("chunks", {}).get(name)
+        if before is not None:
+            line += f" ({chunk['gzip'] - before['gzip']:+,d} B gzip)"
+        lines.append(line)
+    unattributed = report.get("unattributed", [])
+    if unattributed:
+        lines.append(f"  Module attribution unavailable for {len(unattributed)} chunk(s) (no source maps)")
+    return lines
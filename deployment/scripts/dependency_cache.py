@@ -0,0 +1,106 @@
+"""
+Lockfile-Stamped Dependency Install
+===================================
+
+Records a stamp of the ``package-lock.json`` hash, the Node/npm versions and
+the host platform inside ``node_modules`` after a successful ``npm ci``. The
+next deploy skips the install when the stamp still matches.
+
+Optionally the installed ``node_modules`` tree is snapshotted as a compressed
+archive keyed by the stamp, so a wiped or mismatched ``node_modules`` can be
+restored without reinstalling from the registry.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import platform
+import shutil
+import tarfile
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STAMP_FILE = ".deploy-stamp.json"
+STAMP_VERSION = 1
+
+
+class DependencyCache:
+    """Stamp and optionally snapshot node_modules for a given lockfile"""
+
+    def __init__(self, project_root: Path, cache_dir: Path, max_snapshots: int = 3):
+        self.project_root = project_root
+        self.node_modules = project_root / "node_modules"
+        self.lockfile = project_root / "package-lock.json"
+        self.cache_dir = cache_dir
+        self.max_snapshots = max_snapshots
+
+    def stamp(self, node_version: str, npm_version: str) -> Dict[str, str]:
+        """Describe the dependency tree npm ci would produce on this host"""
+        return {
+            "version": STAMP_VERSION,
+            "lockfile_sha256": hashlib.sha256(self.lockfile.read_bytes()).hexdigest(),
+            "node": node_version.strip(),
+            "npm": npm_version.strip(),
+            "platform": f"{platform.system()}-{platform.machine()}",
+        }
+
+    @staticmethod
+    def key(stamp: Dict[str, str]) -> str:
+        return hashlib.sha256(json.dumps(stamp, sort_keys=True).encode()).hexdigest()
+
+    def installed_stamp(self) -> Optional[Dict[str, str]]:
+        """Stamp written by the last successful install, if any"""
+        try:
+            return json.loads((self.node_modules / STAMP_FILE).read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def is_current(self, stamp: Dict[str, str]) -> bool:
+        """Return True if node_modules was installed from the same stamp"""
+        return self.installed_stamp() == stamp
+
+    def write_stamp(self, stamp: Dict[str, str]) -> None:
+        (self.node_modules / STAMP_FILE).write_text(json.dumps(stamp, indent=2, sort_keys=True))
+
+    def snapshot_path(self, stamp: Dict[str, str]) -> Path:
+        return self.cache_dir / f"{self.key(stamp)}.tar.gz"
+
+    def restore_snapshot(self, stamp: Dict[str, str]) -> bool:
+        """Replace node_modules with the snapshot for stamp; return False on a miss"""
+        snapshot = self.snapshot_path(stamp)
+        if not snapshot.exists():
+            return False
+
+        if self.node_modules.exists():
+            shutil.rmtree(self.node_modules)
+        with tarfile.open(snapshot, "r:gz") as tar:
+            if hasattr(tarfile, "data_filter"):
+                tar.extractall(self.project_root, filter="data")
+            else:
+                tar.extractall(self.project_root)
+
+        os.utime(snapshot)
+        return self.is_current(stamp)
+
+    def save_snapshot(self, stamp: Dict[str, str]) -> None:
+        """Archive node_modules (including its stamp) and prune old snapshots"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-", suffix=".tar.gz")
+        os.close(fd)
+        try:
+            # Fast compression: the archive is rebuilt only when the lockfile changes
+            with tarfile.open(tmp_path, "w:gz", compresslevel=1) as tar:
+                tar.add(self.node_modules, arcname="node_modules")
+            os.replace(tmp_path, self.snapshot_path(stamp))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        snapshots = sorted(self.cache_dir.glob("*.tar.gz"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for snapshot in snapshots[self.max_snapshots:]:
+            logger.debug(f"Pruning node_modules snapshot {snapshot.name}")
+            snapshot.unlink()
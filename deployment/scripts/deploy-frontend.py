@@ -6,14 +6,25 @@ Quick deployment of frontend application to existing S3 bucket.
 
 import os
 import sys
+import logging
 import subprocess
 from pathlib import Path
 
+from botocore.exceptions import BotoCoreError, ClientError
 
-def run_command(cmd, cwd=None, check=True):
+from build_cache import BuildCache
+from errors import DeploymentError
+from invalidation import plan_invalidation
+from precompress import Precompressor
+from releases import ReleaseManager, build_id_for
+from terraform_outputs import TerraformOutputs
+from transfer import TransferEngine
+
+
+def run_command(cmd, cwd=None, check=True, env=None):
     """Run a shell command and return the result."""
     print(f"Running: {' '.join(cmd)}")
-    result = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
+    result = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, env=env)
     
     if result.stdout:
         print(result.stdout)
@@ -26,37 +37,58 @@ def run_command(cmd, cwd=None, check=True):
     return result
 
 
-def deploy_frontend():
-    """Deploy the frontend application."""
-    # Auto-detect if we're in kb-engine-fe directory or parent directory
+def find_frontend_dir():
+    """Auto-detect if we're in kb-engine-fe directory or parent directory."""
     current_dir = Path.cwd()
     
     if current_dir.name == 'kb-engine-fe':
         # We're inside kb-engine-fe directory
-        frontend_dir = current_dir
-        terraform_dir = current_dir / 'terraform'
-    elif (current_dir / 'kb-engine-fe').exists():
+        return current_dir
+    if (current_dir / 'kb-engine-fe').exists():
         # We're in parent directory
-        frontend_dir = current_dir / 'kb-engine-fe'
-        terraform_dir = frontend_dir / 'terraform'
-    else:
-        print(f"❌ Frontend directory not found")
-        print("Run this script from either:")
-        print("  - The kb-engine-fe directory")
-        print("  - The parent directory containing kb-engine-fe")
+        return current_dir / 'kb-engine-fe'
+    
+    print(f"❌ Frontend directory not found")
+    print("Run this script from either:")
+    print("  - The kb-engine-fe directory")
+    print("  - The parent directory containing kb-engine-fe")
+    return None
+
+
+def terraform_outputs_for(frontend_dir):
+    """Cached Terraform outputs shared with deploy.py."""
+    return TerraformOutputs(
+        frontend_dir / 'terraform',
+        frontend_dir / 'deployment' / '.cache',
+        runner=lambda cmd, cwd: run_command(cmd, cwd=cwd).stdout
+    )
+
+
+def deploy_frontend(engine=None, outputs=None):
+    """Deploy the frontend application."""
+    engine = engine or TransferEngine()
+    
+    frontend_dir = find_frontend_dir()
+    if frontend_dir is None:
         return False
+    terraform_dir = frontend_dir / 'terraform'
+    outputs = outputs or terraform_outputs_for(frontend_dir)
     
     print("📦 Building and deploying frontend application...")
     
-    # Build the application
-    print("Building application...")
+    # Build the application as release <build-id>
+    env = os.environ.copy()
+    cache_dir = frontend_dir / 'deployment' / '.cache' / 'builds'
+    build_id = build_id_for(BuildCache(frontend_dir, cache_dir, 'production').fingerprint(env))
+    
+    print(f"Building application (release {build_id})...")
     try:
         # Use cmd /c on Windows to find npm
         import platform
         if platform.system() == 'Windows':
-            run_command(['cmd', '/c', 'npm', 'run', 'build'], cwd=frontend_dir)
+            run_command(['cmd', '/c', 'npm', 'run', 'build'], cwd=frontend_dir, env=env)
         else:
-            run_command(['npm', 'run', 'build'], cwd=frontend_dir)
+            run_command(['npm', 'run', 'build'], cwd=frontend_dir, env=env)
     except subprocess.CalledProcessError:
         print("❌ Build failed")
         return False
@@ -67,15 +99,19 @@ def deploy_frontend():
         print("❌ Build directory not found after build")
         return False
     
+    # Precompress text assets (CloudFront serves the .br/.gz variants)
+    print("Precompressing assets...")
+    result = Precompressor(build_dir, frontend_dir / 'deployment' / '.cache' / 'compression').run()
+    print(f"✅ Precompressed {result.files} files ({result.compressed} compressed, {result.cache_hits} from cache)")
+    
     # Check terraform directory
     if not terraform_dir.exists():
         print(f"❌ Terraform directory not found at {terraform_dir}")
         return False
     
     try:
-        result = run_command(['terraform', 'output', '-raw', 's3_bucket_name'], cwd=terraform_dir)
-        bucket_name = result.stdout.strip()
-    except subprocess.CalledProcessError:
+        bucket_name = outputs.value('s3_bucket_name')
+    except (subprocess.CalledProcessError, DeploymentError):
         print("❌ Could not get S3 bucket name from terraform")
         print("Make sure infrastructure is deployed first")
         return False
@@ -83,54 +119,33 @@ def deploy_frontend():
     print(f"📤 Uploading to S3 bucket: {bucket_name}")
     
     try:
-        # Upload files to S3 with appropriate cache headers
-        print("Uploading static assets...")
-        run_command([
-            'aws', 's3', 'sync', str(build_dir) + '/',
-            f's3://{bucket_name}/',
-            '--delete',
-            '--cache-control', 'public, max-age=31536000, immutable',
-            '--exclude', 'index.html',
-            '--exclude', 'service-worker.js'
-        ])
-        
-        # Upload index.html with no-cache headers
-        print("Uploading index.html...")
-        run_command([
-            'aws', 's3', 'cp', str(build_dir / 'index.html'),
-            f's3://{bucket_name}/',
-            '--cache-control', 'no-cache, no-store, must-revalidate'
-        ])
-        
-        # Upload service-worker.js if it exists
-        service_worker = build_dir / 'service-worker.js'
-        if service_worker.exists():
-            print("Uploading service-worker.js...")
-            run_command([
-                'aws', 's3', 'cp', str(service_worker),
-                f's3://{bucket_name}/',
-                '--cache-control', 'no-cache, no-store, must-revalidate'
-            ])
+        # Upload the release, then switch the live pointer to it
+        print("Uploading changed files...")
+        releases = ReleaseManager(engine, bucket_name)
+        result = releases.publish(build_id, build_dir)
+        print(f"✅ Upload complete ({result.uploaded} uploaded, {len(result.diff.unchanged)} reused)")
+        diff = releases.activate(build_id)
+        releases.prune(5)
+        print(f"✅ Release {build_id} is live")
         
         # Create CloudFront invalidation
         try:
-            result = run_command(['terraform', 'output', '-raw', 'cloudfront_distribution_id'], cwd=terraform_dir)
-            distribution_id = result.stdout.strip()
-            print(f"🔄 Creating CloudFront invalidation...")
-            run_command([
-                'aws', 'cloudfront', 'create-invalidation',
-                '--distribution-id', distribution_id,
-                '--paths', '/*'
-            ])
-            print("✅ CloudFront cache invalidated")
-        except subprocess.CalledProcessError:
+            distribution_id = outputs.value('cloudfront_distribution_id')
+            plan = plan_invalidation(diff)
+            if plan.paths:
+                print(f"🔄 Creating CloudFront invalidation for {', '.join(plan.paths)}...")
+                invalidation_id = engine.create_invalidation(distribution_id, plan.paths)
+                print(f"✅ CloudFront cache invalidated ({invalidation_id}, {plan.kept_objects} cached objects kept)")
+            else:
+                print(f"✅ No mutable paths changed ({plan.kept_objects} cached objects kept)")
+        except (subprocess.CalledProcessError, DeploymentError, BotoCoreError, ClientError):
             print("⚠️  Could not create CloudFront invalidation")
             print("You may need to wait a few minutes for changes to appear")
         
         return True
         
-    except subprocess.CalledProcessError:
-        print("❌ Upload to S3 failed")
+    except (DeploymentError, BotoCoreError, ClientError) as e:
+        print(f"❌ Upload to S3 failed: {e}")
         return False
 
 
@@ -138,34 +153,31 @@ def main():
     """Main function."""
     print("Frontend Deployment Script")
     print("=" * 30)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     
-    # Check AWS CLI
+    # Check AWS credentials
+    engine = TransferEngine()
     try:
-        run_command(['aws', '--version'])
-        print("✅ AWS CLI is available")
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("❌ AWS CLI is not installed or not in PATH")
+        identity = engine.caller_identity()
+        print(f"✅ AWS credentials are configured ({identity.get('Arn')})")
+    except DeploymentError as e:
+        print(f"❌ {e}")
         return 1
     
-    # Check AWS credentials
-    try:
-        run_command(['aws', 'sts', 'get-caller-identity'])
-        print("✅ AWS credentials are configured")
-    except subprocess.CalledProcessError:
-        print("❌ AWS credentials are not configured")
+    frontend_dir = find_frontend_dir()
+    if frontend_dir is None:
         return 1
+    outputs = terraform_outputs_for(frontend_dir)
     
     # Deploy frontend
-    if deploy_frontend():
+    if deploy_frontend(engine, outputs):
         print("\n🎉 Frontend deployed successfully!")
         
-        # Get CloudFront URL
+        # Get CloudFront URL from the same outputs snapshot
         try:
-            result = run_command(['terraform', 'output', '-raw', 'cloudfront_url'], cwd=terraform_dir, check=False)
-            if result.returncode == 0:
-                cloudfront_url = result.stdout.strip()
-                print(f"\n🌐 Your application is available at: {cloudfront_url}")
-        except:
+            cloudfront_url = outputs.value('cloudfront_url')
+            print(f"\n🌐 Your application is available at: {cloudfront_url}")
+        except DeploymentError:
             pass
         
         return 0
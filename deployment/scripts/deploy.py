@@ -7,19 +7,45 @@ This script automates the deployment of the Knowledge Base Engine frontend
 to AWS infrastructure using Terraform and S3/CloudFront.
 
 Features:
-- Build React application
+- Install npm dependencies (skipped when package-lock.json is unchanged)
+- Build React application (skipped when the build inputs are unchanged)
+- Precompress text assets (Brotli/gzip) with a content-hash cache
 - Deploy infrastructure with Terraform
-- Upload build files to S3
-- Invalidate CloudFront cache
+- Publish each build as an immutable release: content-hashed assets at shared keys,
+  changed unhashed files under releases/<build-id>/ (nothing already stored is re-sent)
+- Switch the live release atomically and roll back without re-uploading
+- Restore earlier object versions server-side (point in time or pruned release)
+- Promote a tested release between environments with server-side copies
+- Cache-Control/Content-Type per object class from one policy table, with a drift audit (--audit-metadata)
+- Invalidate only the changed mutable paths in CloudFront
+- Optionally wait (--wait) until the invalidations have completed at the edge
+- Fan one build out to several targets concurrently (--targets)
+- Dry-run transfer plan with byte and time estimates (--plan-upload)
+- Independent stages (build, Terraform) run concurrently as a dependency graph
+- Bundle size budgets per chunk, checked against the live release (--allow-bundle-growth)
+- Per-stage timings recorded to deployment/logs/deploy-history.jsonl
 - Comprehensive logging and error handling
 
 Usage:
     python deployment/scripts/deploy.py [--environment dev|staging|prod] [--skip-build] [--skip-terraform]
+                                        [--max-concurrency N] [--multipart-threshold MB] [--multipart-chunksize MB]
+                                        [--wait [SECONDS]]
+    python deployment/scripts/deploy.py --targets prod,prod-eu|targets.json --environment ENV
+                                        [--allow-environment-mismatch] [--max-bandwidth MB] [--wait]
+    python deployment/scripts/deploy.py --plan-upload [--environment ENV]
+    python deployment/scripts/deploy.py --rollback BUILD_ID [--environment ENV]
+    python deployment/scripts/deploy.py --list-releases [--environment ENV]
+    python deployment/scripts/deploy.py --audit-metadata [--fix-metadata] [--environment ENV]
+    python deployment/scripts/deploy.py --restore-to 2024-01-31T12:00:00Z [--restore-prefix PREFIX] [--delete-newer]
+    python deployment/scripts/deploy.py --restore-release BUILD_ID
+    python deployment/scripts/deploy.py --promote-from staging --environment prod [--release BUILD_ID]
+    python deployment/scripts/deploy.py --profile-report [--environment ENV] [--profile-window N]
 
 Requirements:
     - Python 3.7+
     - Node.js and npm
-    - AWS CLI configured
+    - AWS credentials configured (aws configure, env vars or instance role)
+    - boto3 (pip install -r deployment/requirements.txt)
     - Terraform installed
 """
 
@@ -29,10 +55,32 @@ import subprocess
 import json
 import argparse
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional
 import time
 
+from build_cache import BuildCache
+from bundle_budget import REPORT_KEY, BundleAnalyzer, check_budgets, compare_reports, load_budgets, summary_lines
+from dependency_cache import DependencyCache
+from errors import DeploymentError
+from hashing import FileHasher
+from invalidation import plan_invalidation
+from invalidation_tracker import InvalidationTracker, TrackedInvalidation
+from manifest import ManifestDiff
+from object_policy import MetadataAuditor, policy_for
+from pipeline import Pipeline, Stage
+from restore import VersionRestorer, parse_timestamp
+from releases import PublishResult, ReleaseManager, build_id_for, is_versioned_file, object_key, release_prefix
+from profiler import (HISTORY_FILE, DeployProfiler, current_revision, load_history, profile_report,
+                      upload_throughput)
+from runner import CommandResult, run_streaming
+from targets import DeployTarget, TargetResult, format_summary, mismatched_targets, parse_targets
+from terraform_outputs import TerraformOutputs, environment_workspace
+from precompress import Precompressor
+from transfer import MB, TransferEngine, TransferLimiter, format_rate
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -44,19 +92,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class DeploymentError(Exception):
-    """Custom exception for deployment errors"""
-    pass
-
 class FrontendDeployer:
     """Main deployment class for KB Engine Frontend"""
     
-    def __init__(self, environment: str = "dev"):
+    def __init__(self, environment: str = "dev", transfer_engine: Optional[TransferEngine] = None,
+                 enforce_bundle_budgets: bool = True):
         self.environment = environment
+        self.transfer_engine = transfer_engine or TransferEngine()
+        # False turns bundle budget and growth failures into warnings
+        self.enforce_bundle_budgets = enforce_bundle_budgets
+        self.tool_versions: Dict[str, str] = {}
+        self._processes = set()
+        self._processes_lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self.command_results: List[CommandResult] = []
         self.project_root = Path(__file__).parent.parent.parent
         self.terraform_dir = self.project_root / "terraform"
         self.build_dir = self.project_root / "build"
         self.deployment_dir = self.project_root / "deployment"
+        self.cache_dir = self.deployment_dir / ".cache"
+        self.history_path = self.deployment_dir / "logs" / HISTORY_FILE
+        self.profiler = DeployProfiler(self.history_path, environment)
+        self.last_build_path = self.cache_dir / f"last-build-{environment}.json"
+        self.bundle_budgets_path = self.deployment_dir / "bundle-budgets.json"
+        # Digests of build/ (manifest, precompression) and of the build inputs, reused while unchanged on disk
+        transfer_config = self.transfer_engine.transfer_config
+        self.build_hasher = FileHasher(
+            self.cache_dir / "hashes-build.json",
+            multipart_threshold=transfer_config.multipart_threshold,
+            multipart_chunksize=transfer_config.multipart_chunksize
+        )
+        self.input_hasher = FileHasher(self.cache_dir / "hashes-inputs.json")
+        self.terraform_outputs = TerraformOutputs(
+            self.terraform_dir,
+            self.cache_dir,
+            runner=lambda command, cwd: self.run_command(command, cwd=cwd, capture_output=True).stdout
+        )
         
         # Ensure logs directory exists
         (self.deployment_dir / "logs").mkdir(exist_ok=True)
@@ -64,27 +135,61 @@ class FrontendDeployer:
         logger.info(f"Initializing deployment for environment: {environment}")
         logger.info(f"Project root: {self.project_root}")
     
+    def _track_process(self, process: subprocess.Popen) -> None:
+        with self._processes_lock:
+            self._processes.add(process)
+    
+    def _untrack_process(self, process: subprocess.Popen) -> None:
+        with self._processes_lock:
+            self._processes.discard(process)
+    
+    def _run_process(self, command: List[str], cwd: Path, env: Optional[Dict[str, str]] = None,
+                     capture_output: bool = False) -> CommandResult:
+        """Run a streamed subprocess that can be terminated by cancel_running_commands"""
+        if self._cancelled.is_set():
+            raise DeploymentError(f"Cancelled before running: {' '.join(command)}")
+        
+        try:
+            result = run_streaming(
+                command, cwd=cwd, env=env,
+                capture_stdout=capture_output,
+                # Parsed output (versions, JSON) is only interesting when debugging
+                log_level=logging.DEBUG if capture_output else logging.INFO,
+                on_start=self._track_process,
+                on_exit=self._untrack_process
+            )
+        except OSError as e:
+            raise DeploymentError(f"Command failed: {' '.join(command)} ({e})")
+        
+        self.command_results.append(result)
+        logger.info(f"Command finished: {' '.join(command)} ({result.usage_summary()})")
+        
+        if self._cancelled.is_set() and result.returncode != 0:
+            raise DeploymentError(f"Cancelled: {' '.join(command)}")
+        return result
+    
+    def cancel_running_commands(self) -> None:
+        """Stop starting new commands and terminate the ones still running"""
+        self._cancelled.set()
+        with self._processes_lock:
+            processes = list(self._processes)
+        for process in processes:
+            logger.info(f"Terminating running command (pid {process.pid})")
+            process.terminate()
+    
     def run_command(self, command: List[str], cwd: Optional[Path] = None, 
-                   capture_output: bool = False) -> subprocess.CompletedProcess:
+                   capture_output: bool = False) -> CommandResult:
         """Run shell command with error handling"""
         cwd = cwd or self.project_root
         logger.info(f"Running command: {' '.join(command)} in {cwd}")
         
-        try:
-            result = subprocess.run(
-                command,
-                cwd=cwd,
-                capture_output=capture_output,
-                text=True,
-                check=True
-            )
-            if capture_output and result.stdout:
-                logger.debug(f"Command output: {result.stdout}")
-            return result
-        except subprocess.CalledProcessError as e:
+        result = self._run_process(command, cwd, capture_output=capture_output)
+        if result.returncode != 0:
             logger.error(f"Command failed: {' '.join(command)}")
-            logger.error(f"Error: {e.stderr if e.stderr else str(e)}")
+            logger.error(f"Error (exit code {result.returncode}), last output:\n{result.stderr}")
             raise DeploymentError(f"Command failed: {' '.join(command)}")
+        
+        return result
     
     def check_prerequisites(self) -> None:
         """Check if all required tools are installed"""
@@ -94,25 +199,60 @@ class FrontendDeployer:
         required_commands = [
             (["node", "--version"], "Node.js"),
             (["npm", "--version"], "npm"),
-            (["aws", "--version"], "AWS CLI"),
             (["terraform", "--version"], "Terraform")
         ]
         
-        for command, tool_name in required_commands:
+        def check(command: List[str], tool_name: str) -> None:
             try:
-                self.run_command(command, capture_output=True)
+                result = self.run_command(command, capture_output=True)
+                self.tool_versions[command[0]] = result.stdout.strip()
                 logger.info(f"OK {tool_name} is installed")
             except DeploymentError:
                 raise DeploymentError(f"ERROR {tool_name} is not installed or not in PATH")
+        
+        # Run the checks side by side; each is dominated by process startup
+        with ThreadPoolExecutor(max_workers=len(required_commands) + 1) as executor:
+            checks = [executor.submit(check, command, tool_name) for command, tool_name in required_commands]
+            identity_check = executor.submit(self.transfer_engine.caller_identity)
+            for future in checks:
+                future.result()
+            identity = identity_check.result()
+        
+        logger.info(f"OK AWS credentials configured ({identity.get('Arn')})")
+    
+    def tool_version(self, tool: str) -> str:
+        """Return the `<tool> --version` output, reusing the prerequisite check"""
+        if tool not in self.tool_versions:
+            result = self.run_command([tool, "--version"], capture_output=True)
+            self.tool_versions[tool] = result.stdout.strip()
+        return self.tool_versions[tool]
     
-    def install_dependencies(self) -> None:
-        """Install npm dependencies"""
+    def install_dependencies(self, use_cache: bool = True, snapshot: bool = False) -> None:
+        """Install npm dependencies unless node_modules matches the lockfile stamp"""
         logger.info("Installing npm dependencies...")
+        
+        dependency_cache = DependencyCache(self.project_root, self.cache_dir / "node_modules")
+        stamp = dependency_cache.stamp(self.tool_version("node"), self.tool_version("npm"))
+        
+        if use_cache and dependency_cache.is_current(stamp):
+            logger.info("OK Dependencies up to date (lockfile and Node/npm versions unchanged)")
+            return
+        
+        if use_cache and snapshot and dependency_cache.restore_snapshot(stamp):
+            logger.info("OK Dependencies restored from node_modules snapshot")
+            return
+        
         self.run_command(["npm", "ci"])
+        dependency_cache.write_stamp(stamp)
+        
+        if snapshot:
+            dependency_cache.save_snapshot(stamp)
+            logger.info("OK node_modules snapshot saved")
+        
         logger.info("OK Dependencies installed")
     
-    def build_frontend(self) -> None:
-        """Build React application"""
+    def build_frontend(self, use_cache: bool = True) -> str:
+        """Build React application, restoring an identical earlier build if cached; returns the build id"""
         logger.info("Building React application...")
         
         # Set environment variables for build
@@ -120,151 +260,662 @@ class FrontendDeployer:
         env["REACT_APP_ENV"] = self.environment
         env["NODE_ENV"] = "production"
         
+        build_cache = BuildCache(self.project_root, self.cache_dir / "builds", self.environment,
+                                 hasher=self.input_hasher)
+        build_key = build_cache.fingerprint(env)
+        build_id = build_id_for(build_key)
+        
+        if use_cache and build_cache.restore(build_key, self.build_dir):
+            logger.info(f"OK Build inputs unchanged, restored build {build_id} from cache")
+            self.save_build_id(build_id)
+            return build_id
+        
         # Run build
-        result = subprocess.run(
-            ["npm", "run", "build"],
-            cwd=self.project_root,
-            env=env,
-            capture_output=True,
-            text=True
-        )
+        result = self._run_process(["npm", "run", "build"], self.project_root, env=env)
         
         if result.returncode != 0:
-            logger.error(f"Build failed: {result.stderr}")
+            logger.error(f"Build failed (exit code {result.returncode}), last output:\n{result.stderr}")
             raise DeploymentError("Frontend build failed")
         
         if not self.build_dir.exists():
             raise DeploymentError("Build directory not found after build")
         
-        logger.info("OK Frontend build completed")
+        build_cache.store(build_key, self.build_dir)
+        self.save_build_id(build_id)
+        logger.info(f"OK Frontend build completed (release {build_id})")
+        return build_id
+    
+    def save_build_id(self, build_id: str) -> None:
+        """Remember which release build/ holds, for --skip-build deploys"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.last_build_path.write_text(json.dumps({"build_id": build_id}), encoding="utf-8")
+    
+    def last_build_id(self) -> str:
+        try:
+            return json.loads(self.last_build_path.read_text(encoding="utf-8"))["build_id"]
+        except (FileNotFoundError, ValueError, KeyError):
+            raise DeploymentError("No previous build recorded for this environment, run without --skip-build")
+    
+    def precompress_assets(self) -> None:
+        """Write cached Brotli/gzip variants of text assets into the build"""
+        logger.info("Precompressing build assets...")
+        
+        if not self.build_dir.exists():
+            raise DeploymentError("Build directory not found, cannot precompress assets")
+        
+        result = Precompressor(self.build_dir, self.cache_dir / "compression", hasher=self.build_hasher).run()
+        
+        logger.info(
+            f"OK Precompressed {result.files} files ({result.compressed} compressed, "
+            f"{result.cache_hits} from cache): {result.original_bytes} -> "
+            f"{result.brotli_bytes} bytes br, {result.gzip_bytes} bytes gzip"
+        )
+    
+    def bundle_gate_failed(self, message: str, problems: List[str]) -> None:
+        """Fail the deploy on bundle problems, or only warn when budgets are not enforced"""
+        for problem in problems:
+            logger.warning(f"BUNDLE {problem}")
+        if self.enforce_bundle_budgets:
+            raise DeploymentError(f"{message} (use --allow-bundle-growth to deploy anyway)")
+        logger.warning(f"{message}, deploying anyway (--allow-bundle-growth)")
+    
+    def analyze_bundle(self, build_id: str) -> Dict:
+        """Measure the build's chunks and check them against their budgets"""
+        logger.info("Analyzing bundle sizes...")
+        
+        report = BundleAnalyzer(self.build_dir).analyze(build_id)
+        chunks = report["chunks"].values()
+        self.profiler.annotate(
+            "bundle",
+            chunks=len(report["chunks"]),
+            gzip_bytes=sum(chunk["gzip"] for chunk in chunks),
+            brotli_bytes=sum(chunk["brotli"] for chunk in chunks)
+        )
+        
+        problems = check_budgets(report, load_budgets(self.bundle_budgets_path))
+        if problems:
+            self.bundle_gate_failed(f"{len(problems)} chunk(s) over budget", problems)
+        else:
+            logger.info(f"OK {len(report['chunks'])} chunk(s) within budget")
+        return report
+    
+    def check_bundle_growth(self, releases: ReleaseManager, report: Dict) -> None:
+        """Compare the bundle report with the one stored with the live release"""
+        previous_id = releases.current_release()
+        previous = releases.load_release_json(previous_id, REPORT_KEY) if previous_id else None
+        for line in summary_lines(report, previous):
+            logger.info(line)
+        if previous is None:
+            logger.info("No bundle report for the live release, skipping growth check")
+            return
+        
+        problems = compare_reports(previous, report, load_budgets(self.bundle_budgets_path))
+        if problems:
+            self.bundle_gate_failed(f"{len(problems)} chunk(s) grew since release {previous_id}", problems)
+        else:
+            logger.info(f"OK No chunk grew beyond the threshold since release {previous_id}")
     
     def deploy_infrastructure(self) -> Dict[str, str]:
         """Deploy infrastructure using Terraform"""
         logger.info("Deploying infrastructure with Terraform...")
         
         # Initialize Terraform
-        self.run_command(["terraform", "init"], cwd=self.terraform_dir)
+        with self.profiler.stage("terraform_init"):
+            self.run_command(["terraform", "init"], cwd=self.terraform_dir)
+        
+        # Each environment has its own workspace and state
+        with self.profiler.stage("terraform_workspace"):
+            self.select_workspace()
         
         # Validate configuration
-        self.run_command(["terraform", "validate"], cwd=self.terraform_dir)
+        with self.profiler.stage("terraform_validate"):
+            self.run_command(["terraform", "validate"], cwd=self.terraform_dir)
         
         # Plan deployment
-        self.run_command([
-            "terraform", "plan", 
-            f"-var=environment={self.environment}",
-            "-out=tfplan"
-        ], cwd=self.terraform_dir)
+        with self.profiler.stage("terraform_plan"):
+            self.run_command([
+                "terraform", "plan", 
+                f"-var=environment={self.environment}",
+                "-out=tfplan"
+            ], cwd=self.terraform_dir)
         
         # Apply changes
-        self.run_command(["terraform", "apply", "tfplan"], cwd=self.terraform_dir)
+        with self.profiler.stage("terraform_apply"):
+            self.run_command(["terraform", "apply", "tfplan"], cwd=self.terraform_dir)
         
-        # Get outputs
-        result = self.run_command([
-            "terraform", "output", "-json"
-        ], cwd=self.terraform_dir, capture_output=True)
-        
-        outputs = json.loads(result.stdout)
-        terraform_outputs = {k: v["value"] for k, v in outputs.items()}
+        # Get outputs (re-read: the apply changed the state)
+        with self.profiler.stage("terraform_output"):
+            terraform_outputs = self.terraform_outputs.get(refresh=True)
         
         logger.info("OK Infrastructure deployed successfully")
         return terraform_outputs
     
-    def upload_to_s3(self, bucket_name: str) -> None:
-        """Upload build files to S3 bucket"""
-        logger.info(f"Uploading files to S3 bucket: {bucket_name}")
-        
-        # Upload all files except index.html with long cache
-        self.run_command([
-            "aws", "s3", "sync", str(self.build_dir), f"s3://{bucket_name}/",
-            "--delete",
-            "--cache-control", "public, max-age=31536000, immutable",
-            "--exclude", "index.html",
-            "--exclude", "service-worker.js"
-        ])
-        
-        # Upload index.html with no-cache
-        index_file = self.build_dir / "index.html"
-        if index_file.exists():
-            self.run_command([
-                "aws", "s3", "cp", str(index_file), f"s3://{bucket_name}/",
-                "--cache-control", "no-cache, no-store, must-revalidate"
-            ])
+    def select_workspace(self) -> None:
+        """Select the environment's Terraform workspace, creating it on the first deploy"""
+        if os.environ.get("TF_WORKSPACE"):
+            logger.info(f"Using Terraform workspace {os.environ['TF_WORKSPACE']} from TF_WORKSPACE")
+            return
         
-        # Upload service-worker.js with no-cache if exists
-        sw_file = self.build_dir / "service-worker.js"
-        if sw_file.exists():
-            self.run_command([
-                "aws", "s3", "cp", str(sw_file), f"s3://{bucket_name}/",
-                "--cache-control", "no-cache, no-store, must-revalidate"
-            ])
+        # A stack applied to the default workspace before environments had their own stays there
+        workspace = environment_workspace(self.terraform_dir, self.environment)
+        command = ["terraform", "workspace", "select", workspace]
+        if self._run_process(command, self.terraform_dir, capture_output=True).returncode != 0:
+            self.run_command(["terraform", "workspace", "new", workspace], cwd=self.terraform_dir)
+        logger.info(f"OK Terraform workspace {workspace} selected")
+    
+    def upload_to_s3(self, bucket_name: str, build_id: str, bundle_report: Optional[Dict] = None) -> PublishResult:
+        """Publish the build as release build_id in the S3 bucket"""
+        logger.info(f"Uploading release {build_id} to S3 bucket: {bucket_name}")
+        
+        releases = ReleaseManager(self.transfer_engine, bucket_name, hasher=self.build_hasher)
+        if bundle_report is not None:
+            self.check_bundle_growth(releases, bundle_report)
+        result = releases.publish(build_id, self.build_dir)
+        if bundle_report is not None:
+            releases.write_release_json(build_id, REPORT_KEY, bundle_report)
+        
+        self.profiler.annotate(
+            "upload",
+            bytes=sum(transfer.size for transfer in result.transfers),
+            objects_uploaded=result.uploaded,
+            objects_unchanged=len(result.diff.unchanged),
+            full_upload=result.diff.full_upload
+        )
+        
+        logger.info(f"OK Release uploaded to S3 ({result.uploaded} uploaded, "
+                    f"{len(result.diff.unchanged)} reused from the live release)")
+        return result
+    
+    def plan_upload(self) -> None:
+        """Show what uploading the current build would transfer and invalidate, without changing anything"""
+        start = time.perf_counter()
+        if not self.build_dir.exists():
+            raise DeploymentError("Build directory not found, build first or run without --plan-upload")
+        
+        bucket_name = self.get_terraform_outputs().get("s3_bucket_name")
+        if not bucket_name:
+            raise DeploymentError("S3 bucket name not found in Terraform outputs")
+        
+        plan = ReleaseManager(self.transfer_engine, bucket_name, hasher=self.build_hasher).plan(self.build_dir)
+        files = plan.manifest["files"]
+        for marker, keys in (("+", plan.diff.added), ("~", plan.diff.changed)):
+            for key in keys:
+                logger.info(f"  {marker} {key} ({files[key]['size']} bytes)")
+        for key in plan.diff.deleted:
+            logger.info(f"  - {key}")
+        
+        upload_bytes = plan.upload_bytes
+        logger.info(f"PLAN Against release {plan.previous_id or 'none (first release)'}: {plan.diff.summary()}")
+        logger.info(f"PLAN {len(plan.uploads)} object(s) to upload ({upload_bytes / MB:.2f} MB), "
+                    f"{len(plan.diff.unchanged)} reused from the live release")
         
-        logger.info("OK Files uploaded to S3")
+        rate = upload_throughput(load_history(self.history_path, self.environment))
+        if rate:
+            logger.info(f"PLAN Estimated transfer time: {upload_bytes / rate:.1f}s at {format_rate(rate)} "
+                        f"(median of recent deploys)")
+        else:
+            logger.info("PLAN No measured upload throughput yet, cannot estimate transfer time")
+        
+        invalidation = plan_invalidation(plan.root_diff)
+        if invalidation.paths:
+            logger.info(f"PLAN CloudFront paths to invalidate: {', '.join(invalidation.paths)}")
+        else:
+            logger.info("PLAN No CloudFront invalidation needed")
+        logger.info(f"PLAN computed in {time.perf_counter() - start:.2f}s")
+    
+    def activate_release(self, bucket_name: str, build_id: str, keep_releases: int = 5,
+                         engine: Optional[TransferEngine] = None) -> ManifestDiff:
+        """Make a published release live and prune old releases"""
+        releases = ReleaseManager(engine or self.transfer_engine, bucket_name)
+        diff = releases.activate(build_id)
+        if keep_releases > 0:
+            releases.prune(keep_releases)
+        return diff
     
-    def invalidate_cloudfront(self, distribution_id: str) -> None:
-        """Invalidate CloudFront cache"""
+    def invalidate_cloudfront(self, distribution_id: str, diff: ManifestDiff) -> Optional[TrackedInvalidation]:
+        """Invalidate the CloudFront paths changed by the upload"""
         logger.info(f"Invalidating CloudFront cache: {distribution_id}")
         
-        result = self.run_command([
-            "aws", "cloudfront", "create-invalidation",
-            "--distribution-id", distribution_id,
-            "--paths", "/*"
-        ], capture_output=True)
+        plan = plan_invalidation(diff)
+        self.profiler.annotate(
+            "invalidate",
+            paths=len(plan.paths),
+            invalidated_objects=plan.invalidated_objects,
+            kept_objects=plan.kept_objects
+        )
+        if not plan.paths:
+            logger.info(f"OK No mutable paths changed, skipping invalidation ({plan.kept_objects} cached objects kept)")
+            return None
         
-        invalidation_data = json.loads(result.stdout)
-        invalidation_id = invalidation_data["Invalidation"]["Id"]
+        logger.info(f"Invalidation paths: {', '.join(plan.paths)}")
+        invalidation_id = self.transfer_engine.create_invalidation(distribution_id, plan.paths)
         
         logger.info(f"OK Cache invalidation created: {invalidation_id}")
-        logger.info("Note: Invalidation may take 5-15 minutes to complete")
+        logger.info(f"CACHE {plan.invalidated_objects} objects invalidated, {plan.kept_objects} cached objects kept")
+        return TrackedInvalidation(distribution_id, invalidation_id)
     
-    def deploy(self, skip_build: bool = False, skip_terraform: bool = False) -> None:
-        """Main deployment workflow"""
+    def wait_until_live(self, invalidations: List[Optional[TrackedInvalidation]], timeout: Optional[float]) -> None:
+        """Block until the invalidations completed, recording their time-to-live"""
+        invalidations = [invalidation for invalidation in invalidations if invalidation]
+        if timeout is None:
+            if invalidations:
+                logger.info("Note: Invalidation may take 5-15 minutes to complete (use --wait to block until live)")
+            return
+        
+        tracker = InvalidationTracker(self.transfer_engine.cloudfront)
+        tracked = tracker.wait(invalidations, timeout=timeout)
+        finished = [invalidation for invalidation in tracked if invalidation.completed]
+        if finished:
+            self.profiler.annotate(
+                "invalidate",
+                time_to_live_seconds=round(max(invalidation.seconds for invalidation in finished), 3)
+            )
+        
+        pending = [invalidation.invalidation_id for invalidation in tracked if not invalidation.completed]
+        if pending:
+            raise DeploymentError(f"Invalidation(s) not completed within {timeout:.0f}s: {', '.join(pending)}")
+        logger.info("OK New content is live at the edge")
+    
+    def get_terraform_outputs(self) -> Dict[str, str]:
+        """Read outputs of the existing Terraform state (cached by state serial)"""
+        return self.terraform_outputs.get()
+    
+    def rollback(self, build_id: str, wait: Optional[float] = None) -> None:
+        """Switch the live site back to an earlier release without transferring objects"""
         start_time = time.time()
+        terraform_outputs = self.get_terraform_outputs()
+        bucket_name = terraform_outputs.get("s3_bucket_name")
+        if not bucket_name:
+            raise DeploymentError("S3 bucket name not found in Terraform outputs")
         
-        try:
-            logger.info("Starting KB Engine Frontend deployment...")
-            
-            # Check prerequisites
-            self.check_prerequisites()
-            
-            # Install dependencies
-            self.install_dependencies()
-            
-            # Build frontend
-            if not skip_build:
-                self.build_frontend()
-            else:
+        logger.info(f"Rolling back {bucket_name} to release {build_id}...")
+        diff = self.activate_release(bucket_name, build_id, keep_releases=0)
+        
+        distribution_id = terraform_outputs.get("cloudfront_distribution_id")
+        if distribution_id:
+            self.wait_until_live([self.invalidate_cloudfront(distribution_id, diff)], wait)
+        
+        logger.info(f"SUCCESS Rolled back to release {build_id} in {time.time() - start_time:.2f} seconds")
+    
+    def restore(self, point_in_time: Optional[str] = None, build_id: Optional[str] = None,
+                prefix: str = "", delete_newer: bool = False) -> None:
+        """Copy back the object versions current at a point in time, or those of a release"""
+        terraform_outputs = self.get_terraform_outputs()
+        bucket_name = terraform_outputs.get("s3_bucket_name")
+        if not bucket_name:
+            raise DeploymentError("S3 bucket name not found in Terraform outputs")
+        
+        restorer = VersionRestorer(self.transfer_engine, bucket_name)
+        if build_id:
+            # Only the objects of the release; it goes live with --rollback
+            prefix = release_prefix(build_id)
+            when = restorer.release_point_in_time(build_id)
+        else:
+            when = parse_timestamp(point_in_time)
+        
+        logger.info(f"Planning restore of {bucket_name}/{prefix or '*'} to {when.isoformat()}...")
+        plan = restorer.plan(when, prefix)
+        if build_id:
+            # Shared assets and files reused from older releases live outside the release prefix
+            manifest = restorer.release_manifest(build_id)
+            outside = {object_key(build_id, key, entry) for key, entry in manifest["files"].items()}
+            outside = {key for key in outside if not key.startswith(prefix)}
+            if outside:
+                plan.extend(restorer.plan(when, keys=outside))
+        logger.info(f"Restore plan: {plan.summary()}")
+        if not plan.copies and not (delete_newer and plan.deletes):
+            logger.info("OK Nothing to restore")
+            return
+        
+        restorer.restore(plan, delete_newer=delete_newer)
+        
+        if build_id:
+            logger.info(f"OK Release {build_id} restored, make it live with --rollback {build_id}")
+            return
+        
+        distribution_id = terraform_outputs.get("cloudfront_distribution_id")
+        if distribution_id:
+            if not delete_newer:
+                plan.deletes = []
+            self.invalidate_cloudfront(distribution_id, plan.as_diff())
+    
+    def outputs_for(self, environment: str) -> TerraformOutputs:
+        """Terraform outputs of an environment, read from its local state"""
+        return TerraformOutputs(
+            self.terraform_dir,
+            self.cache_dir,
+            environment=environment,
+            runner=lambda command, cwd: self.run_command(command, cwd=cwd, capture_output=True).stdout
+        )
+    
+    def promote(self, source_environment: str, build_id: Optional[str] = None, keep_releases: int = 5,
+                wait: Optional[float] = None) -> None:
+        """Copy a release verified in source_environment into this environment and make it live"""
+        start_time = time.time()
+        if source_environment == self.environment:
+            raise DeploymentError("Cannot promote an environment to itself")
+        
+        source_outputs = self.outputs_for(source_environment)
+        target_outputs = self.outputs_for(self.environment)
+        source_bucket = source_outputs.value("s3_bucket_name")
+        target_bucket = target_outputs.value("s3_bucket_name")
+        if source_bucket == target_bucket:
+            raise DeploymentError(f"{source_environment} and {self.environment} resolve to the same bucket {source_bucket}")
+        
+        source = ReleaseManager(self.transfer_engine, source_bucket)
+        build_id = build_id or source.current_release()
+        if not build_id:
+            raise DeploymentError(f"No live release in {source_environment} to promote")
+        
+        logger.info(f"Promoting release {build_id}: {source_environment} ({source_bucket}) -> "
+                    f"{self.environment} ({target_bucket})")
+        target = ReleaseManager(self.transfer_engine, target_bucket)
+        result = target.promote_from(source, build_id)
+        self.profiler.annotate("promote", objects_copied=result.copied, objects_unchanged=len(result.diff.unchanged))
+        
+        diff = self.activate_release(target_bucket, build_id, keep_releases)
+        distribution_id = target_outputs.get().get("cloudfront_distribution_id")
+        if distribution_id:
+            self.wait_until_live([self.invalidate_cloudfront(distribution_id, diff)], wait)
+        
+        logger.info(f"SUCCESS Release {build_id} promoted to {self.environment} in {time.time() - start_time:.2f} seconds")
+    
+    def audit_metadata(self, fix: bool = False) -> None:
+        """Compare the metadata of the live release's objects with the object policy, optionally repairing drift"""
+        terraform_outputs = self.get_terraform_outputs()
+        bucket_name = terraform_outputs.get("s3_bucket_name")
+        if not bucket_name:
+            raise DeploymentError("S3 bucket name not found in Terraform outputs")
+        
+        releases = ReleaseManager(self.transfer_engine, bucket_name)
+        build_id = releases.current_release()
+        manifest = releases.load_release_manifest(build_id) if build_id else None
+        if manifest is None:
+            raise DeploymentError(f"No live release with a manifest in {bucket_name}")
+        
+        # Bucket key -> build-relative key: the stored objects and the root copies of the versioned files
+        keys = {object_key(build_id, key, entry): key for key, entry in manifest["files"].items()}
+        keys.update({key: key for key in manifest["files"] if is_versioned_file(key)})
+        
+        logger.info(f"Auditing metadata of {len(keys)} object(s) of release {build_id}...")
+        auditor = MetadataAuditor(self.transfer_engine, bucket_name)
+        drifts = auditor.audit(keys)
+        for drift in drifts:
+            logger.warning(f"DRIFT {drift.describe()}")
+        if not drifts:
+            logger.info("OK All objects match the metadata policy")
+            return
+        if not fix:
+            logger.info(f"{len(drifts)} object(s) drifted, rewrite them with --fix-metadata")
+            return
+        
+        auditor.fix(drifts)
+        # Keep the release manifest in step so the next publish still reuses these objects
+        for key, entry in manifest["files"].items():
+            policy = policy_for(key)
+            entry["cache_control"] = policy.cache_control
+            entry["content_type"] = policy.content_type
+            entry.pop("content_encoding", None)
+            if policy.content_encoding:
+                entry["content_encoding"] = policy.content_encoding
+        releases.write_release_manifest(build_id, manifest)
+        logger.info(f"OK Rewrote the metadata of {len(drifts)} object(s)")
+        
+        # The edge keeps the old headers of root objects until they are invalidated
+        root_keys = sorted(drift.key for drift in drifts if drift.key in manifest["files"])
+        distribution_id = terraform_outputs.get("cloudfront_distribution_id")
+        if root_keys and distribution_id:
+            self.invalidate_cloudfront(distribution_id, ManifestDiff(changed=root_keys))
+    
+    def list_releases(self) -> None:
+        """Log the releases in the bucket, newest activation first"""
+        bucket_name = self.get_terraform_outputs().get("s3_bucket_name")
+        if not bucket_name:
+            raise DeploymentError("S3 bucket name not found in Terraform outputs")
+        
+        releases = ReleaseManager(self.transfer_engine, bucket_name)
+        pointer = releases.load_pointer()
+        history = pointer.get("history", [])
+        for release in history:
+            marker = "* " if release == pointer.get("current") else "  "
+            logger.info(f"{marker}{release}")
+        for release in sorted(set(releases.list_release_ids()) - set(history)):
+            logger.info(f"  {release} (never activated)")
+    
+    def frontend_stages(self, skip_build: bool = False, use_build_cache: bool = True,
+                        snapshot_node_modules: bool = False) -> List[Stage]:
+        """Stages that produce the precompressed build; the "build" result is the build id, "bundle" its size report"""
+        
+        def install(results):
+            if skip_build:
+                logger.info("SKIP Skipping npm install (build skipped)")
+                return
+            self.install_dependencies(use_cache=use_build_cache, snapshot=snapshot_node_modules)
+        
+        def build(results):
+            if skip_build:
                 logger.info("SKIP Skipping frontend build")
-            
-            # Deploy infrastructure
-            if not skip_terraform:
-                terraform_outputs = self.deploy_infrastructure()
-            else:
+                return self.last_build_id()
+            return self.build_frontend(use_cache=use_build_cache)
+        
+        return [
+            Stage("prerequisites", lambda results: self.check_prerequisites()),
+            Stage("install", install, ["prerequisites"]),
+            Stage("build", build, ["install"]),
+            # Always precompress: CloudFront routes to the variants
+            Stage("precompress", lambda results: self.precompress_assets(), ["build"]),
+            # Reads the compressed sizes from the variants
+            Stage("bundle", lambda results: self.analyze_bundle(results["build"]), ["precompress"]),
+        ]
+    
+    def build_stages(self, skip_build: bool = False, skip_terraform: bool = False,
+                     use_build_cache: bool = True, snapshot_node_modules: bool = False,
+                     keep_releases: int = 5, wait: Optional[float] = None) -> List[Stage]:
+        """Describe the deploy workflow as a dependency graph"""
+        
+        def infrastructure(results):
+            if skip_terraform:
                 logger.info("SKIP Skipping Terraform deployment")
-                # Get existing outputs
-                result = self.run_command([
-                    "terraform", "output", "-json"
-                ], cwd=self.terraform_dir, capture_output=True)
-                outputs = json.loads(result.stdout)
-                terraform_outputs = {k: v["value"] for k, v in outputs.items()}
-            
-            # Upload to S3
-            bucket_name = terraform_outputs.get("s3_bucket_name")
+                return self.get_terraform_outputs()
+            return self.deploy_infrastructure()
+        
+        def upload(results):
+            bucket_name = results["infrastructure"].get("s3_bucket_name")
             if not bucket_name:
                 raise DeploymentError("S3 bucket name not found in Terraform outputs")
+            return self.upload_to_s3(bucket_name, results["build"], results["bundle"])
+        
+        def activate(results):
+            bucket_name = results["infrastructure"]["s3_bucket_name"]
+            return self.activate_release(bucket_name, results["build"], keep_releases)
+        
+        def invalidate(results):
+            distribution_id = results["infrastructure"].get("cloudfront_distribution_id")
+            if distribution_id:
+                return self.invalidate_cloudfront(distribution_id, results["activate"])
+            logger.warning("CloudFront distribution ID not found, skipping cache invalidation")
+            return None
+        
+        def wait_live(results):
+            self.wait_until_live([results["invalidate"]], wait)
+        
+        return self.frontend_stages(skip_build, use_build_cache, snapshot_node_modules) + [
+            # Terraform does not depend on the build and runs alongside it
+            Stage("infrastructure", infrastructure, ["prerequisites"]),
+            Stage("upload", upload, ["build", "bundle", "infrastructure"]),
+            # The live site only changes here, after the release is complete
+            Stage("activate", activate, ["upload"]),
+            Stage("invalidate", invalidate, ["activate"]),
+            Stage("wait_live", wait_live, ["invalidate"]),
+        ]
+    
+    def deploy_target(self, target: DeployTarget, build_id: str, engine: TransferEngine,
+                      keep_releases: int = 5, bundle_report: Optional[Dict] = None) -> TargetResult:
+        """Publish and activate the build on one target, recording failures instead of raising"""
+        result = TargetResult(target, build_id=build_id, build_environment=self.environment)
+        start = time.perf_counter()
+        uploaded_bytes = 0
+        try:
+            # Targets with an explicit bucket are not looked up in Terraform
+            outputs = None if target.bucket_name else self.outputs_for(target.workspace)
+            result.bucket_name = target.bucket_name or outputs.value("s3_bucket_name")
             
-            self.upload_to_s3(bucket_name)
+            logger.info(f"TARGET {target.name}: publishing release {build_id} to {result.bucket_name}")
+            releases = ReleaseManager(engine, result.bucket_name, hasher=self.build_hasher)
+            if bundle_report is not None:
+                self.check_bundle_growth(releases, bundle_report)
+            published = releases.publish(build_id, self.build_dir)
+            if bundle_report is not None:
+                releases.write_release_json(build_id, REPORT_KEY, bundle_report)
+            result.uploaded, result.reused = published.uploaded, len(published.diff.unchanged)
+            uploaded_bytes = sum(transfer.size for transfer in published.transfers)
+            diff = self.activate_release(result.bucket_name, build_id, keep_releases, engine)
             
-            # Invalidate CloudFront
-            distribution_id = terraform_outputs.get("cloudfront_distribution_id")
+            distribution_id = target.distribution_id
+            if distribution_id is None and outputs is not None:
+                distribution_id = outputs.get().get("cloudfront_distribution_id")
             if distribution_id:
-                self.invalidate_cloudfront(distribution_id)
+                result.invalidation = self.invalidate_cloudfront(distribution_id, diff)
             else:
-                logger.warning("CloudFront distribution ID not found, skipping cache invalidation")
+                logger.warning(f"TARGET {target.name}: no CloudFront distribution, skipping invalidation")
+        except Exception as e:
+            result.error = str(e)
+            logger.error(f"TARGET {target.name} failed: {e}")
+        finally:
+            result.seconds = time.perf_counter() - start
+            self.profiler.annotate(f"deploy:{target.name}", bytes=uploaded_bytes, objects_uploaded=result.uploaded,
+                                   objects_reused=result.reused, failed=bool(result.error))
+        return result
+    
+    def verify_target(self, result: TargetResult, build_id: str, engine: TransferEngine,
+                      wait: Optional[float]) -> None:
+        """Check that the target serves build_id from its bucket root"""
+        if result.error:
+            return
+        if wait is not None and result.invalidation is not None and not result.invalidation.completed:
+            result.error = f"Invalidation {result.invalidation.invalidation_id} not completed before the deadline"
+            return
+        problems = ReleaseManager(engine, result.bucket_name).verify(build_id)
+        if problems:
+            result.error = "; ".join(problems)
+        result.verified = not problems
+    
+    def target_stages(self, targets: List[DeployTarget], limiter: TransferLimiter, skip_build: bool = False,
+                      use_build_cache: bool = True, snapshot_node_modules: bool = False,
+                      keep_releases: int = 5, wait: Optional[float] = None) -> List[Stage]:
+        """Build once, then publish, invalidate and verify every target concurrently"""
+        engines = {
+            target.name: TransferEngine(
+                multipart_threshold=self.transfer_engine.transfer_config.multipart_threshold,
+                multipart_chunksize=self.transfer_engine.transfer_config.multipart_chunksize,
+                max_concurrency=limiter.max_concurrency,
+                region_name=target.region,
+                limiter=limiter
+            )
+            for target in targets
+        }
+        
+        def deploy_stage(target):
+            return lambda results: self.deploy_target(target, results["build"], engines[target.name], keep_releases,
+                                                      results["bundle"])
+        
+        def verify_stage(target):
+            return lambda results: self.verify_target(
+                results[f"deploy:{target.name}"], results["build"], engines[target.name], wait
+            )
+        
+        def wait_live(results):
+            invalidations = [results[f"deploy:{target.name}"].invalidation for target in targets]
+            try:
+                self.wait_until_live(invalidations, wait)
+            except DeploymentError as e:
+                # Reported per target by the verify stages
+                logger.warning(str(e))
+        
+        stages = self.frontend_stages(skip_build, use_build_cache, snapshot_node_modules)
+        for target in targets:
+            stages.append(Stage(f"deploy:{target.name}", deploy_stage(target), ["bundle"]))
+        stages.append(Stage("wait_live", wait_live, [f"deploy:{target.name}" for target in targets]))
+        for target in targets:
+            stages.append(Stage(f"verify:{target.name}", verify_stage(target), ["wait_live"]))
+        return stages
+    
+    def deploy_targets(self, targets: List[DeployTarget], limiter: TransferLimiter, skip_build: bool = False,
+                       use_build_cache: bool = True, snapshot_node_modules: bool = False,
+                       keep_releases: int = 5, wait: Optional[float] = None,
+                       allow_environment_mismatch: bool = False) -> None:
+        """Deploy one build to several targets and print a per-target summary"""
+        start_time = time.time()
+        mismatched = ", ".join(f"{target.name} ({target.environment})"
+                               for target in mismatched_targets(targets, self.environment))
+        if mismatched and not allow_environment_mismatch:
+            raise DeploymentError(f"The bundle is built for {self.environment}, target(s) {mismatched} serve another "
+                                  f"environment; deploy them separately or pass --allow-environment-mismatch")
+        if mismatched:
+            logger.warning(f"Deploying the {self.environment} build to target(s) of another environment: {mismatched}")
+        self.profiler.revision = current_revision(self.project_root)
+        logger.info(f"Starting fan-out deployment to {len(targets)} target(s): "
+                    f"{', '.join(target.name for target in targets)}")
+        
+        stages = self.target_stages(targets, limiter, skip_build, use_build_cache, snapshot_node_modules,
+                                    keep_releases, wait)
+        pipeline = Pipeline(stages, max_workers=4 + len(targets), on_cancel=self.cancel_running_commands)
+        try:
+            results = pipeline.run()
+        except BaseException:
+            self.save_profile(pipeline, "failed")
+            raise
+        
+        target_results = [results[f"deploy:{target.name}"] for target in targets]
+        failed = [result.target.name for result in target_results if result.error]
+        self.save_profile(pipeline, "failed" if failed else "success")
+        
+        logger.info(f"SUMMARY Release {results['build']} to {len(targets)} target(s) "
+                    f"in {time.time() - start_time:.2f} seconds")
+        for line in format_summary(target_results):
+            logger.info(line)
+        
+        if failed:
+            raise DeploymentError(f"Deployment failed for target(s): {', '.join(failed)}")
+        logger.info("SUCCESS All targets deployed and verified")
+    
+    def save_profile(self, pipeline: Pipeline, status: str) -> None:
+        """Append the stage timings of this run to the deploy history"""
+        for name, seconds in pipeline.durations.items():
+            self.profiler.record(name, seconds)
+        try:
+            self.profiler.save(status)
+        except OSError as e:
+            logger.warning(f"Could not write deploy history {self.history_path}: {e}")
+            return
+        logger.info(f"PROFILE Stage timings appended to {self.history_path}")
+    
+    def deploy(self, skip_build: bool = False, skip_terraform: bool = False,
+               use_build_cache: bool = True, snapshot_node_modules: bool = False,
+               keep_releases: int = 5, wait: Optional[float] = None) -> None:
+        """Main deployment workflow"""
+        start_time = time.time()
+        self.profiler.revision = current_revision(self.project_root)
+        
+        try:
+            logger.info("Starting KB Engine Frontend deployment...")
+            
+            stages = self.build_stages(skip_build, skip_terraform, use_build_cache, snapshot_node_modules,
+                                       keep_releases, wait)
+            pipeline = Pipeline(stages, on_cancel=self.cancel_running_commands)
+            try:
+                results = pipeline.run()
+            except BaseException:
+                self.save_profile(pipeline, "failed")
+                raise
+            self.save_profile(pipeline, "success")
+            terraform_outputs = results["infrastructure"]
             
             # Success summary
             duration = time.time() - start_time
-            logger.info("SUCCESS Deployment completed successfully!")
-            logger.info(f"TIME Total time: {duration:.2f} seconds")
+            logger.info(f"SUCCESS Deployment completed successfully! (release {results['build']})")
+            logger.info(f"TIME Total time: {duration:.2f} seconds "
+                        f"(sum of stages: {sum(pipeline.durations.values()):.2f} seconds)")
             
             if "cloudfront_url" in terraform_outputs:
                 logger.info(f"URL Application URL: {terraform_outputs['cloudfront_url']}")
@@ -283,8 +934,7 @@ def main():
     parser.add_argument(
         "--environment", "-e",
         choices=["dev", "staging", "prod"],
-        default="dev",
-        help="Deployment environment"
+        help="Deployment environment (default: dev; required with --targets, where it selects the build)"
     )
     parser.add_argument(
         "--skip-build",
@@ -296,15 +946,199 @@ def main():
         action="store_true",
         help="Skip Terraform deployment step"
     )
+    parser.add_argument(
+        "--no-build-cache",
+        action="store_true",
+        help="Always run npm ci and npm run build, even if the inputs are unchanged"
+    )
+    parser.add_argument(
+        "--snapshot-node-modules",
+        action="store_true",
+        help="Keep a compressed node_modules snapshot keyed by the lockfile stamp"
+    )
+    parser.add_argument(
+        "--wait",
+        type=float,
+        nargs="?",
+        const=900,
+        metavar="SECONDS",
+        help="Wait until the CloudFront invalidation completed (deadline, default 900s)"
+    )
+    parser.add_argument(
+        "--targets",
+        help="Comma separated environments or a JSON targets file: build once for --environment and deploy "
+             "to all (infrastructure must exist)"
+    )
+    parser.add_argument(
+        "--allow-environment-mismatch",
+        action="store_true",
+        help="With --targets, deploy the build to targets of other environments than --environment"
+    )
+    parser.add_argument(
+        "--max-bandwidth",
+        type=float,
+        metavar="MB",
+        help="Total upload bandwidth limit in MB/s across all targets"
+    )
+    parser.add_argument(
+        "--plan-upload",
+        action="store_true",
+        help="Show what the upload would transfer and invalidate, without changing anything"
+    )
+    parser.add_argument(
+        "--allow-bundle-growth",
+        action="store_true",
+        help="Only warn when chunks exceed their budget or grew since the live release"
+    )
+    parser.add_argument(
+        "--keep-releases",
+        type=int,
+        default=5,
+        help="Number of recent releases kept in the bucket for rollback"
+    )
+    parser.add_argument(
+        "--rollback",
+        metavar="BUILD_ID",
+        help="Make an earlier release live again instead of deploying"
+    )
+    parser.add_argument(
+        "--list-releases",
+        action="store_true",
+        help="List the releases in the bucket instead of deploying"
+    )
+    parser.add_argument(
+        "--promote-from",
+        choices=["dev", "staging", "prod"],
+        help="Copy a release from this environment's bucket into --environment instead of building"
+    )
+    parser.add_argument(
+        "--release",
+        metavar="BUILD_ID",
+        help="Release to promote (default: the one live in the source environment)"
+    )
+    parser.add_argument(
+        "--audit-metadata",
+        action="store_true",
+        help="Compare Cache-Control/Content-Type of the live objects with the object policy instead of deploying"
+    )
+    parser.add_argument(
+        "--fix-metadata",
+        action="store_true",
+        help="With --audit-metadata, rewrite drifted objects in place (server-side)"
+    )
+    parser.add_argument(
+        "--restore-to",
+        metavar="TIMESTAMP",
+        help="Restore the object versions current at this ISO 8601 time (UTC if no offset)"
+    )
+    parser.add_argument(
+        "--restore-release",
+        metavar="BUILD_ID",
+        help="Restore the objects of a pruned or damaged release from its stored versions"
+    )
+    parser.add_argument(
+        "--restore-prefix",
+        default="",
+        help="Limit --restore-to to keys under this prefix"
+    )
+    parser.add_argument(
+        "--delete-newer",
+        action="store_true",
+        help="With --restore-to, also delete keys created after the restore point"
+    )
+    parser.add_argument(
+        "--profile-report",
+        action="store_true",
+        help="Show stage timing trends from the deploy history instead of deploying"
+    )
+    parser.add_argument(
+        "--profile-window",
+        type=int,
+        default=10,
+        help="Number of previous runs in the rolling median"
+    )
+    parser.add_argument(
+        "--regression-threshold",
+        type=float,
+        default=0.25,
+        help="Flag stages slower than the rolling median by this fraction"
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=16,
+        help="Number of parallel S3 transfers"
+    )
+    parser.add_argument(
+        "--multipart-threshold",
+        type=int,
+        default=8,
+        help="File size in MB above which uploads use multipart"
+    )
+    parser.add_argument(
+        "--multipart-chunksize",
+        type=int,
+        default=8,
+        help="Multipart part size in MB"
+    )
     
     args = parser.parse_args()
+    if args.targets and args.environment is None:
+        parser.error("--targets needs an explicit --environment, the environment the bundle is built for")
+    args.environment = args.environment or "dev"
+    
+    if args.profile_report:
+        history_path = Path(__file__).parent.parent / "logs" / HISTORY_FILE
+        history = load_history(history_path, environment=args.environment)
+        profile_report(history, window=args.profile_window, threshold=args.regression_threshold)
+        return
     
     try:
-        deployer = FrontendDeployer(args.environment)
-        deployer.deploy(
-            skip_build=args.skip_build,
-            skip_terraform=args.skip_terraform
+        transfer_engine = TransferEngine(
+            multipart_threshold=args.multipart_threshold * MB,
+            multipart_chunksize=args.multipart_chunksize * MB,
+            max_concurrency=args.max_concurrency
         )
+        deployer = FrontendDeployer(args.environment, transfer_engine,
+                                    enforce_bundle_budgets=not args.allow_bundle_growth)
+        if args.plan_upload:
+            deployer.plan_upload()
+        elif args.rollback:
+            deployer.rollback(args.rollback, wait=args.wait)
+        elif args.targets:
+            deployer.deploy_targets(
+                parse_targets(args.targets),
+                TransferLimiter(args.max_concurrency, args.max_bandwidth * MB if args.max_bandwidth else None),
+                skip_build=args.skip_build,
+                use_build_cache=not args.no_build_cache,
+                snapshot_node_modules=args.snapshot_node_modules,
+                keep_releases=args.keep_releases,
+                wait=args.wait,
+                allow_environment_mismatch=args.allow_environment_mismatch
+            )
+        elif args.promote_from:
+            deployer.promote(args.promote_from, build_id=args.release, keep_releases=args.keep_releases,
+                             wait=args.wait)
+        elif args.list_releases:
+            deployer.list_releases()
+        elif args.audit_metadata:
+            deployer.audit_metadata(fix=args.fix_metadata)
+        elif args.restore_to or args.restore_release:
+            deployer.restore(
+                point_in_time=args.restore_to,
+                build_id=args.restore_release,
+                prefix=args.restore_prefix,
+                delete_newer=args.delete_newer
+            )
+        else:
+            deployer.deploy(
+                skip_build=args.skip_build,
+                skip_terraform=args.skip_terraform,
+                use_build_cache=not args.no_build_cache,
+                snapshot_node_modules=args.snapshot_node_modules,
+                keep_releases=args.keep_releases,
+                wait=args.wait
+            )
     except DeploymentError as e:
         logger.error(f"Deployment failed: {e}")
         sys.exit(1)
@@ -0,0 +1,8 @@
+"""
+Shared exception types for the deployment scripts.
+"""
+
+
+class DeploymentError(Exception):
+    """Custom exception for deployment errors"""
+    pass
@@ -0,0 +1,184 @@
+"""
+Incremental File Hashing Engine
+===============================
+
+Hashes files for the content-aware deploy paths: the ``build/`` manifest,
+the precompression cache and the build-input fingerprint over ``src/``.
+Files are read through memory maps by a thread pool (hashlib releases the
+GIL while digesting large buffers, so the workers really run in parallel).
+
+Digests are kept in a persistent cache keyed by path, size, mtime_ns and
+inode. On a warm run an unchanged file is only stat'ed, never read. Each
+cache file belongs to one tree; only entries looked up since the cache was
+loaded are written back, so deleted files do not accumulate.
+
+Besides SHA-256 every digest carries the ETag S3 assigns when the file is
+uploaded with the transfer engine's multipart settings: the MD5 of the body,
+or the MD5 of the concatenated part MD5s followed by ``-<parts>``. Deploys
+without a previous manifest compare it with the ETags of a bucket listing,
+so objects already uploaded are recognized without downloading them.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from transfer import DEFAULT_MULTIPART_CHUNKSIZE, DEFAULT_MULTIPART_THRESHOLD, MB
+
+CACHE_VERSION = 1
+
+# S3 limits that boto3 applies when it splits an upload into parts
+MAX_PARTS = 10000
+MIN_PART_SIZE = 5 * MB
+
+PathLike = Union[str, Path]
+
+
+@dataclass(frozen=True)
+class FileDigest:
+    """Content digests of a single file"""
+    sha256: str
+    # S3 ETag without the surrounding quotes
+    etag: str
+    size: int
+
+
+def _md5(data=b""):
+    try:
+        return hashlib.md5(data, usedforsecurity=False)
+    except TypeError:
+        return hashlib.md5(data)
+
+
+def part_size_for(size: int, chunksize: int = DEFAULT_MULTIPART_CHUNKSIZE) -> int:
+    """The part size boto3 uses for a multipart upload of size bytes"""
+    chunksize = max(chunksize, MIN_PART_SIZE)
+    while -(-size // chunksize) > MAX_PARTS:
+        chunksize *= 2
+    return chunksize
+
+
+def hash_path(path: PathLike, multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD,
+              multipart_chunksize: int = DEFAULT_MULTIPART_CHUNKSIZE) -> FileDigest:
+    """Compute the SHA-256 and S3 ETag of a file through a memory map"""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        multipart = size >= multipart_threshold
+        step = part_size_for(size, multipart_chunksize) if multipart else 8 * MB
+        parts = []
+        md5 = _md5()
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for start in range(0, size, step):
+                        with view[start:start + step] as chunk:
+                            sha256.update(chunk)
+                            if multipart:
+                                parts.append(_md5(chunk).digest())
+                            else:
+                                md5.update(chunk)
+                finally:
+                    view.release()
+
+    if multipart:
+        etag = f"{_md5(b''.join(parts)).hexdigest()}-{len(parts)}"
+    else:
+        etag = md5.hexdigest()
+    return FileDigest(sha256=sha256.hexdigest(), etag=etag, size=size)
+
+
+class FileHasher:
+    """Threaded mmap hashing with a persistent (path, size, mtime_ns, inode) cache"""
+
+    def __init__(self, cache_path: Optional[Path] = None, max_workers: Optional[int] = None,
+                 multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD,
+                 multipart_chunksize: int = DEFAULT_MULTIPART_CHUNKSIZE):
+        self.cache_path = cache_path
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 2)
+        self.multipart_threshold = multipart_threshold
+        self.multipart_chunksize = multipart_chunksize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: Dict[str, list] = self._load()
+        self._seen = set()
+        self._dirty = False
+
+    def _settings(self) -> list:
+        return [CACHE_VERSION, self.multipart_threshold, self.multipart_chunksize]
+
+    def _load(self) -> Dict[str, list]:
+        if self.cache_path is None:
+            return {}
+        try:
+            data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+        # ETags depend on the multipart settings, so a change invalidates everything
+        if data.get("settings") != self._settings():
+            return {}
+        return data.get("entries", {})
+
+    def _lookup(self, path: str, stat: os.stat_result) -> Optional[FileDigest]:
+        cached = self._entries.get(path)
+        if cached and cached[:3] == [stat.st_size, stat.st_mtime_ns, stat.st_ino]:
+            return FileDigest(sha256=cached[3], etag=cached[4], size=stat.st_size)
+        return None
+
+    def hash_files(self, paths: Iterable[PathLike]) -> Dict[str, FileDigest]:
+        """Digest every path, reading only files that changed since they were cached"""
+        results: Dict[str, FileDigest] = {}
+        pending: List[Tuple[str, os.stat_result]] = []
+        with self._lock:
+            for path in map(os.fspath, paths):
+                stat = os.stat(path)
+                self._seen.add(path)
+                cached = self._lookup(path, stat)
+                if cached is not None:
+                    results[path] = cached
+                    self.hits += 1
+                else:
+                    pending.append((path, stat))
+            self.misses += len(pending)
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                digests = executor.map(
+                    lambda path: hash_path(path, self.multipart_threshold, self.multipart_chunksize),
+                    [path for path, _ in pending]
+                )
+                for (path, stat), digest in zip(pending, digests):
+                    results[path] = digest
+                    with self._lock:
+                        self._entries[path] = [stat.st_size, stat.st_mtime_ns, stat.st_ino,
+                                               digest.sha256, digest.etag]
+                        self._dirty = True
+        return results
+
+    def digest(self, path: PathLike) -> FileDigest:
+        """Digest a single file"""
+        return self.hash_files([path])[os.fspath(path)]
+
+    def save(self) -> None:
+        """Persist the entries looked up since loading, atomically"""
+        if self.cache_path is None:
+            return
+        with self._lock:
+            if not self._dirty and self._seen.issuperset(self._entries):
+                return
+            entries = {path: self._entries[path] for path in self._seen if path in self._entries}
+            self._dirty = False
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"settings": self._settings(), "entries": entries}, f)
+        os.replace(tmp_path, self.cache_path)
@@ -0,0 +1,97 @@
+"""
+Targeted CloudFront Invalidation
+================================
+
+Works out which CloudFront paths actually need invalidating after an upload.
+Content-hashed files (``static/js/main.1a2b3c4d.js``) never change under the
+same name, so only mutable paths such as ``index.html``, ``manifest.json`` or
+``sw.js`` are invalidated. Large path sets are merged into wildcard prefixes
+so a single request stays within CloudFront's path limits.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterable, List, Set
+
+from manifest import ManifestDiff
+from object_policy import is_content_hashed
+
+# CloudFront allows 3000 file paths and 15 wildcard paths in progress
+MAX_INVALIDATION_PATHS = 3000
+MAX_WILDCARD_PATHS = 15
+
+WILDCARD_ALL = "/*"
+
+
+@dataclass
+class InvalidationPlan:
+    """CloudFront paths to invalidate and how much of the cache survives"""
+    paths: List[str]
+    invalidated_objects: int
+    kept_objects: int
+
+
+def _parent(path: str) -> str:
+    if path.endswith("/*"):
+        path = path[:-2]
+    return path.rsplit("/", 1)[0]
+
+
+def collapse_paths(paths: Iterable[str], max_paths: int = MAX_INVALIDATION_PATHS,
+                   max_wildcards: int = MAX_WILDCARD_PATHS) -> List[str]:
+    """Merge paths into wildcard prefixes until the set fits the path limits"""
+    current: Set[str] = set(paths)
+
+    while len(current) > max_paths:
+        groups = defaultdict(set)
+        for path in current:
+            groups[_parent(path)].add(path)
+
+        # Merge the largest sibling group, preferring the deepest prefix
+        parent, members = max(groups.items(), key=lambda item: (len(item[1]), item[0].count("/")))
+        if not parent or len(members) < 2:
+            return [WILDCARD_ALL]
+
+        current -= members
+        current.add(f"{parent}/*")
+
+        if sum(1 for path in current if path.endswith("*")) > max_wildcards:
+            return [WILDCARD_ALL]
+
+    return sorted(current)
+
+
+def _covered(path: str, patterns: List[str]) -> bool:
+    for pattern in patterns:
+        if pattern.endswith("*"):
+            if path.startswith(pattern[:-1]):
+                return True
+        elif path == pattern:
+            return True
+    return False
+
+
+def plan_invalidation(diff: ManifestDiff, max_paths: int = MAX_INVALIDATION_PATHS,
+                      max_wildcards: int = MAX_WILDCARD_PATHS) -> InvalidationPlan:
+    """Compute the invalidation paths for the objects an upload touched"""
+    live_keys = diff.added + diff.changed + diff.unchanged
+
+    if diff.full_upload:
+        # No previous manifest: the edge may hold anything
+        return InvalidationPlan([WILDCARD_ALL], len(live_keys), 0)
+
+    paths = set()
+    for key in diff.added + diff.changed + diff.deleted:
+        if is_content_hashed(key):
+            continue
+        paths.add(f"/{key}")
+        if key == "index.html":
+            # Served for "/" through default_root_object
+            paths.add("/")
+
+    if not paths:
+        return InvalidationPlan([], 0, len(live_keys))
+
+    patterns = collapse_paths(paths, max_paths, max_wildcards)
+    invalidated = sum(1 for key in live_keys if _covered(f"/{key}", patterns))
+    return InvalidationPlan(patterns, invalidated, len(live_keys) - invalidated)
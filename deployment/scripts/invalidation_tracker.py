@@ -0,0 +1,105 @@
+"""
+CloudFront Invalidation Tracker
+===============================
+
+Waits until CloudFront invalidations have completed, i.e. until the new
+content is what the edge serves. Every invalidation is polled with
+``GetInvalidation`` on its own asyncio task using jittered exponential
+backoff, so any number of invalidations across distributions are tracked
+concurrently without hammering the API. An optional deadline bounds the
+wait; the measured time-to-live of each invalidation is returned for the
+deploy history.
+"""
+
+import asyncio
+import functools
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+COMPLETED = "Completed"
+BASE_DELAY = 2.0
+MAX_DELAY = 30.0
+
+
+@dataclass
+class TrackedInvalidation:
+    """An invalidation being waited on"""
+    distribution_id: str
+    invalidation_id: str
+    created: float = field(default_factory=time.monotonic)
+    status: str = "InProgress"
+    # Seconds from creation until CloudFront reported it completed
+    seconds: Optional[float] = None
+
+    @property
+    def completed(self) -> bool:
+        return self.status == COMPLETED
+
+
+class InvalidationTracker:
+    """Poll many invalidations concurrently until they complete or a deadline passes"""
+
+    def __init__(self, cloudfront_client, base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY,
+                 max_workers: int = 16):
+        self.cloudfront = cloudfront_client
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_workers = max_workers
+
+    def next_delay(self, delay: float) -> float:
+        """Decorrelated jitter: spread polls out while backing off"""
+        return min(self.max_delay, random.uniform(self.base_delay, delay * 3))
+
+    async def _status(self, executor: ThreadPoolExecutor, invalidation: TrackedInvalidation) -> str:
+        # boto3 is blocking; its client is thread-safe, so polls run on a small pool
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(executor, functools.partial(
+            self.cloudfront.get_invalidation,
+            DistributionId=invalidation.distribution_id,
+            Id=invalidation.invalidation_id,
+        ))
+        return response["Invalidation"]["Status"]
+
+    async def _track(self, executor: ThreadPoolExecutor, invalidation: TrackedInvalidation,
+                     deadline: Optional[float]) -> TrackedInvalidation:
+        delay = self.base_delay
+        while True:
+            invalidation.status = await self._status(executor, invalidation)
+            if invalidation.completed:
+                invalidation.seconds = time.monotonic() - invalidation.created
+                logger.info(
+                    f"OK Invalidation {invalidation.invalidation_id} on {invalidation.distribution_id} "
+                    f"completed after {invalidation.seconds:.1f}s"
+                )
+                return invalidation
+
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                logger.warning(
+                    f"Invalidation {invalidation.invalidation_id} on {invalidation.distribution_id} "
+                    f"still {invalidation.status} at the deadline"
+                )
+                return invalidation
+
+            delay = self.next_delay(delay)
+            await asyncio.sleep(delay if remaining is None else min(delay, remaining))
+
+    async def _track_all(self, invalidations: List[TrackedInvalidation],
+                         timeout: Optional[float]) -> List[TrackedInvalidation]:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(1, len(invalidations)))) as executor:
+            return await asyncio.gather(*(self._track(executor, i, deadline) for i in invalidations))
+
+    def wait(self, invalidations: List[TrackedInvalidation], timeout: Optional[float] = None) -> List[TrackedInvalidation]:
+        """Block until every invalidation completed or timeout seconds passed"""
+        if not invalidations:
+            return []
+        logger.info(f"Waiting for {len(invalidations)} invalidation(s) to complete"
+                    + (f" (deadline {timeout:g}s)" if timeout is not None else ""))
+        return asyncio.run(self._track_all(invalidations, timeout))
@@ -0,0 +1,267 @@
+"""
+Content-Hash Manifest Delta Uploader
+====================================
+
+Builds a SHA-256 manifest of the local ``build/`` tree and compares it with
+the manifest stored in the bucket by the previous release. Only objects whose
+content or upload metadata changed are transferred, through a bounded thread
+pool, and objects that disappeared from the build are deleted.
+
+The remote manifest is written last, so an interrupted deploy simply diffs
+against the previous release again on the next run. Digests of unchanged
+files are reused from the hashing engine's stat cache (see ``hashing.py``),
+so building the manifest of a large tree does not re-read every file.
+
+Without a remote manifest (the first deploy after ``aws s3 sync``) the
+bucket is listed instead, and objects whose ETag equals the ETag the local
+file would get are not uploaded again.
+"""
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from errors import DeploymentError
+from hashing import FileHasher
+from object_policy import policy_for
+from transfer import FileTransfer, TransferEngine, report_transfers
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_KEY = ".deploy-manifest.json"
+MANIFEST_VERSION = 1
+
+# Deploy bookkeeping documents (manifests, release pointer)
+NO_CACHE_CONTROL = "no-cache, no-store, must-revalidate"
+
+# Files uploaded after everything else so they never reference missing chunks
+ENTRY_FILES = {"index.html"}
+
+DELETE_BATCH_SIZE = 1000
+
+
+@dataclass
+class ManifestDiff:
+    """Result of comparing the local manifest with the remote one"""
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    # True when there was no previous manifest to compare against
+    full_upload: bool = False
+
+    @property
+    def to_upload(self) -> List[str]:
+        return self.added + self.changed
+
+    def summary(self) -> str:
+        return (f"{len(self.added)} added, {len(self.changed)} changed, "
+                f"{len(self.unchanged)} unchanged, {len(self.deleted)} deleted")
+
+
+def walk_files(root: Path) -> Iterator[Tuple[str, str]]:
+    """Yield (key, path) for every file under root, using scandir's cached file types"""
+    stack = [(str(root), "")]
+    while stack:
+        directory, prefix = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, f"{prefix}{entry.name}/"))
+                elif entry.is_file():
+                    yield f"{prefix}{entry.name}", entry.path
+
+
+def build_manifest(build_dir: Path, hasher: Optional[FileHasher] = None) -> Dict:
+    """Build a content-hash manifest of every file in the build directory"""
+    hasher = hasher or FileHasher()
+    paths = dict(sorted(walk_files(build_dir)))
+    digests = hasher.hash_files(paths.values())
+    hasher.save()
+
+    files = {}
+    for key, path in paths.items():
+        digest = digests[path]
+        policy = policy_for(key)
+        entry = {
+            "sha256": digest.sha256,
+            "size": digest.size,
+            "cache_control": policy.cache_control,
+            "content_type": policy.content_type,
+        }
+        if policy.content_encoding:
+            entry["content_encoding"] = policy.content_encoding
+        files[key] = entry
+    return {
+        "version": MANIFEST_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": files,
+    }
+
+
+def load_remote_manifest(s3_client, bucket_name: str, key: str = MANIFEST_KEY) -> Optional[Dict]:
+    """Fetch the manifest stored by the previous release, if any"""
+    try:
+        response = s3_client.get_object(Bucket=bucket_name, Key=key)
+    except s3_client.exceptions.NoSuchKey:
+        return None
+
+    manifest = json.loads(response["Body"].read())
+    if manifest.get("version") != MANIFEST_VERSION:
+        logger.warning(f"Ignoring remote manifest with unsupported version: {manifest.get('version')}")
+        return None
+    return manifest
+
+
+def delete_keys(s3_client, bucket_name: str, keys: List[str]) -> None:
+    """Delete objects in batches of up to 1000 keys"""
+    for start in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[start:start + DELETE_BATCH_SIZE]
+        response = s3_client.delete_objects(
+            Bucket=bucket_name,
+            Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+        )
+        errors = response.get("Errors", [])
+        if errors:
+            raise DeploymentError(f"Failed to delete {len(errors)} object(s), e.g. {errors[0].get('Key')}")
+
+
+def diff_manifests(local: Dict, remote: Optional[Dict]) -> ManifestDiff:
+    """Compare two manifests entry by entry"""
+    diff = ManifestDiff()
+    remote_files = remote["files"] if remote else {}
+
+    for key, entry in local["files"].items():
+        previous = remote_files.get(key)
+        if previous is None:
+            diff.added.append(key)
+        elif previous != entry:
+            diff.changed.append(key)
+        else:
+            diff.unchanged.append(key)
+
+    diff.deleted = sorted(set(remote_files) - set(local["files"]))
+    diff.full_upload = remote is None
+    return diff
+
+
+class DeltaUploader:
+    """Upload only the objects whose content hash changed since the last release"""
+
+    def __init__(self, engine: TransferEngine, bucket_name: str, build_dir: Path, max_workers: Optional[int] = None,
+                 key_prefix: str = "", hasher: Optional[FileHasher] = None):
+        self.engine = engine
+        self.s3 = engine.s3
+        self.bucket_name = bucket_name
+        self.build_dir = build_dir
+        # Prepended to every object key, e.g. "releases/<build-id>/"
+        self.key_prefix = key_prefix
+        self.max_workers = max_workers or engine.max_concurrency
+        self.hasher = hasher or FileHasher()
+        # Transfers of the last upload()
+        self.transfers: List[FileTransfer] = []
+
+    def list_bucket_etags(self) -> Dict[str, str]:
+        """ETag of every object under the prefix (only needed when no manifest exists yet)"""
+        etags = {}
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self.key_prefix):
+            for obj in page.get("Contents", []):
+                etags[obj["Key"][len(self.key_prefix):]] = obj["ETag"].strip('"')
+        return etags
+
+    def list_bucket_keys(self) -> List[str]:
+        """List every key under the prefix"""
+        return list(self.list_bucket_etags())
+
+    def matching_etags(self, keys: List[str], remote_etags: Dict[str, str]) -> List[str]:
+        """Keys whose object in the bucket already has the local content (same S3 ETag)"""
+        candidates = [key for key in keys if key in remote_etags]
+        digests = self.hasher.hash_files(self.build_dir / key for key in candidates)
+        return [key for key in candidates if digests[str(self.build_dir / key)].etag == remote_etags[key]]
+
+    def upload_file(self, key: str, entry: Dict) -> FileTransfer:
+        """Upload a single build file with its manifest metadata"""
+        extra_args = {
+            "CacheControl": entry["cache_control"],
+            "ContentType": entry["content_type"],
+        }
+        if "content_encoding" in entry:
+            extra_args["ContentEncoding"] = entry["content_encoding"]
+        return self.engine.upload_file(self.build_dir / key, self.bucket_name, self.key_prefix + key,
+                                       extra_args=extra_args)
+
+    def upload_files(self, keys: List[str], manifest: Dict) -> List[FileTransfer]:
+        """Upload a batch of files through the bounded thread pool; returns their transfer records"""
+        if not keys:
+            return []
+
+        transfers = []
+        failures = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.upload_file, key, manifest["files"][key]): key
+                for key in keys
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    transfers.append(future.result())
+                except Exception as e:
+                    logger.error(f"Upload failed for {key}: {e}")
+                    failures.append(key)
+
+        if failures:
+            raise DeploymentError(f"{len(failures)} file(s) failed to upload")
+        return transfers
+
+    def delete_keys(self, keys: List[str]) -> None:
+        """Delete objects in batches of up to 1000 keys"""
+        delete_keys(self.s3, self.bucket_name, [self.key_prefix + key for key in keys])
+
+    def write_manifest(self, manifest: Dict) -> None:
+        """Store the manifest in the bucket for the next release"""
+        self.s3.put_object(
+            Bucket=self.bucket_name,
+            Key=self.key_prefix + MANIFEST_KEY,
+            Body=json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"),
+            ContentType="application/json",
+            CacheControl=NO_CACHE_CONTROL,
+        )
+
+    def upload(self, delete: bool = True) -> ManifestDiff:
+        """Diff the build against the remote manifest and upload the changes"""
+        local = build_manifest(self.build_dir, self.hasher)
+        remote = load_remote_manifest(self.s3, self.bucket_name, self.key_prefix + MANIFEST_KEY)
+        diff = diff_manifests(local, remote)
+
+        if remote is None:
+            logger.info("No remote manifest found, comparing with the objects in the bucket")
+            # Bootstrap: find leftovers from a previous `aws s3 sync` deploy and the objects it left intact
+            remote_etags = self.list_bucket_etags()
+            diff.deleted = sorted(set(remote_etags) - set(local["files"]) - {MANIFEST_KEY})
+            present = set(self.matching_etags(diff.added, remote_etags))
+            if present:
+                logger.info(f"{len(present)} object(s) already in the bucket with the same content, not uploaded "
+                            f"(--audit-metadata checks their headers)")
+                diff.added = [key for key in diff.added if key not in present]
+                diff.unchanged = sorted(present)
+
+        logger.info(f"Upload plan: {diff.summary()}")
+
+        to_upload = diff.to_upload
+        start = time.perf_counter()
+        self.transfers = self.upload_files([key for key in to_upload if key not in ENTRY_FILES], local)
+        self.transfers += self.upload_files([key for key in to_upload if key in ENTRY_FILES], local)
+        report_transfers(self.transfers, time.perf_counter() - start)
+
+        if delete and diff.deleted:
+            self.delete_keys(diff.deleted)
+
+        self.write_manifest(local)
+        return diff
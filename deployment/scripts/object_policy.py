@@ -0,0 +1,190 @@
+"""
+Object Metadata Policy
+======================
+
+Classifies every uploaded object and assigns its ``Cache-Control``,
+``Content-Type`` and ``Content-Encoding`` from one rule table:
+
+- content-hashed names (``main.1a2b3c4d.js``, ``logo.6ce24c58.svg``) never
+  change under the same name and are cached for a year, ``immutable``
+- HTML entry documents and service workers (``index.html``, ``sw.js``) are
+  revalidated on every request, so a new release is picked up at once
+- web manifests (``manifest.json``) are revalidated on every request too
+- other unhashed static files (``favicon.svg``, ``logo*.svg``, ``robots.txt``)
+  are cached briefly and then revalidated with a cheap conditional GET
+
+Precompressed ``.br``/``.gz`` variants get the policy of their source file
+plus ``Content-Encoding``. Content types come from a fixed table for the
+files a CRA build produces, so they do not depend on the host's mimetypes
+registry.
+
+``MetadataAuditor`` compares the metadata of objects already in the bucket
+with the policy and can rewrite drifted objects in place (server-side).
+"""
+
+import logging
+import mimetypes
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import Callable, Dict, List, Optional, Tuple
+
+from errors import DeploymentError
+from precompress import variant_encoding
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+MANIFEST_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+STATIC_CACHE_CONTROL = "public, max-age=3600, must-revalidate"
+
+# CRA output names: main.1a2b3c4d.js, 787.4f1e2d3c.chunk.js, logo.6ce24c58.svg,
+# plus their source maps, license files and precompressed .br/.gz variants
+CONTENT_HASH_PATTERN = re.compile(r"\.[0-9a-f]{8,}(\.chunk)?\.[A-Za-z0-9]+(\.map|\.LICENSE\.txt)?(\.br|\.gz)?$")
+
+SERVICE_WORKERS = {"sw.js", "service-worker.js"}
+WEB_MANIFESTS = {"manifest.json", "site.webmanifest", "manifest.webmanifest"}
+
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".js": "application/javascript",
+    ".mjs": "application/javascript",
+    ".css": "text/css",
+    ".json": "application/json",
+    ".map": "application/json",
+    ".webmanifest": "application/manifest+json",
+    ".txt": "text/plain; charset=utf-8",
+    ".xml": "application/xml",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+    ".ico": "image/x-icon",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+    ".ttf": "font/ttf",
+    ".otf": "font/otf",
+    ".eot": "application/vnd.ms-fontobject",
+    ".wasm": "application/wasm",
+}
+
+
+@dataclass(frozen=True)
+class ObjectPolicy:
+    """Upload metadata of one object"""
+    kind: str
+    cache_control: str
+    content_type: str
+    content_encoding: Optional[str] = None
+
+
+def is_content_hashed(key: str) -> bool:
+    """Return True if the object name embeds its content hash"""
+    return CONTENT_HASH_PATTERN.search(key) is not None
+
+
+def source_key(key: str) -> str:
+    """The file a precompressed variant was made from (the key itself otherwise)"""
+    return key.rsplit(".", 1)[0] if variant_encoding(key) else key
+
+
+# (kind, matcher on the source key, Cache-Control); the first match wins
+POLICY_RULES: List[Tuple[str, Callable[[str], bool], str]] = [
+    ("hashed", is_content_hashed, IMMUTABLE_CACHE_CONTROL),
+    ("html", lambda key: key.endswith(".html"), REVALIDATE_CACHE_CONTROL),
+    ("service_worker", lambda key: PurePosixPath(key).name in SERVICE_WORKERS, REVALIDATE_CACHE_CONTROL),
+    ("web_manifest", lambda key: PurePosixPath(key).name in WEB_MANIFESTS, MANIFEST_CACHE_CONTROL),
+    ("static", lambda key: True, STATIC_CACHE_CONTROL),
+]
+
+
+def content_type_for(key: str) -> str:
+    """Content-Type of an object key (precompressed variants keep their source type)"""
+    key = source_key(key)
+    if PurePosixPath(key).name in WEB_MANIFESTS:
+        return CONTENT_TYPES[".webmanifest"]
+    content_type = CONTENT_TYPES.get(PurePosixPath(key).suffix.lower())
+    if content_type:
+        return content_type
+    content_type, _ = mimetypes.guess_type(key)
+    return content_type or "application/octet-stream"
+
+
+def policy_for(key: str) -> ObjectPolicy:
+    """Classify a build-relative key and return its upload metadata"""
+    source = source_key(key)
+    for kind, matches, cache_control in POLICY_RULES:
+        if matches(source):
+            return ObjectPolicy(kind, cache_control, content_type_for(key), variant_encoding(key))
+    raise AssertionError("the last policy rule matches every key")
+
+
+@dataclass
+class MetadataDrift:
+    """An object whose stored metadata differs from its policy"""
+    key: str
+    policy: ObjectPolicy
+    # Field name -> (stored, expected)
+    fields: Dict[str, Tuple[Optional[str], Optional[str]]]
+
+    def describe(self) -> str:
+        changes = ", ".join(f"{name}: {stored!r} -> {expected!r}" for name, (stored, expected) in self.fields.items())
+        return f"{self.key} ({self.policy.kind}): {changes}"
+
+
+class MetadataAuditor:
+    """Compare object metadata in the bucket with the policy and repair drift server-side"""
+
+    def __init__(self, engine, bucket_name: str, max_workers: Optional[int] = None):
+        self.engine = engine
+        self.s3 = engine.s3
+        self.bucket_name = bucket_name
+        self.max_workers = max_workers or engine.max_concurrency
+
+    def check(self, key: str, policy_key: str) -> Optional[MetadataDrift]:
+        """HEAD one object; policy_key is the build-relative name it was uploaded from"""
+        head = self.s3.head_object(Bucket=self.bucket_name, Key=key)
+        policy = policy_for(policy_key)
+        stored = {
+            "CacheControl": head.get("CacheControl"),
+            "ContentType": head.get("ContentType"),
+            "ContentEncoding": head.get("ContentEncoding"),
+        }
+        expected = {
+            "CacheControl": policy.cache_control,
+            "ContentType": policy.content_type,
+            "ContentEncoding": policy.content_encoding,
+        }
+        fields = {name: (stored[name], expected[name]) for name in stored if stored[name] != expected[name]}
+        return MetadataDrift(key, policy, fields) if fields else None
+
+    def audit(self, keys: Dict[str, str]) -> List[MetadataDrift]:
+        """Check every bucket key (mapped to its build-relative name) in parallel"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(lambda item: self.check(*item), sorted(keys.items()))
+            return [drift for drift in results if drift is not None]
+
+    def fix(self, drifts: List[MetadataDrift]) -> None:
+        """Rewrite the metadata of drifted objects with in-place copies"""
+        def rewrite(drift: MetadataDrift) -> None:
+            metadata = {"CacheControl": drift.policy.cache_control, "ContentType": drift.policy.content_type}
+            if drift.policy.content_encoding:
+                metadata["ContentEncoding"] = drift.policy.content_encoding
+            self.engine.copy_object(self.bucket_name, drift.key, self.bucket_name, drift.key, metadata=metadata)
+
+        failures = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {drift.key: executor.submit(rewrite, drift) for drift in drifts}
+        for key, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"Metadata rewrite failed for {key}: {e}")
+                failures.append(key)
+        if failures:
+            raise DeploymentError(f"{len(failures)} object(s) failed to update")
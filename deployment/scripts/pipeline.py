@@ -0,0 +1,134 @@
+"""
+DAG Deploy Pipeline
+===================
+
+Expresses the deploy workflow as a dependency graph of stages and runs every
+stage as soon as its dependencies have finished, so independent work (the
+npm build and the Terraform apply) overlaps and the total wall-clock time is
+the critical path rather than the sum of all steps.
+
+When a stage fails or the run is interrupted (Ctrl-C), no further stages
+are started, queued ones are cancelled, the ``on_cancel`` hook is called so
+running siblings can stop their subprocesses, and the first error is
+re-raised once every running stage has returned.
+"""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from errors import DeploymentError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Stage:
+    """A unit of deploy work; func receives the results of finished stages"""
+    name: str
+    func: Callable[[Dict[str, Any]], Any]
+    depends_on: Sequence[str] = ()
+
+
+class Pipeline:
+    """Run stages concurrently in dependency order"""
+
+    def __init__(self, stages: List[Stage], max_workers: int = 4,
+                 on_cancel: Optional[Callable[[], None]] = None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers
+        self.on_cancel = on_cancel
+        self.durations: Dict[str, float] = {}
+        self.validate()
+
+    def validate(self) -> None:
+        """Reject unknown dependencies and cycles"""
+        for stage in self.stages.values():
+            for dependency in stage.depends_on:
+                if dependency not in self.stages:
+                    raise DeploymentError(f"Stage '{stage.name}' depends on unknown stage '{dependency}'")
+
+        visiting, done = set(), set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise DeploymentError(f"Dependency cycle detected at stage '{name}'")
+            visiting.add(name)
+            for dependency in self.stages[name].depends_on:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def _timed(self, stage: Stage, results: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return stage.func(results)
+        finally:
+            self.durations[stage.name] = time.perf_counter() - start
+
+    def _cancel(self, running: Dict[Future, Stage], pending: Dict[str, Stage]) -> None:
+        """Drop queued stages and let running ones stop their subprocesses"""
+        if running or pending:
+            logger.info(f"Cancelling {len(running)} running and {len(pending)} pending stage(s)")
+        for future in running:
+            future.cancel()
+        if self.on_cancel:
+            self.on_cancel()
+
+    def run(self) -> Dict[str, Any]:
+        """Execute the graph and return each stage's result by name"""
+        results: Dict[str, Any] = {}
+        pending = dict(self.stages)
+        running = {}
+        error: Optional[BaseException] = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if error is None:
+                    ready = [
+                        stage for stage in pending.values()
+                        if all(dependency in results for dependency in stage.depends_on)
+                    ]
+                    for stage in ready:
+                        del pending[stage.name]
+                        logger.info(f"STAGE {stage.name} started")
+                        running[executor.submit(self._timed, stage, dict(results))] = stage
+
+                if not running:
+                    break
+
+                try:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                except KeyboardInterrupt as e:
+                    # Ctrl-C lands in this thread, not in the stages; stop them before waiting again
+                    if error is None:
+                        error = e
+                        logger.error("Interrupted")
+                    self._cancel(running, pending)
+                    continue
+                for future in finished:
+                    stage = running.pop(future)
+                    if future.cancelled():
+                        logger.info(f"STAGE {stage.name} cancelled before it started")
+                        continue
+                    try:
+                        results[stage.name] = future.result()
+                        logger.info(f"STAGE {stage.name} finished in {self.durations[stage.name]:.2f}s")
+                    except BaseException as e:
+                        if error is None:
+                            error = e
+                            logger.error(f"STAGE {stage.name} failed: {e}")
+                            self._cancel(running, pending)
+                        else:
+                            logger.info(f"STAGE {stage.name} stopped: {e}")
+
+        if error is not None:
+            raise error
+        return results
@@ -0,0 +1,164 @@
+"""
+Precompressed Asset Stage
+=========================
+
+Post-build stage that writes ``<file>.br`` and ``<file>.gz`` variants next to
+every eligible text asset in ``build/``, compressed at maximum Brotli and
+gzip levels in a process pool. Compressed output is cached on disk by the
+SHA-256 of the source file, so unchanged chunks are never compressed twice.
+
+The variants are uploaded with ``Content-Encoding`` metadata and served by
+the ``precompressed-assets`` CloudFront Function (see terraform/cloudfront.tf),
+which rewrites requests according to the viewer's ``Accept-Encoding``.
+Every eligible file must get both variants, because that function routes by
+extension alone; the eligible extensions below must stay in sync with it.
+"""
+
+import gzip
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import brotli
+
+from hashing import FileHasher
+
+ELIGIBLE_EXTENSIONS = {".html", ".js", ".css", ".svg", ".json", ".txt", ".map", ".xml"}
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+SUFFIX_ENCODINGS = {suffix: encoding for encoding, suffix in ENCODING_SUFFIXES.items()}
+
+BROTLI_QUALITY = 11
+GZIP_LEVEL = 9
+CACHE_VERSION = f"v1-br{BROTLI_QUALITY}-gz{GZIP_LEVEL}"
+
+
+@dataclass
+class PrecompressResult:
+    """Summary of a precompression run"""
+    files: int = 0
+    variants: int = 0
+    cache_hits: int = 0
+    compressed: int = 0
+    original_bytes: int = 0
+    brotli_bytes: int = 0
+    gzip_bytes: int = 0
+
+
+def variant_encoding(key: str) -> Optional[str]:
+    """Return the Content-Encoding of a precompressed variant key, or None"""
+    path = Path(key)
+    if path.suffix in SUFFIX_ENCODINGS and Path(path.stem).suffix in ELIGIBLE_EXTENSIONS:
+        return SUFFIX_ENCODINGS[path.suffix]
+    return None
+
+
+def is_variant(path: Path) -> bool:
+    """Return True for a precompressed variant written by this stage"""
+    return variant_encoding(path.name) is not None
+
+
+def is_eligible(path: Path) -> bool:
+    """Return True if a build file should get precompressed variants"""
+    return path.suffix in ELIGIBLE_EXTENSIONS
+
+
+def _write_atomic(target: Path, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, target)
+
+
+def is_placed(cached: Path, target: Path) -> bool:
+    """True if target is an untouched copy of cached (copy2 keeps the cache file's mtime)"""
+    try:
+        source, placed = cached.stat(), target.stat()
+    except FileNotFoundError:
+        return False
+    return (placed.st_size, placed.st_mtime_ns) == (source.st_size, source.st_mtime_ns)
+
+
+def compress_to_cache(source: str, cache_paths: Dict[str, str]) -> Tuple[str, Dict[str, int]]:
+    """Compress one file into the cache (runs in a worker process)"""
+    data = Path(source).read_bytes()
+    sizes = {}
+    for encoding, cache_path in cache_paths.items():
+        if encoding == "br":
+            payload = brotli.compress(data, quality=BROTLI_QUALITY, mode=brotli.MODE_TEXT)
+        else:
+            # mtime=0 keeps the output byte-identical across builds
+            payload = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+        _write_atomic(Path(cache_path), payload)
+        sizes[encoding] = len(payload)
+    return source, sizes
+
+
+class Precompressor:
+    """Write cached Brotli/gzip variants for eligible build assets"""
+
+    def __init__(self, build_dir: Path, cache_dir: Path, max_workers: int = None,
+                 hasher: Optional[FileHasher] = None):
+        self.build_dir = build_dir
+        self.cache_dir = cache_dir / CACHE_VERSION
+        self.max_workers = max_workers
+        self.hasher = hasher or FileHasher()
+
+    def cache_path(self, digest: str, encoding: str) -> Path:
+        return self.cache_dir / digest[:2] / f"{digest}{ENCODING_SUFFIXES[encoding]}"
+
+    def remove_stale_variants(self) -> None:
+        """Drop variants whose source file no longer exists"""
+        for path in self.build_dir.rglob("*"):
+            if path.is_file() and is_variant(path) and not path.with_suffix("").exists():
+                path.unlink()
+
+    def run(self) -> PrecompressResult:
+        """Precompress every eligible file, compressing only cache misses"""
+        self.remove_stale_variants()
+        result = PrecompressResult()
+        sources = [p for p in sorted(self.build_dir.rglob("*")) if p.is_file() and is_eligible(p)]
+
+        pending = {}
+        placements = []
+        digests = self.hasher.hash_files(sources)
+        self.hasher.save()
+        for source in sources:
+            digest = digests[str(source)].sha256
+            result.files += 1
+            result.original_bytes += digests[str(source)].size
+            missing = {}
+            for encoding in ENCODING_SUFFIXES:
+                cached = self.cache_path(digest, encoding)
+                placements.append((cached, Path(f"{source}{ENCODING_SUFFIXES[encoding]}"), encoding))
+                if cached.exists():
+                    result.cache_hits += 1
+                else:
+                    cached.parent.mkdir(parents=True, exist_ok=True)
+                    missing[encoding] = str(cached)
+            if missing:
+                pending[str(source)] = missing
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(compress_to_cache, source, paths) for source, paths in pending.items()]
+                for future in futures:
+                    _, sizes = future.result()
+                    result.compressed += len(sizes)
+
+        for cached, target, encoding in placements:
+            # Rewriting an unchanged variant would change its mtime and inode and
+            # make every FileHasher lookup of the build tree miss on the next run
+            if not is_placed(cached, target):
+                shutil.copy2(cached, target)
+            result.variants += 1
+            size = target.stat().st_size
+            if encoding == "br":
+                result.brotli_bytes += size
+            else:
+                result.gzip_bytes += size
+
+        return result
@@ -0,0 +1,220 @@
+"""
+Deploy Phase Profiler
+=====================
+
+Times every deploy stage (prerequisites, install, build, terraform
+init/plan/apply, upload, invalidation ...) and appends one structured JSON
+record per run to a local history file. ``deploy.py --profile-report`` reads
+that history, shows the recent trend of each stage and flags stages whose
+latest duration regressed beyond a threshold compared to the rolling median.
+Runs made with ``--wait`` also record how long CloudFront took to serve the
+new content; the report shows those times as a histogram.
+"""
+
+import json
+import logging
+import statistics
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FILE = "deploy-history.jsonl"
+HISTORY_VERSION = 1
+
+
+def current_revision(project_root: Path) -> Optional[str]:
+    """Short git revision of the deployed tree, if available"""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=project_root, capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+class DeployProfiler:
+    """Collect per-stage timings for one deploy run"""
+
+    def __init__(self, history_path: Path, environment: str, revision: Optional[str] = None):
+        self.history_path = history_path
+        self.environment = environment
+        self.revision = revision
+        self.started_at = time.time()
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, **fields: Any) -> None:
+        """Record (or extend) the measurements of a stage"""
+        with self._lock:
+            entry = self.stages.setdefault(name, {})
+            entry["seconds"] = round(seconds, 3)
+            entry.update(fields)
+
+    def annotate(self, name: str, **fields: Any) -> None:
+        """Attach extra metrics (bytes, object counts ...) to a stage"""
+        with self._lock:
+            self.stages.setdefault(name, {}).update(fields)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block of work as a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def save(self, status: str) -> Dict[str, Any]:
+        """Append this run to the history file"""
+        record = {
+            "version": HISTORY_VERSION,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started_at)),
+            "environment": self.environment,
+            "revision": self.revision,
+            "status": status,
+            "total_seconds": round(time.time() - self.started_at, 3),
+            "stages": self.stages,
+        }
+        self.history_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.history_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, sort_keys=True) + "\n")
+        return record
+
+
+def load_history(history_path: Path, environment: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Read history records, oldest first, skipping unreadable lines"""
+    records = []
+    try:
+        with open(history_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if environment is None or record.get("environment") == environment:
+                    records.append(record)
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def find_regressions(history: List[Dict[str, Any]], window: int = 10, threshold: float = 0.25,
+                     min_seconds: float = 1.0) -> List[Dict[str, Any]]:
+    """Compare the latest successful run against the rolling median of earlier ones"""
+    successful = [record for record in history if record.get("status") == "success"]
+    if len(successful) < 2:
+        return []
+
+    latest, previous = successful[-1], successful[-1 - window:-1]
+    regressions = []
+    for name, entry in latest["stages"].items():
+        samples = [record["stages"][name]["seconds"] for record in previous
+                   if "seconds" in record["stages"].get(name, {})]
+        if not samples or "seconds" not in entry:
+            continue
+        median = statistics.median(samples)
+        seconds = entry["seconds"]
+        if seconds - median >= min_seconds and seconds > median * (1 + threshold):
+            regressions.append({
+                "stage": name,
+                "seconds": seconds,
+                "median": median,
+                "ratio": seconds / median if median else float("inf"),
+                "revision": latest.get("revision"),
+            })
+    return regressions
+
+
+def upload_throughput(history: List[Dict[str, Any]], window: int = 10) -> Optional[float]:
+    """Median upload rate in bytes/s over recent successful runs that uploaded data"""
+    rates = [
+        record["stages"]["upload"]["bytes"] / record["stages"]["upload"]["seconds"]
+        for record in history
+        if record.get("status") == "success"
+        and record.get("stages", {}).get("upload", {}).get("bytes")
+        and record["stages"]["upload"].get("seconds")
+    ]
+    return statistics.median(rates[-window:]) if rates else None
+
+
+def time_to_live_samples(history: List[Dict[str, Any]]) -> List[float]:
+    """CloudFront time-to-live of every run that waited for its invalidation"""
+    return [
+        entry["time_to_live_seconds"]
+        for record in history
+        for entry in record.get("stages", {}).values()
+        if "time_to_live_seconds" in entry
+    ]
+
+
+def latency_histogram(samples: List[float], bucket_seconds: int = 60) -> List[str]:
+    """Text histogram of latencies in fixed-width buckets"""
+    if not samples:
+        return []
+    counts: Dict[int, int] = {}
+    for sample in samples:
+        bucket = int(sample // bucket_seconds)
+        counts[bucket] = counts.get(bucket, 0) + 1
+
+    lines = []
+    for bucket in range(min(counts), max(counts) + 1):
+        count = counts.get(bucket, 0)
+        label = f"{bucket * bucket_seconds}-{(bucket + 1) * bucket_seconds}s"
+        lines.append(f"  {label:>12} {'#' * count} {count}")
+    return lines
+
+
+def profile_report(history: List[Dict[str, Any]], window: int = 10, threshold: float = 0.25) -> List[Dict[str, Any]]:
+    """Log stage trends for recent runs and return the flagged regressions"""
+    if not history:
+        logger.info("No deploy history recorded yet")
+        return []
+
+    recent = history[-window:]
+    logger.info(f"Deploy history: {len(history)} run(s), showing the last {len(recent)}")
+    for record in recent:
+        logger.info(
+            f"  {record['started_at']} {record.get('environment', '?'):8} "
+            f"{record.get('revision') or '-':10} {record.get('status', '?'):8} "
+            f"{record.get('total_seconds', 0):8.1f}s"
+        )
+
+    stage_names = []
+    for record in recent:
+        for name in record.get("stages", {}):
+            if name not in stage_names:
+                stage_names.append(name)
+
+    logger.info("Stage trends (seconds, oldest -> newest):")
+    for name in stage_names:
+        values = [record["stages"].get(name, {}).get("seconds") for record in recent]
+        trend = " ".join(f"{value:.1f}" if value is not None else "-" for value in values)
+        logger.info(f"  {name:20} {trend}")
+
+    samples = time_to_live_samples(history)
+    if samples:
+        logger.info(
+            f"CloudFront time-to-live over {len(samples)} run(s): median {statistics.median(samples):.0f}s, "
+            f"max {max(samples):.0f}s"
+        )
+        for line in latency_histogram(samples):
+            logger.info(line)
+
+    regressions = find_regressions(history, window, threshold)
+    for regression in regressions:
+        logger.warning(
+            f"REGRESSION {regression['stage']}: {regression['seconds']:.1f}s vs median "
+            f"{regression['median']:.1f}s ({regression['ratio']:.2f}x) in revision {regression['revision'] or '?'}"
+        )
+    if not regressions:
+        logger.info(f"OK No stage regressed more than {threshold:.0%} over the rolling median")
+    return regressions
@@ -0,0 +1,441 @@
+"""
+Atomic Versioned Releases
+=========================
+
+Content-hashed files (``static/js/main.1a2b3c4d.js`` ... and their
+precompressed variants) are stored once at their plain key in the bucket
+root and shared by every release: a content-addressed key never changes
+content, so browser and edge caches stay valid across deploys. Only the
+unhashed files (``index.html``, ``sw.js``, ``manifest.json``, ``robots.txt``
+...) are versioned, under ``releases/<build-id>/``, and a release is made
+live by copying those of its files that differ from the live release to
+the bucket root and switching ``releases/current.json``.
+
+Nothing already in the bucket is uploaded or copied again: the release
+manifest records for every unhashed file which release prefix holds it,
+so an unchanged file stays in the release that first published it. The
+first release in a bucket lists the shared keys instead and skips assets
+whose S3 ETag already matches (e.g. left by a plain sync deploy). The
+release manifest is written last and marks a release as complete, so an
+interrupted deploy never touches the live site, and a rollback only copies
+a few small root files and moves the pointer.
+
+Manifests of releases published before the shared layout carry no
+``release`` fields; all of their files live under their own prefix.
+"""
+
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from errors import DeploymentError
+from hashing import FileHasher
+from manifest import (ENTRY_FILES, MANIFEST_KEY, NO_CACHE_CONTROL, DeltaUploader, ManifestDiff,
+                      build_manifest, delete_keys, diff_manifests, load_remote_manifest)
+from object_policy import is_content_hashed
+from precompress import variant_encoding
+from transfer import FileTransfer, TransferEngine, report_transfers
+
+logger = logging.getLogger(__name__)
+
+RELEASES_PREFIX = "releases/"
+POINTER_KEY = f"{RELEASES_PREFIX}current.json"
+POINTER_VERSION = 1
+BUILD_ID_LENGTH = 12
+MAX_HISTORY = 50
+
+
+def build_id_for(fingerprint: str) -> str:
+    """Release id derived from the build input fingerprint"""
+    return fingerprint[:BUILD_ID_LENGTH]
+
+
+def release_prefix(build_id: str) -> str:
+    return f"{RELEASES_PREFIX}{build_id}/"
+
+
+def is_versioned_file(key: str) -> bool:
+    """Unhashed files are kept per release and copied to the bucket root when it goes live"""
+    return not is_content_hashed(key) and key != MANIFEST_KEY
+
+
+def object_key(build_id: str, key: str, entry: Dict) -> str:
+    """Bucket key holding a file of release build_id"""
+    release = entry.get("release", build_id)
+    return key if release is None else release_prefix(release) + key
+
+
+def file_content(entry: Dict) -> Dict:
+    """A release manifest entry without its storage location"""
+    return {name: value for name, value in entry.items() if name != "release"}
+
+
+def release_files(manifest: Optional[Dict]) -> Optional[Dict]:
+    """A release manifest comparable with a local build manifest"""
+    if manifest is None:
+        return None
+    return {"files": {key: file_content(entry) for key, entry in manifest["files"].items()}}
+
+
+def root_files(manifest: Optional[Dict]) -> Optional[Dict]:
+    """The part of a release manifest that is copied to the bucket root"""
+    if manifest is None:
+        return None
+    return {"files": {key: entry for key, entry in release_files(manifest)["files"].items()
+                      if is_versioned_file(key)}}
+
+
+def locate(build_id: Optional[str], local: Dict, previous_id: Optional[str],
+           previous: Optional[Dict]) -> Tuple[Dict, List[str]]:
+    """
+    Release manifest of a local build and the keys that must be uploaded.
+
+    Files identical to the live release keep its storage location; a
+    content-hashed file is only reused from the shared keys (a release in
+    the old layout holds it under its own prefix, so it is uploaded again).
+    """
+    held = previous["files"] if previous else {}
+    manifest = dict(local, files={})
+    uploads = []
+    for key, entry in local["files"].items():
+        location = None
+        if key in held and file_content(held[key]) == entry:
+            location = object_key(previous_id, key, held[key])
+        if is_content_hashed(key):
+            release = None
+        elif location is not None:
+            release = held[key].get("release", previous_id)
+        else:
+            release = build_id
+        if location is None or location != object_key(build_id, key, dict(entry, release=release)):
+            uploads.append(key)
+        manifest["files"][key] = dict(entry, release=release)
+    return manifest, uploads
+
+
+def is_entry_file(key: str) -> bool:
+    if variant_encoding(key):
+        key = key.rsplit(".", 1)[0]
+    return key in ENTRY_FILES
+
+
+@dataclass
+class ReleasePlan:
+    """What publishing and activating a build would do, without doing it"""
+    manifest: Dict
+    previous_id: Optional[str]
+    # Release contents against the live release: new, changed, reused and dropped keys
+    diff: ManifestDiff
+    # Bucket root against the live release, for invalidation
+    root_diff: ManifestDiff
+    # Keys not stored in the bucket yet
+    uploads: List[str] = field(default_factory=list)
+
+    @property
+    def upload_bytes(self) -> int:
+        return sum(self.manifest["files"][key]["size"] for key in self.uploads)
+
+
+@dataclass
+class PublishResult:
+    """Outcome of publishing a build as a release"""
+    build_id: str
+    diff: ManifestDiff = field(default_factory=ManifestDiff)
+    uploaded: int = 0
+    copied: int = 0
+    already_published: bool = False
+    # Uploads of this publish only
+    transfers: List[FileTransfer] = field(default_factory=list)
+
+
+class ReleaseManager:
+    """Publish, activate, list and prune releases in the frontend bucket"""
+
+    def __init__(self, engine: TransferEngine, bucket_name: str, max_workers: Optional[int] = None,
+                 hasher: Optional[FileHasher] = None):
+        self.engine = engine
+        self.s3 = engine.s3
+        self.bucket_name = bucket_name
+        self.max_workers = max_workers or engine.max_concurrency
+        self.hasher = hasher or FileHasher()
+
+    def load_pointer(self) -> Dict:
+        """Return releases/current.json, or an empty pointer before the first release"""
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=POINTER_KEY)
+        except self.s3.exceptions.NoSuchKey:
+            return {}
+        return json.loads(response["Body"].read())
+
+    def current_release(self) -> Optional[str]:
+        return self.load_pointer().get("current")
+
+    def load_release_manifest(self, build_id: str) -> Optional[Dict]:
+        """Manifest of a completely published release, if any"""
+        return load_remote_manifest(self.s3, self.bucket_name, release_prefix(build_id) + MANIFEST_KEY)
+
+    def load_release_json(self, build_id: str, name: str) -> Optional[Dict]:
+        """A JSON document stored alongside a release (outside its manifest), if any"""
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=release_prefix(build_id) + name)
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        return json.loads(response["Body"].read())
+
+    def write_release_json(self, build_id: str, name: str, document: Dict) -> None:
+        """Store a JSON document alongside a release; it is pruned with the release"""
+        self.s3.put_object(
+            Bucket=self.bucket_name,
+            Key=release_prefix(build_id) + name,
+            Body=json.dumps(document, indent=2, sort_keys=True).encode("utf-8"),
+            ContentType="application/json",
+            CacheControl=NO_CACHE_CONTROL,
+        )
+
+    def copy_keys(self, pairs: List[Tuple[str, str]], source_bucket: Optional[str] = None) -> None:
+        """Copy (source, destination) keys into this bucket in parallel"""
+        if not pairs:
+            return
+
+        source_bucket = source_bucket or self.bucket_name
+        failures = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.engine.copy_object, source_bucket, source, self.bucket_name, destination): destination
+                for source, destination in pairs
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Copy failed for {futures[future]}: {e}")
+                    failures.append(futures[future])
+
+        if failures:
+            raise DeploymentError(f"{len(failures)} object(s) failed to copy")
+
+    def refuse_republish(self, build_id: str, local: Dict, existing: Dict) -> None:
+        """
+        A published release is immutable: rewriting its prefix would change
+        the live site behind the pointer, or files that newer releases reuse.
+        """
+        diff = diff_manifests(local, release_files(existing))
+        raise DeploymentError(
+            f"Release {build_id} already exists in {self.bucket_name} with different content "
+            f"({diff.summary()}); published releases are never overwritten, rebuild so build/ matches its inputs"
+        )
+
+    def publish(self, build_id: str, build_dir: Path) -> PublishResult:
+        """Upload the files of a build the bucket does not hold yet and record release build_id"""
+        local = build_manifest(build_dir, self.hasher)
+
+        existing = self.load_release_manifest(build_id)
+        if existing is not None:
+            if release_files(existing)["files"] != local["files"]:
+                self.refuse_republish(build_id, local, existing)
+            logger.info(f"OK Release {build_id} is already published")
+            return PublishResult(build_id, diff_manifests(local, release_files(existing)), already_published=True)
+
+        previous_id = self.current_release()
+        previous = self.load_release_manifest(previous_id) if previous_id else None
+        diff = diff_manifests(local, release_files(previous))
+        manifest, uploads = locate(build_id, local, previous_id, previous)
+        shared_uploader = DeltaUploader(self.engine, self.bucket_name, build_dir, self.max_workers, hasher=self.hasher)
+        shared = [key for key in uploads if manifest["files"][key]["release"] is None]
+        if previous is None and shared:
+            # First release here: shared assets may already be in the bucket (a sync deploy, a lost pointer)
+            present = set(shared_uploader.matching_etags(shared, self.list_shared_objects()))
+            uploads = [key for key in uploads if key not in present]
+            shared = [key for key in shared if key not in present]
+        logger.info(f"Release {build_id} plan (against {previous_id or 'nothing'}): {diff.summary()}, "
+                    f"{len(uploads)} to upload")
+
+        start = time.perf_counter()
+        transfers = shared_uploader.upload_files(shared, manifest)
+        uploader = DeltaUploader(self.engine, self.bucket_name, build_dir, self.max_workers,
+                                 key_prefix=release_prefix(build_id))
+        transfers += uploader.upload_files([key for key in uploads if key not in shared], manifest)
+        report_transfers(transfers, time.perf_counter() - start)
+
+        # Written last: a release without a manifest is incomplete and never activated
+        uploader.write_manifest(manifest)
+        return PublishResult(build_id, diff, uploaded=len(uploads), transfers=transfers)
+
+    def plan(self, build_dir: Path) -> ReleasePlan:
+        """Diff a local build against the live release (two small GETs, no listing)"""
+        local = build_manifest(build_dir, self.hasher)
+        previous_id = self.current_release()
+        previous = self.load_release_manifest(previous_id) if previous_id else None
+        _, uploads = locate(None, local, previous_id, previous)
+        return ReleasePlan(
+            manifest=local,
+            previous_id=previous_id,
+            diff=diff_manifests(local, release_files(previous)),
+            root_diff=diff_manifests(root_files(local), root_files(previous)),
+            uploads=uploads,
+        )
+
+    def promote_from(self, source: "ReleaseManager", build_id: str) -> PublishResult:
+        """Copy a published release from another bucket, server-side and without rebuilding"""
+        source_manifest = source.load_release_manifest(build_id)
+        if source_manifest is None:
+            raise DeploymentError(f"Release {build_id} not found or incomplete in {source.bucket_name}")
+        local = release_files(source_manifest)
+
+        existing = self.load_release_manifest(build_id)
+        if existing is not None:
+            if release_files(existing)["files"] != local["files"]:
+                self.refuse_republish(build_id, local, existing)
+            logger.info(f"OK Release {build_id} is already published in {self.bucket_name}")
+            return PublishResult(build_id, diff_manifests(local, release_files(existing)), already_published=True)
+
+        previous_id = self.current_release()
+        previous = self.load_release_manifest(previous_id) if previous_id else None
+        diff = diff_manifests(local, release_files(previous))
+        if any("release" not in entry for entry in source_manifest["files"].values()):
+            # Built for the old per-release layout, with every asset under its own prefix: copy it as it is
+            manifest, copies = source_manifest, list(local["files"])
+        else:
+            manifest, copies = locate(build_id, local, previous_id, previous)
+        logger.info(f"Promotion plan for {build_id} (against {previous_id or 'nothing'}): {diff.summary()}, "
+                    f"{len(copies)} to copy")
+
+        start = time.perf_counter()
+        # Only the keys this bucket does not hold yet cross buckets
+        self.copy_keys([(object_key(build_id, key, source_manifest["files"][key]),
+                         object_key(build_id, key, manifest["files"][key])) for key in copies],
+                       source_bucket=source.bucket_name)
+        elapsed = time.perf_counter() - start
+        logger.info(f"Copied {len(copies)} object(s) in {elapsed:.2f}s "
+                    f"({len(copies) / elapsed if elapsed else 0:.1f} objects/s)")
+
+        self.write_release_manifest(build_id, manifest)
+        return PublishResult(build_id, diff, copied=len(copies))
+
+    def write_release_manifest(self, build_id: str, manifest: Dict) -> None:
+        """Mark a release as complete"""
+        DeltaUploader(self.engine, self.bucket_name, Path("."), key_prefix=release_prefix(build_id)).write_manifest(manifest)
+
+    def activate(self, build_id: str) -> ManifestDiff:
+        """Point the bucket root at a published release; returns the root-level changes"""
+        manifest = self.load_release_manifest(build_id)
+        if manifest is None:
+            raise DeploymentError(f"Release {build_id} not found or incomplete in {self.bucket_name}")
+
+        pointer = self.load_pointer()
+        previous_id = pointer.get("current")
+        root = root_files(manifest)
+        if previous_id == build_id:
+            logger.info(f"OK Release {build_id} is already live")
+            return diff_manifests(root, root)
+
+        previous = self.load_release_manifest(previous_id) if previous_id else None
+        diff = diff_manifests(root, root_files(previous))
+
+        # Root files identical to the live release stay as they are
+        copies = [(object_key(build_id, key, manifest["files"][key]), key) for key in sorted(diff.to_upload)]
+        # The entry document goes last so it never references a file that is not live yet
+        self.copy_keys([(source, key) for source, key in copies if not is_entry_file(key)])
+        self.copy_keys([(source, key) for source, key in copies if is_entry_file(key)])
+        if diff.deleted:
+            delete_keys(self.s3, self.bucket_name, diff.deleted)
+
+        history = [build_id] + [release for release in pointer.get("history", []) if release != build_id]
+        self.s3.put_object(
+            Bucket=self.bucket_name,
+            Key=POINTER_KEY,
+            Body=json.dumps({
+                "version": POINTER_VERSION,
+                "current": build_id,
+                "previous": previous_id,
+                "activated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "history": history[:MAX_HISTORY],
+            }, indent=2).encode("utf-8"),
+            ContentType="application/json",
+            CacheControl=NO_CACHE_CONTROL,
+        )
+        logger.info(f"OK Release {build_id} is live (previous: {previous_id or 'none'})")
+        return diff
+
+    def verify(self, build_id: str) -> List[str]:
+        """Check that build_id is live; returns the problems found"""
+        problems = []
+        current = self.current_release()
+        if current != build_id:
+            problems.append(f"releases/current.json points at {current}, expected {build_id}")
+        manifest = self.load_release_manifest(build_id) or {"files": {}}
+        for key in sorted(ENTRY_FILES):
+            try:
+                live = self.s3.head_object(Bucket=self.bucket_name, Key=key)["ETag"]
+                stored = object_key(build_id, key, manifest["files"].get(key, {}))
+                published = self.s3.head_object(Bucket=self.bucket_name, Key=stored)["ETag"]
+            except self.s3.exceptions.ClientError as e:
+                problems.append(f"{key}: {e}")
+                continue
+            if live != published:
+                problems.append(f"{key} at the root differs from release {build_id}")
+        return problems
+
+    def list_release_ids(self) -> List[str]:
+        """Every release prefix in the bucket, complete or not"""
+        release_ids = []
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=RELEASES_PREFIX, Delimiter="/"):
+            for common_prefix in page.get("CommonPrefixes", []):
+                release_ids.append(common_prefix["Prefix"][len(RELEASES_PREFIX):].rstrip("/"))
+        return release_ids
+
+    def list_shared_objects(self) -> Dict[str, str]:
+        """ETags of the content-hashed objects outside releases/"""
+        objects = []
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Delimiter="/"):
+            objects.extend(page.get("Contents", []))
+            for common_prefix in page.get("CommonPrefixes", []):
+                if common_prefix["Prefix"] == RELEASES_PREFIX:
+                    continue
+                for subpage in paginator.paginate(Bucket=self.bucket_name, Prefix=common_prefix["Prefix"]):
+                    objects.extend(subpage.get("Contents", []))
+        return {obj["Key"]: obj["ETag"].strip('"') for obj in objects if is_content_hashed(obj["Key"])}
+
+    def prune(self, keep: int) -> List[str]:
+        """Delete all but the newest releases; versioning keeps their objects for 30 more days"""
+        pointer = self.load_pointer()
+        history = pointer.get("history", [])
+        kept = set(history[:keep])
+        if pointer.get("current"):
+            kept.add(pointer["current"])
+
+        # Older releases that hold files the kept releases reuse are kept too, complete
+        referenced = set()
+        shared = set()
+        pending = list(kept)
+        while pending:
+            release = pending.pop()
+            if release in referenced:
+                continue
+            referenced.add(release)
+            manifest = self.load_release_manifest(release) or {"files": {}}
+            for key, entry in manifest["files"].items():
+                holder = entry.get("release", release)
+                if holder is None:
+                    shared.add(key)
+                elif holder not in referenced:
+                    pending.append(holder)
+
+        pruned = [release for release in self.list_release_ids() if release not in referenced]
+        for release in pruned:
+            uploader = DeltaUploader(self.engine, self.bucket_name, Path("."), key_prefix=release_prefix(release))
+            uploader.delete_keys(uploader.list_bucket_keys())
+            logger.info(f"Pruned release {release}")
+
+        if pruned:
+            stale = [key for key in self.list_shared_objects() if key not in shared]
+            if stale:
+                delete_keys(self.s3, self.bucket_name, stale)
+                logger.info(f"Pruned {len(stale)} shared asset(s) no kept release uses")
+        return pruned
@@ -0,0 +1,161 @@
+"""
+Version-Based Restore
+=====================
+
+Puts the frontend bucket (or one prefix of it) back to an earlier state using
+the object versions kept by ``aws_s3_bucket_versioning.frontend``. Every key
+is matched to the version that was current at a point in time, found with a
+paginated ``ListObjectVersions``, and restored with parallel server-side
+``CopyObject`` calls, so no object data passes through the deploy host.
+
+A release can be restored by id even after it was pruned: the restore point
+is the time its manifest was written, which is always its last object, and
+the manifest version of that time names the objects outside the release
+prefix it uses (shared content-hashed assets, files of older releases).
+Noncurrent versions expire after 30 days (``s3.tf``), which bounds how far
+back a restore can go.
+"""
+
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from errors import DeploymentError
+from manifest import MANIFEST_KEY, ManifestDiff, delete_keys
+from releases import release_prefix
+from transfer import TransferEngine
+
+logger = logging.getLogger(__name__)
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO 8601 timestamp; naive values are taken as UTC"""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise DeploymentError(f"Invalid timestamp '{value}', expected ISO 8601 such as 2024-01-31T12:00:00Z")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+@dataclass
+class RestorePlan:
+    """Versions to copy back and keys that did not exist at the restore point"""
+    point_in_time: datetime
+    copies: List[Tuple[str, str]] = field(default_factory=list)
+    deletes: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return (f"{len(self.copies)} to restore, {len(self.deletes)} newer than the restore point, "
+                f"{len(self.unchanged)} unchanged")
+
+    def as_diff(self) -> ManifestDiff:
+        """Describe the restore as a manifest diff, for invalidation planning"""
+        return ManifestDiff(
+            changed=[key for key, _ in self.copies],
+            unchanged=list(self.unchanged),
+            deleted=list(self.deletes),
+        )
+
+    def extend(self, other: "RestorePlan") -> None:
+        self.copies.extend(other.copies)
+        self.deletes.extend(other.deletes)
+        self.unchanged.extend(other.unchanged)
+
+
+class VersionRestorer:
+    """Restore object versions with parallel server-side copies"""
+
+    def __init__(self, engine: TransferEngine, bucket_name: str, max_workers: Optional[int] = None):
+        self.engine = engine
+        self.s3 = engine.s3
+        self.bucket_name = bucket_name
+        self.max_workers = max_workers or engine.max_concurrency
+
+    def list_versions(self, prefix: str = "") -> Dict[str, List[Dict]]:
+        """All versions and delete markers per key, newest first"""
+        versions: Dict[str, List[Dict]] = {}
+        paginator = self.s3.get_paginator("list_object_versions")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for version in page.get("Versions", []):
+                versions.setdefault(version["Key"], []).append(version)
+            for marker in page.get("DeleteMarkers", []):
+                versions.setdefault(marker["Key"], []).append(dict(marker, DeleteMarker=True))
+
+        for key_versions in versions.values():
+            key_versions.sort(key=lambda version: version["LastModified"], reverse=True)
+        return versions
+
+    def plan(self, point_in_time: datetime, prefix: str = "", keys: Optional[Set[str]] = None) -> RestorePlan:
+        """Match every key under prefix (or only the given keys) to the version current at point_in_time"""
+        plan = RestorePlan(point_in_time)
+        for key, key_versions in sorted(self.list_versions(prefix).items()):
+            if keys is not None and key not in keys:
+                continue
+            latest = key_versions[0]
+            target = next((v for v in key_versions if v["LastModified"] <= point_in_time), None)
+
+            if target is None or target.get("DeleteMarker"):
+                # The key did not exist at the restore point
+                if not latest.get("DeleteMarker"):
+                    plan.deletes.append(key)
+            elif target["VersionId"] == latest["VersionId"]:
+                plan.unchanged.append(key)
+            else:
+                plan.copies.append((key, target["VersionId"]))
+        return plan
+
+    def release_manifest_version(self, build_id: str) -> Dict:
+        """The last stored version of a release manifest"""
+        key = release_prefix(build_id) + MANIFEST_KEY
+        for version in self.list_versions(key).get(key, []):
+            if not version.get("DeleteMarker"):
+                return version
+        raise DeploymentError(f"No stored version of release {build_id} found in {self.bucket_name}")
+
+    def release_point_in_time(self, build_id: str) -> datetime:
+        """When a release was completed: the last write of its manifest"""
+        return self.release_manifest_version(build_id)["LastModified"]
+
+    def release_manifest(self, build_id: str) -> Dict:
+        """A release manifest as last written, even after the release was pruned"""
+        version = self.release_manifest_version(build_id)
+        response = self.s3.get_object(Bucket=self.bucket_name, Key=version["Key"], VersionId=version["VersionId"])
+        return json.loads(response["Body"].read())
+
+    def restore(self, plan: RestorePlan, delete_newer: bool = False) -> None:
+        """Copy the planned versions back in place, optionally deleting newer keys"""
+        start = time.perf_counter()
+        failures = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.engine.copy_object, self.bucket_name, key, self.bucket_name, key, version_id): key
+                for key, version_id in plan.copies
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Restore failed for {futures[future]}: {e}")
+                    failures.append(futures[future])
+
+        if failures:
+            raise DeploymentError(f"{len(failures)} object(s) failed to restore")
+
+        restored = len(plan.copies)
+        if delete_newer and plan.deletes:
+            # Deleting only adds delete markers, so this step can itself be restored
+            delete_keys(self.s3, self.bucket_name, plan.deletes)
+            restored += len(plan.deletes)
+
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"OK Restored {restored} object(s) in {elapsed:.2f}s "
+            f"({restored / elapsed if elapsed else 0:.1f} objects/s)"
+        )
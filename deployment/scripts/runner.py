@@ -0,0 +1,128 @@
+"""
+Streaming Subprocess Runner
+===========================
+
+Runs deploy commands (``npm run build``, ``terraform plan`` ...) while
+reading stdout and stderr incrementally into the logger, so long builds show
+progress instead of looking hung. Only a bounded ring buffer of the last
+lines is kept for error reports; full stdout is retained only for commands
+whose output is parsed (``terraform output -json``, ``--version`` checks).
+
+Each command records wall time and, where the platform provides per-child
+resource usage (``os.wait4``), CPU time and peak RSS.
+"""
+
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAIL_LINES = 200
+
+
+@dataclass
+class CommandResult:
+    """Outcome, output tail and resource usage of a finished command"""
+    command: List[str]
+    returncode: int
+    stdout: str = ""
+    tail: List[str] = field(default_factory=list)
+    wall_seconds: float = 0.0
+    cpu_seconds: Optional[float] = None
+    peak_rss_kb: Optional[int] = None
+
+    @property
+    def stderr(self) -> str:
+        """Last output lines, for error messages"""
+        return "\n".join(self.tail)
+
+    def usage_summary(self) -> str:
+        parts = [f"wall {self.wall_seconds:.2f}s"]
+        if self.cpu_seconds is not None:
+            parts.append(f"cpu {self.cpu_seconds:.2f}s")
+        if self.peak_rss_kb is not None:
+            parts.append(f"peak RSS {self.peak_rss_kb / 1024:.0f} MB")
+        return ", ".join(parts)
+
+
+def _exit_code(status: int) -> int:
+    if hasattr(os, "waitstatus_to_exitcode"):
+        return os.waitstatus_to_exitcode(status)
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _wait(process: subprocess.Popen, result: CommandResult) -> None:
+    """Reap the child, collecting its own rusage where available"""
+    if hasattr(os, "wait4"):
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            # Already reaped by Popen (e.g. poll() during terminate())
+            result.returncode = process.wait()
+            return
+        process.returncode = result.returncode = _exit_code(status)
+        result.cpu_seconds = usage.ru_utime + usage.ru_stime
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        result.peak_rss_kb = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+    else:
+        result.returncode = process.wait()
+
+
+def run_streaming(command: List[str], cwd: Optional[Path] = None, env: Optional[Dict[str, str]] = None,
+                  capture_stdout: bool = False, tail_lines: int = DEFAULT_TAIL_LINES,
+                  log_level: int = logging.INFO,
+                  on_start: Optional[Callable[[subprocess.Popen], None]] = None,
+                  on_exit: Optional[Callable[[subprocess.Popen], None]] = None) -> CommandResult:
+    """Run a command, streaming both pipes to the logger line by line"""
+    result = CommandResult(command=command, returncode=-1)
+    tail = deque(maxlen=tail_lines)
+    stdout_lines: List[str] = []
+    lock = threading.Lock()
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command, cwd=cwd, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        text=True, encoding="utf-8", errors="replace", bufsize=1,
+    )
+    if on_start:
+        on_start(process)
+
+    def pump(stream, is_stdout: bool) -> None:
+        for line in stream:
+            line = line.rstrip("\r\n")
+            with lock:
+                tail.append(line)
+                if is_stdout and capture_stdout:
+                    stdout_lines.append(line)
+            logger.log(log_level, f"  | {line}")
+        stream.close()
+
+    readers = [
+        threading.Thread(target=pump, args=(process.stdout, True), daemon=True),
+        threading.Thread(target=pump, args=(process.stderr, False), daemon=True),
+    ]
+    try:
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        _wait(process, result)
+    finally:
+        if on_exit:
+            on_exit(process)
+
+    result.wall_seconds = time.perf_counter() - start
+    result.stdout = "\n".join(stdout_lines)
+    result.tail = list(tail)
+    return result
@@ -0,0 +1,116 @@
+"""
+Multi-Target Deploy Targets
+===========================
+
+Describes the stacks a single build is fanned out to. ``--targets`` takes
+either a comma separated list of environments (each resolved from its
+Terraform state: the workspace of the same name, or the default workspace
+the environment was applied to) or a JSON file for stacks that need more
+detail, e.g. extra regions or stacks outside this Terraform configuration,
+given by an explicit bucket and distribution id::
+
+    [
+      {"name": "prod"},
+      {"name": "prod-eu", "workspace": "prod-eu", "environment": "prod", "region": "eu-west-1"},
+      {"name": "preview", "bucket_name": "kb-engine-fe-preview", "distribution_id": "E123", "environment": "prod"}
+    ]
+
+The bundle is built once, for one environment (``REACT_APP_ENV``). Every
+target names the environment it serves (default: its workspace), and a
+target of another environment is refused unless explicitly allowed.
+"""
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from errors import DeploymentError
+from invalidation_tracker import TrackedInvalidation
+
+
+@dataclass
+class DeployTarget:
+    """One bucket/distribution pair to publish the build to"""
+    name: str
+    workspace: Optional[str] = None
+    region: Optional[str] = None
+    bucket_name: Optional[str] = None
+    distribution_id: Optional[str] = None
+    # Environment the deployed bundle must be built for
+    environment: Optional[str] = None
+
+    def __post_init__(self):
+        self.workspace = self.workspace or self.name
+        self.environment = self.environment or self.workspace
+
+
+@dataclass
+class TargetResult:
+    """What happened to one target, for the end-of-run summary"""
+    target: DeployTarget
+    build_id: Optional[str] = None
+    # Environment the deployed bundle was built for
+    build_environment: Optional[str] = None
+    bucket_name: Optional[str] = None
+    uploaded: int = 0
+    reused: int = 0
+    invalidation: Optional[TrackedInvalidation] = None
+    verified: bool = False
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def status(self) -> str:
+        if self.error:
+            return "FAILED"
+        return "OK" if self.verified else "UNVERIFIED"
+
+    @property
+    def environment_mismatch(self) -> bool:
+        return self.build_environment is not None and self.build_environment != self.target.environment
+
+
+def parse_targets(value: str) -> List[DeployTarget]:
+    """Parse --targets: a JSON targets file or comma separated environment names"""
+    path = Path(value)
+    if path.is_file():
+        try:
+            entries = json.loads(path.read_text(encoding="utf-8"))
+            targets = [DeployTarget(**entry) for entry in entries]
+        except (ValueError, TypeError) as e:
+            raise DeploymentError(f"Invalid targets file {path}: {e}")
+    else:
+        targets = [DeployTarget(name.strip()) for name in value.split(",") if name.strip()]
+
+    names = [target.name for target in targets]
+    if not targets:
+        raise DeploymentError("No deploy targets given")
+    if len(set(names)) != len(names):
+        raise DeploymentError(f"Duplicate target names in {', '.join(names)}")
+    return targets
+
+
+def mismatched_targets(targets: List[DeployTarget], build_environment: str) -> List[DeployTarget]:
+    """Targets serving another environment than the one the bundle is built for"""
+    return [target for target in targets if target.environment != build_environment]
+
+
+def format_summary(results: List[TargetResult]) -> List[str]:
+    """One line per target"""
+    lines = [f"  {'TARGET':12} {'STATUS':10} {'BUILD':20} {'BUCKET':40} {'UPLOADED':>8} {'REUSED':>7} "
+             f"{'LIVE AFTER':>10} {'TIME':>8}"]
+    for result in results:
+        live = "-"
+        if result.invalidation is not None and result.invalidation.seconds is not None:
+            live = f"{result.invalidation.seconds:.0f}s"
+        build = f"{result.build_id} ({result.build_environment})" if result.build_id else "-"
+        lines.append(
+            f"  {result.target.name:12} {result.status:10} {build:20} {result.bucket_name or '-':40} "
+            f"{result.uploaded:8d} {result.reused:7d} {live:>10} {result.seconds:7.1f}s"
+        )
+        if result.environment_mismatch:
+            lines.append(f"    built for {result.build_environment}, deployed to {result.target.environment}")
+        if result.error:
+            lines.append(f"    {result.error}")
+    return lines
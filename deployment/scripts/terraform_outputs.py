@@ -0,0 +1,165 @@
+"""
+Cached Terraform Outputs
+========================
+
+Reads ``terraform output -json`` once and keeps the result on disk keyed by
+the lineage and serial of the local state file. Every consumer in the deploy
+scripts is served from that snapshot; Terraform is only started again when
+the state has actually changed (its serial is bumped on every write).
+
+Remote backends have no local state to key on, so their outputs are cached
+for the current process only. Without an explicit workspace the outputs
+follow the selected one (``.terraform/environment`` or ``TF_WORKSPACE``).
+
+Each environment is applied to the workspace of the same name
+(``terraform.tfstate.d/<env>/``). A stack applied before that, to the
+default workspace (``terraform.tfstate``), still resolves for its
+environment: the provider's ``default_tags`` tag every resource in the
+state with ``Environment``. An explicitly requested environment is read
+from its local state file, so another environment's outputs can be
+resolved without switching the selected workspace.
+"""
+
+import json
+import logging
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from errors import DeploymentError
+
+logger = logging.getLogger(__name__)
+
+Runner = Callable[[List[str], Path], str]
+
+DEFAULT_WORKSPACE = "default"
+
+
+def _run_terraform(command: List[str], cwd: Path) -> str:
+    try:
+        result = subprocess.run(command, cwd=cwd, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        stderr = getattr(e, "stderr", None)
+        raise DeploymentError(f"Command failed: {' '.join(command)} ({stderr or e})")
+    return result.stdout
+
+
+def workspace_state_path(terraform_dir: Path, workspace: str) -> Path:
+    """Local state file of a workspace"""
+    if workspace == DEFAULT_WORKSPACE:
+        return terraform_dir / "terraform.tfstate"
+    return terraform_dir / "terraform.tfstate.d" / workspace / "terraform.tfstate"
+
+
+def selected_workspace(terraform_dir: Path) -> str:
+    """The workspace Terraform uses in terraform_dir"""
+    if os.environ.get("TF_WORKSPACE"):
+        return os.environ["TF_WORKSPACE"]
+    try:
+        return (terraform_dir / ".terraform" / "environment").read_text(encoding="utf-8").strip() or DEFAULT_WORKSPACE
+    except FileNotFoundError:
+        return DEFAULT_WORKSPACE
+
+
+def state_environment(state_path: Path) -> Optional[str]:
+    """The Environment tag of the resources in a local state file, if any"""
+    try:
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+    for resource in state.get("resources", []):
+        for instance in resource.get("instances", []):
+            tags = (instance.get("attributes") or {}).get("tags_all") or {}
+            if tags.get("Environment"):
+                return tags["Environment"]
+    return None
+
+
+def environment_workspace(terraform_dir: Path, environment: str) -> str:
+    """Workspace holding an environment: its own, or the default one if the environment was applied there"""
+    if workspace_state_path(terraform_dir, environment).parent.is_dir():
+        return environment
+    if state_environment(workspace_state_path(terraform_dir, DEFAULT_WORKSPACE)) == environment:
+        return DEFAULT_WORKSPACE
+    return environment
+
+
+class TerraformOutputs:
+    """Single outputs snapshot shared by all deploy entry points"""
+
+    def __init__(self, terraform_dir: Path, cache_dir: Path, environment: Optional[str] = None,
+                 runner: Optional[Runner] = None):
+        self.terraform_dir = terraform_dir
+        self.cache_dir = cache_dir
+        # Pinned: read this environment's state even if another workspace is selected
+        self.pinned = environment is not None
+        self._workspace = environment_workspace(terraform_dir, environment) if self.pinned else None
+        self.runner = runner or _run_terraform
+        self._outputs: Optional[Dict[str, Any]] = None
+        self._key: Optional[str] = None
+
+    @property
+    def workspace(self) -> str:
+        return self._workspace or selected_workspace(self.terraform_dir)
+
+    @property
+    def state_path(self) -> Path:
+        return workspace_state_path(self.terraform_dir, self.workspace)
+
+    @property
+    def cache_path(self) -> Path:
+        return self.cache_dir / f"terraform-outputs-{self.workspace}.json"
+
+    def state_key(self) -> Optional[str]:
+        """Identify the current state by lineage and serial, if it is local"""
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        return f"{state.get('lineage')}:{state.get('serial')}"
+
+    def _read_cache(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            cached = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        return cached["outputs"] if cached.get("state") == key else None
+
+    def _write_cache(self, key: str, outputs: Dict[str, Any]) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"state": key, "outputs": outputs}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.cache_path)
+
+    def get(self, refresh: bool = False) -> Dict[str, Any]:
+        """Return all output values, running Terraform only if the state changed"""
+        key = self.state_key()
+        if not refresh and self._outputs is not None and (key is None or key == self._key):
+            return self._outputs
+
+        outputs = self._read_cache(key) if key and not refresh else None
+        if outputs is not None:
+            logger.info(f"OK Terraform outputs loaded from cache (state {key})")
+        else:
+            command = ["terraform", "output", "-json"]
+            if self.pinned:
+                if key is None:
+                    raise DeploymentError(f"No local Terraform state for workspace '{self.workspace}' ({self.state_path})")
+                command.append(f"-state={self.state_path}")
+            raw = json.loads(self.runner(command, self.terraform_dir) or "{}")
+            outputs = {name: value["value"] for name, value in raw.items()}
+            if key:
+                self._write_cache(key, outputs)
+
+        self._outputs, self._key = outputs, key
+        return outputs
+
+    def value(self, name: str) -> Any:
+        """Return a single output, raising if it is missing"""
+        outputs = self.get()
+        if outputs.get(name) is None:
+            raise DeploymentError(f"Terraform output '{name}' not found - is the infrastructure deployed?")
+        return outputs[name]
@@ -0,0 +1,225 @@
+"""
+Native boto3 Transfer Engine
+============================
+
+Shared by ``deploy.py`` and ``deploy-frontend.py`` so neither has to shell
+out to the AWS CLI. One boto3 session and one S3/CloudFront client per
+service are kept for the whole process; the clients reuse keep-alive
+connections from a pool sized for the configured upload concurrency.
+
+Every file transfer is timed so the deploy can report per-file and
+aggregate throughput. The engine keeps no history: each upload returns
+its own records, so reports of concurrent or successive uploads sharing
+an engine never mix. Engines deploying to several targets at once can
+share a ``TransferLimiter`` that caps the total number of in-flight S3
+requests and the total upload bandwidth.
+"""
+
+import logging
+import statistics
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+from errors import DeploymentError
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+DEFAULT_MULTIPART_THRESHOLD = 8 * MB
+DEFAULT_MULTIPART_CHUNKSIZE = 8 * MB
+DEFAULT_MAX_CONCURRENCY = 16
+
+_session_lock = threading.Lock()
+_session: Optional[boto3.session.Session] = None
+_clients: Dict[tuple, object] = {}
+
+
+def get_session() -> boto3.session.Session:
+    """Return the process-wide boto3 session (credentials resolved once)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = boto3.session.Session()
+        return _session
+
+
+def get_client(service_name: str, region_name: Optional[str] = None, max_pool_connections: int = 50):
+    """Return a pooled client for a service, creating it on first use"""
+    cache_key = (service_name, region_name, max_pool_connections)
+    with _session_lock:
+        client = _clients.get(cache_key)
+    if client is not None:
+        return client
+
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        tcp_keepalive=True,
+        retries={"max_attempts": 10, "mode": "adaptive"},
+    )
+    client = get_session().client(service_name, region_name=region_name, config=config)
+    with _session_lock:
+        return _clients.setdefault(cache_key, client)
+
+
+@dataclass
+class FileTransfer:
+    """Timing record for a single transferred file"""
+    key: str
+    size: int
+    seconds: float
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second"""
+        return self.size / self.seconds if self.seconds > 0 else 0.0
+
+
+def format_rate(bytes_per_second: float) -> str:
+    return f"{bytes_per_second / MB:.2f} MB/s"
+
+
+class TransferLimiter:
+    """Global request concurrency and token-bucket bandwidth limit shared by engines"""
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, bytes_per_second: Optional[float] = None):
+        self.max_concurrency = max_concurrency
+        self.bytes_per_second = bytes_per_second
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        # One second of burst
+        self._tokens = bytes_per_second or 0.0
+        self._updated = time.monotonic()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one of the shared request slots"""
+        with self._slots:
+            yield
+
+    def consume(self, size: int) -> None:
+        """Take size bytes from the bucket, sleeping while it is in debt"""
+        if not self.bytes_per_second or size <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.bytes_per_second,
+                               self._tokens + (now - self._updated) * self.bytes_per_second)
+            self._updated = now
+            self._tokens -= size
+            wait = -self._tokens / self.bytes_per_second if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class TransferEngine:
+    """S3 uploads and CloudFront invalidations over shared boto3 clients"""
+
+    def __init__(self, multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD,
+                 multipart_chunksize: int = DEFAULT_MULTIPART_CHUNKSIZE,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 region_name: Optional[str] = None,
+                 limiter: Optional[TransferLimiter] = None):
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency,
+            use_threads=True,
+        )
+        # Files are uploaded in parallel and each may use multipart threads
+        pool_size = max(10, max_concurrency * 2)
+        self.s3 = get_client("s3", region_name, pool_size)
+        self.cloudfront = get_client("cloudfront", None, 10)
+        self.region_name = region_name
+
+    @contextmanager
+    def _slot(self) -> Iterator[None]:
+        if self.limiter is None:
+            yield
+            return
+        with self.limiter.slot():
+            yield
+
+    def caller_identity(self) -> Dict:
+        """Verify that AWS credentials are available"""
+        try:
+            return get_client("sts", self.region_name).get_caller_identity()
+        except Exception as e:
+            raise DeploymentError(f"AWS credentials are not configured: {e}")
+
+    def upload_file(self, path: Path, bucket_name: str, key: str,
+                    extra_args: Optional[Dict] = None) -> FileTransfer:
+        """Upload a file (multipart above the threshold) and record its throughput"""
+        size = path.stat().st_size
+        start = time.perf_counter()
+        with self._slot():
+            self.s3.upload_file(
+                str(path), bucket_name, key,
+                ExtraArgs=extra_args or {},
+                Config=self.transfer_config,
+                # Called with each chunk's byte count as it is sent
+                Callback=self.limiter.consume if self.limiter and self.limiter.bytes_per_second else None,
+            )
+        record = FileTransfer(key, size, time.perf_counter() - start)
+        logger.debug(f"PUT {key} {size} bytes in {record.seconds:.3f}s ({format_rate(record.throughput)})")
+        return record
+
+    def copy_object(self, source_bucket: str, source_key: str, bucket_name: str, key: str,
+                    version_id: Optional[str] = None, metadata: Optional[Dict] = None) -> Dict:
+        """Server-side copy keeping the source metadata, or replacing it with metadata; no bytes pass through this host"""
+        copy_source = {"Bucket": source_bucket, "Key": source_key}
+        if version_id:
+            copy_source["VersionId"] = version_id
+        with self._slot():
+            if metadata is None:
+                response = self.s3.copy_object(
+                    CopySource=copy_source, Bucket=bucket_name, Key=key, MetadataDirective="COPY"
+                )
+            else:
+                response = self.s3.copy_object(
+                    CopySource=copy_source, Bucket=bucket_name, Key=key, MetadataDirective="REPLACE", **metadata
+                )
+        logger.debug(f"COPY {source_bucket}/{source_key} -> {bucket_name}/{key}")
+        return response
+
+    def create_invalidation(self, distribution_id: str, paths: List[str]) -> str:
+        """Create a CloudFront invalidation and return its ID"""
+        response = self.cloudfront.create_invalidation(
+            DistributionId=distribution_id,
+            InvalidationBatch={
+                "Paths": {"Quantity": len(paths), "Items": paths},
+                "CallerReference": f"deploy-{uuid.uuid4()}",
+            },
+        )
+        return response["Invalidation"]["Id"]
+
+
+def report_transfers(transfers: List[FileTransfer], wall_seconds: Optional[float] = None) -> None:
+    """Log aggregate and per-file throughput of one upload's transfers"""
+    if not transfers:
+        logger.info("No files transferred")
+        return
+
+    total_bytes = sum(t.size for t in transfers)
+    busy_seconds = sum(t.seconds for t in transfers)
+    elapsed = wall_seconds or busy_seconds
+    median_rate = statistics.median(t.throughput for t in transfers)
+
+    logger.info(
+        f"Transferred {len(transfers)} file(s), {total_bytes / MB:.2f} MB "
+        f"in {elapsed:.2f}s ({format_rate(total_bytes / elapsed if elapsed else 0)} aggregate, "
+        f"{format_rate(median_rate)} median per file)"
+    )
+    for t in sorted(transfers, key=lambda t: t.seconds, reverse=True)[:5]:
+        logger.info(f"  slowest: {t.key} {t.size} bytes in {t.seconds:.3f}s ({format_rate(t.throughput)})")
@@ -2,18 +2,35 @@
 # Shared test configuration and utilities for property-based testing
 
 import os
-import tempfile
-import shutil
+import sys
 import boto3
 import pytest
 from pathlib import Path
-from python_terraform import Terraform
+
+from duration_schedule import DurationLog, LongestFirstScheduling, runs_distributed
+from hcl_evaluator import TerraformConfig
+from plan_cache import PlanCache
+from terraform_console import TerraformConsole, pty
+from workspace_pool import WorkspacePool
+
+# Unit tests import the deployment scripts directly
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
 
 
 @pytest.fixture(scope="session")
 def terraform_dir():
     """Fixture providing path to Terraform configuration directory."""
-    return Path(__file__).parent.parent / "terraform"
+    return Path(__file__).parent.parent.parent / "terraform"
+
+
+@pytest.fixture(scope="session")
+def terraform_config(terraform_dir):
+    """
+    Fixture providing the Terraform configuration parsed in-process.
+    Evaluates variable validations, locals and resource tags/names without
+    running terraform.
+    """
+    return TerraformConfig.load(terraform_dir)
 
 
 @pytest.fixture(scope="session")
@@ -28,21 +45,66 @@ def test_api_domain():
     return os.environ.get("TEST_API_DOMAIN", "api.example.com")
 
 
+@pytest.fixture(scope="session")
+def plan_cache(request, terraform_dir):
+    """
+    Fixture providing the on-disk Terraform plan cache.
+    Lives in the pytest cache directory, so it is shared across runs and xdist
+    workers and emptied by --cache-clear.
+    """
+    cache_dir = request.config.cache.mkdir("terraform-plans")
+    return PlanCache(cache_dir, terraform_dir, enabled=not request.config.getoption("no_plan_cache"))
+
+
+@pytest.fixture(scope="session")
+def terraform_pool(request, terraform_dir, plan_cache, tmp_path_factory):
+    """
+    Fixture providing the pool of initialized Terraform workspaces.
+    Use `with terraform_pool.acquire(tfvars_content) as (temp_dir, tf):` once
+    per Hypothesis example. Providers come from a plugin cache shared across
+    workers and runs (TF_PLUGIN_CACHE_DIR, unless already set).
+    """
+    previous = os.environ.get("TF_PLUGIN_CACHE_DIR")
+    plugin_cache_dir = Path(previous) if previous else request.config.cache.mkdir("terraform-plugins")
+    os.environ["TF_PLUGIN_CACHE_DIR"] = str(plugin_cache_dir)
+
+    yield WorkspacePool(terraform_dir, tmp_path_factory.mktemp("terraform"), plan_cache, plugin_cache_dir)
+
+    if previous is None:
+        del os.environ["TF_PLUGIN_CACHE_DIR"]
+
+
+@pytest.fixture(scope="session")
+def terraform_plan(plan_cache, terraform_pool):
+    """
+    Fixture providing plan(tfvars_content) -> planned_values.
+    Terraform only runs on cache misses, in a workspace from the pool.
+    """
+    return lambda tfvars_content: plan_cache.plan(tfvars_content, terraform_pool)
+
+
+@pytest.fixture(scope="session")
+def terraform_console(terraform_pool):
+    """
+    Fixture providing evaluate(variables, expressions) -> values.
+    Answered by long-lived `terraform console` processes, one per variable set,
+    so a batch of expressions costs one Terraform startup.
+    """
+    if pty is None:
+        pytest.skip("terraform console workers need a POSIX pseudo-terminal")
+    console = TerraformConsole(terraform_pool)
+    yield console
+    console.close()
+
+
 @pytest.fixture
-def terraform_workspace(terraform_dir):
+def terraform_workspace(terraform_pool):
     """
-    Fixture providing a temporary Terraform workspace for testing.
-    Creates a copy of terraform files in a temporary directory.
+    Fixture providing a clean Terraform workspace for testing.
+    Taken from the workspace pool and returned to it after the test.
     """
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_terraform_dir = Path(temp_dir) / "terraform"
-        shutil.copytree(terraform_dir, temp_terraform_dir)
-        
-        # Initialize Terraform in the temporary directory
-        tf = Terraform(working_dir=str(temp_terraform_dir))
-        tf.init()
-        
-        yield temp_terraform_dir, tf
+    with terraform_pool.acquire() as workspace:
+        yield workspace
 
 
 @pytest.fixture
@@ -55,8 +117,36 @@ def aws_clients(aws_region):
     }
 
 
+@pytest.fixture
+def s3_bucket(monkeypatch):
+    """
+    Fixture providing (TransferEngine, bucket name) for an empty versioned
+    bucket in moto's mocked S3, like the frontend bucket in s3.tf.
+    """
+    moto = pytest.importorskip("moto")
+    from transfer import TransferEngine
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        engine = TransferEngine(region_name="us-east-1")
+        engine.s3.create_bucket(Bucket="kb-engine-frontend-test")
+        engine.s3.put_bucket_versioning(
+            Bucket="kb-engine-frontend-test", VersioningConfiguration={"Status": "Enabled"}
+        )
+        yield engine, "kb-engine-frontend-test"
+
+
+def pytest_addoption(parser):
+    """Add command line options for the Terraform test harness."""
+    parser.addoption(
+        "--no-plan-cache", action="store_true", default=False,
+        help="Run terraform plan for every example instead of reusing cached plans"
+    )
+
+
 def pytest_configure(config):
-    """Configure pytest with custom markers."""
+    """Configure pytest with custom markers and duration-aware ordering."""
     config.addinivalue_line(
         "markers", "property: mark test as a property-based test"
     )
@@ -65,4 +155,14 @@ def pytest_configure(config):
     )
     config.addinivalue_line(
         "markers", "slow: mark test as slow running"
-    )
\ No newline at end of file
+    )
+    # Ordering and the efficiency summary only mean something across xdist workers
+    if runs_distributed(config):
+        config.pluginmanager.register(DurationLog(config), "duration_log")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_make_scheduler(config, log):
+    """Deal tests longest-first under --dist load."""
+    if config.getoption("dist") == "load":
+        return LongestFirstScheduling(config, log)
\ No newline at end of file
@@ -0,0 +1,131 @@
+# Duration-Aware Test Scheduling
+# Records how long each test takes and runs the longest ones first across xdist workers
+
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+try:
+    from xdist.scheduler import LoadScheduling
+except ImportError:  # pytest-xdist not installed; tests run serially
+    LoadScheduling = object
+
+DURATIONS_KEY = "terraform-tests/durations"
+
+
+def runs_distributed(config) -> bool:
+    """True on the xdist controller of an -n run and on its workers"""
+    return bool(config.getoption("numprocesses", None)) or hasattr(config, "workerinput")
+
+
+class DurationLog:
+    """
+    pytest plugin that keeps per-test durations in the pytest cache; only
+    registered for xdist runs (see ``runs_distributed``).
+
+    Collection is sorted longest-first from the recorded durations (tests
+    without a record count as the median), so every xdist worker collects
+    the same order and LongestFirstScheduling can deal it out. The controller
+    records the durations of the run and prints a parallel-efficiency summary.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.cache = getattr(config, "cache", None)
+        self.durations: Dict[str, float] = self.cache.get(DURATIONS_KEY, {}) if self.cache else {}
+        self.measured: Dict[str, float] = defaultdict(float)
+        self.busy: Dict[str, float] = defaultdict(float)
+        self.started = time.time()
+        # Span of the test phase (report timestamps), excluding worker startup and collection
+        self.first_start = float("inf")
+        self.last_stop = 0.0
+
+    @property
+    def is_worker(self) -> bool:
+        return hasattr(self.config, "workerinput")
+
+    def expected(self, nodeid: str) -> float:
+        default = statistics.median(self.durations.values()) if self.durations else 0.0
+        return self.durations.get(nodeid, default)
+
+    def pytest_collection_modifyitems(self, items) -> None:
+        # Stable sort: ties keep the collection order, so all workers agree
+        items.sort(key=lambda item: -self.expected(item.nodeid))
+
+    def pytest_runtest_logreport(self, report) -> None:
+        if self.is_worker:
+            return
+        self.measured[report.nodeid] += report.duration
+        node = getattr(report, "node", None)
+        self.busy[node.gateway.id if node is not None else "main"] += report.duration
+        self.first_start = min(self.first_start, getattr(report, "start", self.started))
+        self.last_stop = max(self.last_stop, getattr(report, "stop", time.time()))
+
+    def pytest_sessionfinish(self) -> None:
+        if self.cache is not None and not self.is_worker and self.measured:
+            self.cache.set(DURATIONS_KEY, {**self.durations, **self.measured})
+
+    def workers(self) -> int:
+        numprocesses = self.config.getoption("numprocesses", None)
+        return numprocesses if isinstance(numprocesses, int) and numprocesses > 0 else max(len(self.busy), 1)
+
+    def summary(self, wall: float) -> List[str]:
+        workers = self.workers()
+        busy = sum(self.busy.values())
+        span = max(self.last_stop - self.first_start, 0.0)
+        speedup = busy / span if span > 0 else 0.0
+        longest = max(self.measured, key=self.measured.get)
+        lines = [
+            f"{workers} worker(s), wall {wall:.1f}s: {max(self.first_start - self.started, 0.0):.1f}s "
+            f"starting workers and collecting, {max(self.started + wall - self.last_stop, 0.0):.1f}s after the last test",
+            f"tests ran for {span:.1f}s, test time {busy:.1f}s: "
+            f"speedup {speedup:.2f}x, efficiency {speedup / workers:.0%}",
+            f"longest test {self.measured[longest]:.1f}s ({longest}); wall time cannot drop below it",
+        ]
+        if len(self.busy) > 1:
+            busiest = max(self.busy, key=self.busy.get)
+            idlest = min(self.busy, key=self.busy.get)
+            lines.append(f"busiest worker {busiest} {self.busy[busiest]:.1f}s, "
+                         f"idlest {idlest} {self.busy[idlest]:.1f}s")
+        return lines
+
+    def pytest_terminal_summary(self, terminalreporter) -> None:
+        if self.is_worker or not self.measured:
+            return
+        terminalreporter.section("parallel efficiency")
+        for line in self.summary(time.time() - self.started):
+            terminalreporter.write_line(line)
+
+
+class LongestFirstScheduling(LoadScheduling):
+    """
+    --dist load over a longest-first collection, one test at a time.
+
+    The stock scheduler sends each worker a consecutive chunk first, which
+    would put all the slowest tests on one worker. Here the first round deals
+    the longest tests one per worker and a second round in reverse worker
+    order tops every worker up to the two pending tests xdist needs. After
+    that each test goes to the first worker to free up (maxschedchunk 1).
+    """
+
+    def __init__(self, config, log=None):
+        super().__init__(config, log)
+        self.maxschedchunk = 1
+
+    def schedule(self) -> None:
+        if self.collection is not None:
+            return super().schedule()
+        if not self._check_nodes_have_same_collection():
+            self.log("**Different tests collected, aborting run**")
+            return
+
+        self.collection = next(iter(self.node2collection.values()))
+        self.pending[:] = range(len(self.collection))
+        for node in self.nodes + self.nodes[::-1]:
+            if self.pending:
+                self._send_tests(node, 1)
+
+        if not self.pending:
+            for node in self.nodes:
+                node.shutdown()
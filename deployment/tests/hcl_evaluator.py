@@ -0,0 +1,1166 @@
+# HCL Evaluator
+# In-process evaluation of the Terraform configuration for fast property tests
+
+"""
+Parses the .tf files of a module with a small HCL native-syntax parser and
+evaluates, for a given set of variable values:
+
+- the type conversion and `validation` blocks of every variable
+- the `locals` (name_prefix, common_tags, bucket_name, ...)
+- top-level resource attributes such as `tags` and `name`
+
+Only the language features the configuration uses are implemented. Anything
+else (heredocs, template directives, splats, functions not in FUNCTIONS)
+raises UnsupportedError, which is never mistaken for a failed condition.
+
+References that are only known after apply (resource attributes, data
+sources) evaluate to UNKNOWN unless a value is supplied, and UNKNOWN
+propagates through operators and functions like it does in Terraform.
+
+Fidelity notes: regular expressions are translated from RE2 ($ only matches
+at the very end, \\s is ASCII whitespace), length() counts grapheme clusters
+approximately, and string values are NFC-normalized like HCL literals. The
+property tests cross-check a sample of variable sets against `terraform plan`.
+"""
+
+import abc
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class HCLError(Exception):
+    """Base class of parse and evaluation errors"""
+
+
+class EvaluationError(HCLError):
+    """An error Terraform would report too (can() and try() catch it)"""
+
+
+class UnsupportedError(HCLError):
+    """A language feature this evaluator does not implement"""
+
+
+class _Unknown:
+    """A value that is only known after apply"""
+
+    def __repr__(self):
+        return "(known after apply)"
+
+
+UNKNOWN = _Unknown()
+UNSET = object()
+
+
+# Lexer
+
+@dataclass
+class Token:
+    kind: str  # ident, number, string, op, nl, eof
+    value: Any
+    line: int
+
+
+OPERATORS = ("...", "==", "!=", "<=", ">=", "&&", "||", "=>",
+             "{", "}", "[", "]", "(", ")", "=", ",", ".", ":", "?", "!", "<", ">", "+", "-", "*", "/", "%")
+IDENT = re.compile(r"[A-Za-z_][A-Za-z0-9_-]*")
+NUMBER = re.compile(r"[0-9]+(\.[0-9]+)?([eE][+-]?[0-9]+)?")
+NUMBER_STRING = re.compile(r"-?[0-9]+(\.[0-9]+)?([eE][+-]?[0-9]+)?")
+ESCAPES = {"n": "\n", "r": "\r", "t": "\t", '"': '"', "\\": "\\"}
+
+
+def tokenize(text: str, pos: int = 0, line: int = 1, template: bool = False) -> Tuple[List[Token], int, int]:
+    """
+    Split HCL source into tokens. In template mode (inside "${...}") stop at
+    the unmatched closing brace and return its position.
+    """
+    tokens = []
+    depth = 0
+    while pos < len(text):
+        char = text[pos]
+        if char in " \t\r":
+            pos += 1
+        elif char == "\n":
+            tokens.append(Token("nl", None, line))
+            line += 1
+            pos += 1
+        elif char == "#" or text.startswith("//", pos):
+            end = text.find("\n", pos)
+            pos = len(text) if end < 0 else end
+        elif text.startswith("/*", pos):
+            end = text.find("*/", pos + 2)
+            if end < 0:
+                raise HCLError(f"line {line}: unterminated comment")
+            line += text.count("\n", pos, end)
+            pos = end + 2
+        elif char == '"':
+            parts, pos, line = tokenize_string(text, pos + 1, line)
+            tokens.append(Token("string", parts, line))
+        elif text.startswith("<<", pos):
+            raise UnsupportedError(f"line {line}: heredoc strings are not supported")
+        elif char in "0123456789":
+            match = NUMBER.match(text, pos)
+            literal = match.group(0)
+            tokens.append(Token("number", float(literal) if match.group(1) or match.group(2) else int(literal), line))
+            pos = match.end()
+        elif IDENT.match(text, pos):
+            match = IDENT.match(text, pos)
+            tokens.append(Token("ident", match.group(0), line))
+            pos = match.end()
+        else:
+            operator = next((op for op in OPERATORS if text.startswith(op, pos)), None)
+            if operator is None:
+                raise HCLError(f"line {line}: unexpected character {char!r}")
+            if template and operator == "{":
+                depth += 1
+            elif template and operator == "}":
+                if depth == 0:
+                    tokens.append(Token("eof", None, line))
+                    return tokens, pos, line
+                depth -= 1
+            tokens.append(Token("op", operator, line))
+            pos += len(operator)
+    if template:
+        raise HCLError(f"line {line}: unterminated template interpolation")
+    tokens.append(Token("eof", None, line))
+    return tokens, pos, line
+
+
+def tokenize_string(text: str, pos: int, line: int) -> Tuple[list, int, int]:
+    """Quoted template after its opening quote: literal strings and interpolation token lists"""
+    parts: list = []
+    literal: List[str] = []
+
+    def flush():
+        if literal:
+            # HCL normalizes string literals to NFC
+            parts.append(unicodedata.normalize("NFC", "".join(literal)))
+            literal.clear()
+
+    while True:
+        if pos >= len(text) or text[pos] == "\n":
+            raise HCLError(f"line {line}: unterminated string")
+        char = text[pos]
+        if char == '"':
+            flush()
+            return parts, pos + 1, line
+        if char == "\\":
+            escape = text[pos + 1:pos + 2]
+            if escape in ESCAPES:
+                literal.append(ESCAPES[escape])
+                pos += 2
+            elif escape in ("u", "U"):
+                width = 4 if escape == "u" else 8
+                digits = text[pos + 2:pos + 2 + width]
+                if not re.fullmatch(r"[0-9A-Fa-f]+", digits) or len(digits) != width:
+                    raise HCLError(f"line {line}: invalid unicode escape")
+                literal.append(chr(int(digits, 16)))
+                pos += 2 + width
+            else:
+                raise HCLError(f"line {line}: invalid escape sequence \\{escape}")
+        elif text.startswith("$${", pos) or text.startswith("%%{", pos):
+            literal.append(char + "{")
+            pos += 3
+        elif text.startswith("${", pos):
+            flush()
+            tokens, pos, line = tokenize(text, pos + 2, line, template=True)
+            parts.append(tokens)
+            pos += 1
+        elif text.startswith("%{", pos):
+            raise UnsupportedError(f"line {line}: template directives are not supported")
+        else:
+            literal.append(char)
+            pos += 1
+
+
+# Parser: expressions become tuples, ("kind", ...)
+
+@dataclass
+class Block:
+    type: str
+    labels: List[str]
+    body: "Body"
+
+
+@dataclass
+class Body:
+    attributes: Dict[str, tuple] = field(default_factory=dict)
+    blocks: List[Block] = field(default_factory=list)
+
+
+BINARY_LEVELS = (("||",), ("&&",), ("==", "!="), ("<", ">", "<=", ">="), ("+", "-"), ("*", "/", "%"))
+
+
+class Parser:
+    def __init__(self, tokens: List[Token], ignore_newlines: bool = False):
+        self.tokens = tokens
+        self.pos = 0
+        # Newlines are insignificant inside (), [] and template interpolations
+        self.ignore_newlines = [ignore_newlines]
+
+    def peek(self) -> Token:
+        if self.ignore_newlines[-1]:
+            self.skip_newlines()
+        return self.tokens[self.pos]
+
+    def next(self) -> Token:
+        token = self.peek()
+        if token.kind != "eof":
+            self.pos += 1
+        return token
+
+    def at(self, kind: str, value: Any = None) -> bool:
+        token = self.peek()
+        return token.kind == kind and (value is None or token.value == value)
+
+    def expect(self, kind: str, value: Any = None) -> Token:
+        token = self.next()
+        if token.kind != kind or (value is not None and token.value != value):
+            raise HCLError(f"line {token.line}: expected {value or kind}, found {token.value or token.kind}")
+        return token
+
+    def skip_newlines(self) -> None:
+        while self.tokens[self.pos].kind == "nl":
+            self.pos += 1
+
+    def parse_body(self, closing: Optional[str] = None) -> Body:
+        body = Body()
+        self.ignore_newlines.append(False)
+        while True:
+            self.skip_newlines()
+            if self.at("eof") or (closing and self.at("op", closing)):
+                break
+            name = self.expect("ident").value
+            if self.at("op", "="):
+                self.next()
+                if name in body.attributes:
+                    raise HCLError(f"duplicate attribute {name}")
+                body.attributes[name] = self.parse_expression()
+                if not (self.at("nl") or self.at("eof") or (closing and self.at("op", closing))):
+                    token = self.peek()
+                    raise HCLError(f"line {token.line}: unexpected {token.value} after attribute {name}")
+                continue
+            labels = []
+            while self.at("string") or self.at("ident"):
+                token = self.next()
+                labels.append(token.value if token.kind == "ident" else "".join(self.literal_parts(token)))
+            self.expect("op", "{")
+            block_body = self.parse_body("}")
+            self.expect("op", "}")
+            body.blocks.append(Block(name, labels, block_body))
+        self.ignore_newlines.pop()
+        return body
+
+    def literal_parts(self, token: Token) -> List[str]:
+        if any(not isinstance(part, str) for part in token.value):
+            raise HCLError(f"line {token.line}: block labels cannot contain interpolations")
+        return token.value
+
+    def parse_expression(self) -> tuple:
+        condition = self.parse_binary(0)
+        if self.at("op", "?"):
+            self.next()
+            true_value = self.parse_expression()
+            self.expect("op", ":")
+            false_value = self.parse_expression()
+            return ("conditional", condition, true_value, false_value)
+        return condition
+
+    def parse_binary(self, level: int) -> tuple:
+        if level == len(BINARY_LEVELS):
+            return self.parse_unary()
+        left = self.parse_binary(level + 1)
+        while self.peek().kind == "op" and self.peek().value in BINARY_LEVELS[level]:
+            operator = self.next().value
+            left = ("binary", operator, left, self.parse_binary(level + 1))
+        return left
+
+    def parse_unary(self) -> tuple:
+        if self.at("op", "!") or self.at("op", "-"):
+            operator = self.next().value
+            return ("unary", operator, self.parse_unary())
+        return self.parse_postfix()
+
+    def parse_postfix(self) -> tuple:
+        node = self.parse_primary()
+        while True:
+            if self.at("op", "."):
+                self.next()
+                token = self.next()
+                if token.kind == "ident":
+                    node = ("attribute", node, token.value)
+                elif token.kind == "number" and isinstance(token.value, int):
+                    node = ("index", node, ("literal", token.value))
+                else:
+                    raise UnsupportedError(f"line {token.line}: splat expressions are not supported")
+            elif self.at("op", "["):
+                self.next()
+                self.ignore_newlines.append(True)
+                if self.at("op", "*"):
+                    raise UnsupportedError(f"line {self.peek().line}: splat expressions are not supported")
+                index = self.parse_expression()
+                self.expect("op", "]")
+                self.ignore_newlines.pop()
+                node = ("index", node, index)
+            else:
+                return node
+
+    def parse_primary(self) -> tuple:
+        token = self.next()
+        if token.kind == "number":
+            return ("literal", token.value)
+        if token.kind == "string":
+            return self.parse_template(token)
+        if token.kind == "ident":
+            if token.value in ("true", "false", "null"):
+                return ("literal", {"true": True, "false": False, "null": None}[token.value])
+            if self.at("op", "("):
+                return self.parse_call(token.value)
+            return ("reference", token.value)
+        if token.kind == "op" and token.value == "(":
+            self.ignore_newlines.append(True)
+            expression = self.parse_expression()
+            self.expect("op", ")")
+            self.ignore_newlines.pop()
+            return expression
+        if token.kind == "op" and token.value == "[":
+            return self.parse_tuple()
+        if token.kind == "op" and token.value == "{":
+            return self.parse_object()
+        raise HCLError(f"line {token.line}: unexpected {token.value or token.kind}")
+
+    def parse_template(self, token: Token) -> tuple:
+        if all(isinstance(part, str) for part in token.value):
+            return ("literal", "".join(token.value))
+        parts = []
+        for part in token.value:
+            if isinstance(part, str):
+                parts.append(("literal", part))
+            else:
+                parser = Parser(part, ignore_newlines=True)
+                parts.append(parser.parse_expression())
+                parser.expect("eof")
+        return ("template", parts)
+
+    def parse_call(self, name: str) -> tuple:
+        self.expect("op", "(")
+        self.ignore_newlines.append(True)
+        arguments = []
+        while not self.at("op", ")"):
+            arguments.append(self.parse_expression())
+            if self.at("op", "..."):
+                raise UnsupportedError(f"line {self.peek().line}: argument expansion is not supported")
+            if not self.at("op", ","):
+                break
+            self.next()
+        self.expect("op", ")")
+        self.ignore_newlines.pop()
+        return ("call", name, arguments)
+
+    def parse_tuple(self) -> tuple:
+        self.ignore_newlines.append(True)
+        if self.at("ident", "for"):
+            node = self.parse_for("tuple")
+            self.expect("op", "]")
+        else:
+            items = []
+            while not self.at("op", "]"):
+                items.append(self.parse_expression())
+                if not self.at("op", ","):
+                    break
+                self.next()
+            self.expect("op", "]")
+            node = ("tuple", items)
+        self.ignore_newlines.pop()
+        return node
+
+    def parse_object(self) -> tuple:
+        self.skip_newlines()
+        if self.at("ident", "for"):
+            self.ignore_newlines.append(True)
+            node = self.parse_for("object")
+            self.expect("op", "}")
+            self.ignore_newlines.pop()
+            return node
+
+        self.ignore_newlines.append(False)
+        items = []
+        while True:
+            self.skip_newlines()
+            if self.at("op", "}"):
+                break
+            if self.at("ident") and self.tokens[self.pos + 1].kind == "op" and self.tokens[self.pos + 1].value in "=:":
+                key = ("literal", self.next().value)
+            else:
+                key = self.parse_expression()
+            separator = self.next()
+            if separator.kind != "op" or separator.value not in ("=", ":"):
+                raise HCLError(f"line {separator.line}: expected = or : in object")
+            items.append((key, self.parse_expression()))
+            if self.at("op", ","):
+                self.next()
+            elif not (self.at("nl") or self.at("op", "}")):
+                token = self.peek()
+                raise HCLError(f"line {token.line}: expected newline or comma in object")
+        self.expect("op", "}")
+        self.ignore_newlines.pop()
+        return ("object", items)
+
+    def parse_for(self, kind: str) -> tuple:
+        self.expect("ident", "for")
+        key_name, value_name = None, self.expect("ident").value
+        if self.at("op", ","):
+            self.next()
+            key_name, value_name = value_name, self.expect("ident").value
+        self.expect("ident", "in")
+        collection = self.parse_expression()
+        self.expect("op", ":")
+        key = None
+        if kind == "object":
+            key = self.parse_expression()
+            self.expect("op", "=>")
+        value = self.parse_expression()
+        if self.at("op", "..."):
+            raise UnsupportedError(f"line {self.peek().line}: grouping for expressions are not supported")
+        condition = None
+        if self.at("ident", "if"):
+            self.next()
+            condition = self.parse_expression()
+        return ("for", kind, key_name, value_name, collection, key, value, condition)
+
+
+def parse_body(text: str) -> Body:
+    tokens, _, _ = tokenize(text)
+    return Parser(tokens).parse_body()
+
+
+@lru_cache(maxsize=256)
+def parse_expression(text: str) -> tuple:
+    tokens, _, _ = tokenize(text)
+    parser = Parser(tokens, ignore_newlines=True)
+    expression = parser.parse_expression()
+    parser.expect("eof")
+    return expression
+
+
+# Values
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def type_name(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if is_number(value):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "tuple"
+    if isinstance(value, dict):
+        return "object"
+    return type(value).__name__
+
+
+def number_to_string(value) -> str:
+    if isinstance(value, float):
+        if value != value or value in (float("inf"), float("-inf")):
+            raise EvaluationError("number is not finite")
+        return format(Decimal(repr(value)).normalize(), "f")
+    return str(value)
+
+
+def hcl_equal(a: Any, b: Any) -> bool:
+    """Equality without conversions: values of different types are never equal"""
+    if a is None or b is None:
+        return a is b
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool) and a == b
+    if is_number(a) or is_number(b):
+        return is_number(a) and is_number(b) and a == b
+    if isinstance(a, str) or isinstance(b, str):
+        return isinstance(a, str) and isinstance(b, str) and a == b
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(hcl_equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(hcl_equal(a[key], b[key]) for key in a)
+    return False
+
+
+def contains_unknown(value: Any) -> bool:
+    if value is UNKNOWN:
+        return True
+    if isinstance(value, list):
+        return any(contains_unknown(item) for item in value)
+    if isinstance(value, dict):
+        return any(contains_unknown(item) for item in value.values())
+    return False
+
+
+def normalize_strings(value: Any) -> Any:
+    """NFC-normalize every string, as HCL does for literals in .tfvars files"""
+    if isinstance(value, str):
+        return unicodedata.normalize("NFC", value)
+    if isinstance(value, list):
+        return [normalize_strings(item) for item in value]
+    if isinstance(value, dict):
+        return {normalize_strings(key): normalize_strings(item) for key, item in value.items()}
+    return value
+
+
+def grapheme_length(text: str) -> int:
+    """Approximate count of extended grapheme clusters (Terraform's length() of a string)"""
+    count = 0
+    join_next = False
+    previous = ""
+    regional_pending = False
+    for char in text:
+        codepoint = ord(char)
+        extends = (
+            unicodedata.category(char) in ("Mn", "Me", "Mc")
+            or char == "\u200d"
+            or 0xFE00 <= codepoint <= 0xFE0F
+            or 0x1F3FB <= codepoint <= 0x1F3FF
+            or 0xE0020 <= codepoint <= 0xE007F
+        )
+        regional = 0x1F1E6 <= codepoint <= 0x1F1FF
+        if count and (extends or join_next or (previous == "\r" and char == "\n") or (regional and regional_pending)):
+            regional_pending = False
+        else:
+            count += 1
+            regional_pending = regional
+        join_next = char == "\u200d"
+        previous = char
+    return count
+
+
+# Regular expressions: RE2 syntax translated to Python's re
+
+RE2_SPACE = "\\t\\n\\f\\r "
+
+
+@lru_cache(maxsize=256)
+def compile_regex(pattern: str):
+    translated = []
+    in_class = False
+    pos = 0
+    while pos < len(pattern):
+        char = pattern[pos]
+        if char == "\\" and pos + 1 < len(pattern):
+            escape = pattern[pos + 1]
+            if escape == "s":
+                translated.append(RE2_SPACE if in_class else f"[{RE2_SPACE}]")
+            elif escape == "z":
+                translated.append("\\Z")
+            else:
+                translated.append(pattern[pos:pos + 2])
+            pos += 2
+            continue
+        if in_class:
+            if char == "]":
+                in_class = False
+            elif pattern.startswith("[:", pos):
+                raise UnsupportedError(f"POSIX character classes are not supported: {pattern}")
+        elif char == "[":
+            in_class = True
+            # A ] right after [ or [^ is a literal
+            if pattern.startswith("^]", pos + 1) or pattern.startswith("]", pos + 1):
+                closing = pattern.index("]", pos + 1) + 1
+                translated.append(pattern[pos:closing])
+                pos = closing
+                continue
+        elif char == "$":
+            # RE2 without the m flag: end of text only (Python's $ also matches before a final \n)
+            translated.append("\\Z")
+            pos += 1
+            continue
+        translated.append(char)
+        pos += 1
+    try:
+        return re.compile("".join(translated), re.ASCII)
+    except re.error as e:
+        # RE2 syntax Python has no equivalent for (\pL, ...)
+        raise UnsupportedError(f"cannot translate regular expression {pattern!r}: {e}")
+
+
+# Functions
+
+def require(value: Any, kind: str, function: str) -> Any:
+    if value is None:
+        raise EvaluationError(f"{function}: argument must not be null")
+    checks = {"string": lambda v: isinstance(v, str), "number": is_number, "bool": lambda v: isinstance(v, bool),
+              "list": lambda v: isinstance(v, list), "map": lambda v: isinstance(v, dict)}
+    if not checks[kind](value):
+        raise EvaluationError(f"{function}: {kind} required, got {type_name(value)}")
+    return value
+
+
+def fn_regex(pattern, string):
+    match = compile_regex(require(pattern, "string", "regex")).search(require(string, "string", "regex"))
+    if match is None:
+        raise EvaluationError("regex: pattern did not match any part of the given string")
+    if match.re.groupindex:
+        return {name: match.group(name) for name in match.re.groupindex}
+    if match.re.groups:
+        return list(match.groups())
+    return match.group(0)
+
+
+def fn_length(value):
+    if value is None:
+        raise EvaluationError("length: argument must not be null")
+    if isinstance(value, str):
+        return grapheme_length(value)
+    if isinstance(value, (list, dict)):
+        return len(value)
+    raise EvaluationError(f"length: collection or string required, got {type_name(value)}")
+
+
+def fn_alltrue(values):
+    return all(require(value, "bool", "alltrue") for value in require(values, "list", "alltrue"))
+
+
+def fn_anytrue(values):
+    return any(require(value, "bool", "anytrue") for value in require(values, "list", "anytrue"))
+
+
+def fn_merge(*maps):
+    merged = {}
+    for value in maps:
+        if value is not None:
+            merged.update(require(value, "map", "merge"))
+    return merged
+
+
+def fn_lookup(mapping, key, *default):
+    require(mapping, "map", "lookup")
+    if key in mapping:
+        return mapping[key]
+    if default:
+        return default[0]
+    raise EvaluationError(f"lookup: the given key {key!r} does not exist")
+
+
+def fn_tostring(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if is_number(value):
+        return number_to_string(value)
+    raise EvaluationError(f"tostring: cannot convert {type_name(value)} to string")
+
+
+FUNCTIONS = {
+    "regex": fn_regex,
+    "length": fn_length,
+    "contains": lambda values, value: any(hcl_equal(item, value) for item in require(values, "list", "contains")),
+    "alltrue": fn_alltrue,
+    "anytrue": fn_anytrue,
+    "merge": fn_merge,
+    "lookup": fn_lookup,
+    "keys": lambda mapping: sorted(require(mapping, "map", "keys")),
+    "values": lambda mapping: [mapping[key] for key in sorted(require(mapping, "map", "values"))],
+    "concat": lambda *lists: [item for value in lists for item in require(value, "list", "concat")],
+    "join": lambda separator, *lists: require(separator, "string", "join").join(
+        require(item, "string", "join") for value in lists for item in require(value, "list", "join")),
+    "lower": lambda value: require(value, "string", "lower").lower(),
+    "upper": lambda value: require(value, "string", "upper").upper(),
+    "tostring": fn_tostring,
+}
+
+
+# Evaluation
+
+class ObjectValue(abc.ABC):
+    """A scope object (var, local, a resource type) whose attributes are looked up by name"""
+
+    @abc.abstractmethod
+    def attribute(self, name: str) -> Any:
+        """Value of name, or EvaluationError/UnsupportedError for references it cannot resolve"""
+
+
+class VariablesObject(ObjectValue):
+    def __init__(self, values: Dict[str, Any]):
+        self.values = values
+
+    def attribute(self, name):
+        if name not in self.values:
+            raise EvaluationError(f"Reference to undeclared input variable var.{name}")
+        return self.values[name]
+
+
+class LocalsObject(ObjectValue):
+    def __init__(self, evaluation: "Evaluation"):
+        self.evaluation = evaluation
+        self.values: Dict[str, Any] = {}
+        self.evaluating = set()
+
+    def attribute(self, name):
+        if name in self.values:
+            return self.values[name]
+        expressions = self.evaluation.config.locals
+        if name not in expressions:
+            raise EvaluationError(f"Reference to undeclared local value local.{name}")
+        if name in self.evaluating:
+            raise EvaluationError(f"Self-referencing local value local.{name}")
+        self.evaluating.add(name)
+        try:
+            value = self.values[name] = self.evaluation.evaluate_node(expressions[name])
+        finally:
+            self.evaluating.discard(name)
+        return value
+
+
+class ResourceTypeObject(ObjectValue):
+    def __init__(self, evaluation: "Evaluation", resource_type: str):
+        self.evaluation = evaluation
+        self.resource_type = resource_type
+
+    def attribute(self, name):
+        address = f"{self.resource_type}.{name}"
+        if address not in self.evaluation.config.resources:
+            raise EvaluationError(f"Reference to undeclared resource {address}")
+        values = self.evaluation.resources.get(address)
+        return UNKNOWN if values is None else ResourceValues(values)
+
+
+class ResourceValues(ObjectValue):
+    """Supplied attributes of a resource; the others are known after apply"""
+
+    def __init__(self, values: Dict[str, Any]):
+        self.values = values
+
+    def attribute(self, name):
+        return self.values.get(name, UNKNOWN)
+
+
+class UnknownObject(ObjectValue):
+    def attribute(self, name):
+        return UNKNOWN
+
+
+def convert(value: Any, type_spec: Any) -> Any:
+    """Convert a value to a variable type constraint like Terraform does"""
+    if value is None or type_spec == "any":
+        return value
+    if type_spec == "string":
+        if isinstance(value, (str, bool)) or is_number(value):
+            return fn_tostring(value)
+        raise EvaluationError(f"string required, got {type_name(value)}")
+    if type_spec == "number":
+        if is_number(value):
+            return value
+        if isinstance(value, str) and NUMBER_STRING.fullmatch(value):
+            return float(value) if re.search(r"[.eE]", value) else int(value)
+        raise EvaluationError(f"a number is required, got {type_name(value)}")
+    if type_spec == "bool":
+        if isinstance(value, bool):
+            return value
+        if value in ("true", "false"):
+            return value == "true"
+        raise EvaluationError(f"a bool is required, got {type_name(value)}")
+    kind, element = type_spec
+    if kind == "map":
+        if not isinstance(value, dict):
+            raise EvaluationError(f"map of {element} required, got {type_name(value)}")
+        return {key: convert(item, element) for key, item in value.items()}
+    if not isinstance(value, list):
+        raise EvaluationError(f"{kind} of {element} required, got {type_name(value)}")
+    items = [convert(item, element) for item in value]
+    if kind == "set":
+        unique = []
+        for item in items:
+            if not any(hcl_equal(item, existing) for existing in unique):
+                unique.append(item)
+        return unique
+    return items
+
+
+def parse_type(node: tuple) -> Any:
+    if node[0] == "reference" and node[1] in ("string", "number", "bool", "any"):
+        return node[1]
+    if node[0] == "call" and node[1] in ("list", "map", "set") and len(node[2]) == 1:
+        return (node[1], parse_type(node[2][0]))
+    raise UnsupportedError(f"type constraint {node} is not supported")
+
+
+@dataclass
+class Variable:
+    name: str
+    type: Any = "any"
+    default: Any = UNSET
+    nullable: bool = True
+    # (condition, error_message) expressions
+    validations: List[Tuple[tuple, tuple]] = field(default_factory=list)
+
+
+@dataclass
+class VariableError:
+    """A variable value Terraform rejects"""
+    variable: str
+    message: str
+
+
+class TerraformConfig:
+    """The variables, locals and resources of a Terraform module"""
+
+    def __init__(self, module_dir: Path, body: Body):
+        self.module_dir = module_dir
+        self.variables: Dict[str, Variable] = {}
+        self.locals: Dict[str, tuple] = {}
+        self.resources: Dict[str, Body] = {}
+
+        for block in body.blocks:
+            if block.type == "variable":
+                self.variables[block.labels[0]] = self._variable(block)
+            elif block.type == "locals":
+                self.locals.update(block.body.attributes)
+            elif block.type == "resource":
+                self.resources[".".join(block.labels)] = block.body
+        self.resource_types = {address.split(".", 1)[0] for address in self.resources}
+
+    @classmethod
+    def load(cls, module_dir: Path) -> "TerraformConfig":
+        """Parse every .tf file of the module"""
+        body = Body()
+        for path in sorted(Path(module_dir).glob("*.tf")):
+            try:
+                file_body = parse_body(path.read_text(encoding="utf-8"))
+            except HCLError as e:
+                raise type(e)(f"{path.name}: {e}")
+            body.blocks.extend(file_body.blocks)
+        return cls(Path(module_dir), body)
+
+    def _variable(self, block: Block) -> Variable:
+        attributes = block.body.attributes
+        variable = Variable(block.labels[0])
+        if "type" in attributes:
+            variable.type = parse_type(attributes["type"])
+        if "nullable" in attributes:
+            variable.nullable = attributes["nullable"] == ("literal", True)
+        if "default" in attributes:
+            default = Evaluation(self, {}, {}).evaluate_node(attributes["default"])
+            variable.default = convert(default, variable.type)
+        for validation in block.body.blocks:
+            if validation.type == "validation":
+                variable.validations.append((validation.body.attributes["condition"],
+                                             validation.body.attributes["error_message"]))
+        return variable
+
+    def evaluate(self, values: Dict[str, Any], resources: Optional[Dict[str, Dict[str, Any]]] = None) -> "Evaluation":
+        """
+        Evaluate the module for variable values as they would be written in a
+        .tfvars file. resources supplies attributes known after apply, e.g.
+        {"random_id.bucket_suffix": {"hex": "1a2b3c4d"}}.
+        """
+        errors = []
+        converted = {}
+        for name, variable in self.variables.items():
+            if name not in values or (values[name] is None and not variable.nullable):
+                if variable.default is UNSET:
+                    errors.append(VariableError(name, f"No value for required variable {name}"))
+                    continue
+                converted[name] = variable.default
+                continue
+            try:
+                converted[name] = convert(normalize_strings(values[name]), variable.type)
+            except EvaluationError as e:
+                errors.append(VariableError(name, f"Invalid value for input variable: {e}"))
+
+        evaluation = Evaluation(self, converted, resources or {})
+        for name, variable in self.variables.items():
+            if name not in converted:
+                continue
+            for condition, error_message in variable.validations:
+                try:
+                    result = evaluation.evaluate_node(condition)
+                except EvaluationError as e:
+                    errors.append(VariableError(name, f"Invalid validation condition: {e}"))
+                    continue
+                if result is UNKNOWN:
+                    continue
+                if not isinstance(result, bool):
+                    errors.append(VariableError(name, "Invalid validation condition: result must be bool"))
+                elif not result:
+                    errors.append(VariableError(name, evaluation.evaluate_node(error_message)))
+        evaluation.errors = errors
+        return evaluation
+
+
+class Evaluation:
+    """The module evaluated for one set of variable values"""
+
+    def __init__(self, config: TerraformConfig, variables: Dict[str, Any], resources: Dict[str, Dict[str, Any]]):
+        self.config = config
+        self.var = variables
+        self.resources = resources
+        self.errors: List[VariableError] = []
+        self._scope = {
+            "var": VariablesObject(variables),
+            "local": LocalsObject(self),
+            "path": {"module": str(config.module_dir), "root": str(config.module_dir), "cwd": str(config.module_dir)},
+            "terraform": {"workspace": "default"},
+            "data": UnknownObject(),
+        }
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    def failed_variables(self) -> List[str]:
+        return sorted({error.variable for error in self.errors})
+
+    def local(self, name: str) -> Any:
+        return self._scope["local"].attribute(name)
+
+    def evaluate(self, expression: str) -> Any:
+        """Value of an HCL expression, e.g. "local.bucket_name" """
+        return self.evaluate_node(parse_expression(expression))
+
+    def resource_attributes(self, attribute: str) -> Dict[str, Any]:
+        """
+        Value of a top-level attribute (tags, name, ...) of every resource that
+        sets it. Resources whose count or for_each leaves no instances are left out.
+        """
+        values = {}
+        for address, body in self.config.resources.items():
+            if attribute not in body.attributes:
+                continue
+            bindings = {}
+            if "count" in body.attributes:
+                count = self.evaluate_node(body.attributes["count"])
+                if count == 0:
+                    continue
+                bindings["count"] = {"index": 0}
+            if "for_each" in body.attributes:
+                instances = self.evaluate_node(body.attributes["for_each"])
+                if instances is not UNKNOWN and not instances:
+                    continue
+                bindings["each"] = UnknownObject()
+            values[address] = self.evaluate_node(body.attributes[attribute], bindings)
+        return values
+
+    def lookup(self, name: str, bindings: Dict[str, Any]) -> Any:
+        if name in bindings:
+            return bindings[name]
+        if name in self._scope:
+            return self._scope[name]
+        if name in self.config.resource_types:
+            return ResourceTypeObject(self, name)
+        raise EvaluationError(f"Unknown reference {name}")
+
+    def evaluate_node(self, node: tuple, bindings: Optional[Dict[str, Any]] = None) -> Any:
+        bindings = bindings or {}
+        kind = node[0]
+
+        if kind == "literal":
+            return node[1]
+
+        if kind == "template":
+            parts = [self.evaluate_node(part, bindings) for part in node[1]]
+            if any(part is UNKNOWN for part in parts):
+                return UNKNOWN
+            strings = []
+            for part in parts:
+                if part is None:
+                    raise EvaluationError("Cannot include a null value in a string template")
+                if isinstance(part, (list, dict, ObjectValue)):
+                    raise EvaluationError(f"Cannot include a {type_name(part)} value in a string template")
+                strings.append(fn_tostring(part))
+            return "".join(strings)
+
+        if kind == "reference":
+            return self.lookup(node[1], bindings)
+
+        if kind == "attribute":
+            value = self.evaluate_node(node[1], bindings)
+            if value is UNKNOWN:
+                return UNKNOWN
+            if isinstance(value, ObjectValue):
+                return value.attribute(node[2])
+            if isinstance(value, dict):
+                if node[2] not in value:
+                    raise EvaluationError(f"Unsupported attribute {node[2]}")
+                return value[node[2]]
+            raise EvaluationError(f"Unsupported attribute {node[2]} on a {type_name(value)} value")
+
+        if kind == "index":
+            value = self.evaluate_node(node[1], bindings)
+            key = self.evaluate_node(node[2], bindings)
+            if value is UNKNOWN or key is UNKNOWN or isinstance(value, ObjectValue):
+                return UNKNOWN
+            if isinstance(value, list):
+                if not is_number(key) or key != int(key) or not 0 <= key < len(value):
+                    raise EvaluationError(f"Invalid index {key!r}")
+                return value[int(key)]
+            if isinstance(value, dict):
+                key = fn_tostring(key)
+                if key not in value:
+                    raise EvaluationError(f"Invalid index: the given key {key!r} does not exist")
+                return value[key]
+            raise EvaluationError(f"Cannot index a {type_name(value)} value")
+
+        if kind == "call":
+            return self.call(node[1], node[2], bindings)
+
+        if kind == "unary":
+            value = self.evaluate_node(node[2], bindings)
+            if value is UNKNOWN:
+                return UNKNOWN
+            if node[1] == "!":
+                return not require(value, "bool", "!")
+            return -require(value, "number", "-")
+
+        if kind == "binary":
+            return self.binary(node[1], self.evaluate_node(node[2], bindings), self.evaluate_node(node[3], bindings))
+
+        if kind == "conditional":
+            condition = self.evaluate_node(node[1], bindings)
+            if condition is UNKNOWN:
+                return UNKNOWN
+            branch = node[2] if require(condition, "bool", "condition") else node[3]
+            return self.evaluate_node(branch, bindings)
+
+        if kind == "tuple":
+            return [self.evaluate_node(item, bindings) for item in node[1]]
+
+        if kind == "object":
+            result = {}
+            for key_node, value_node in node[1]:
+                key = self.evaluate_node(key_node, bindings)
+                if key is UNKNOWN:
+                    return UNKNOWN
+                if key is None:
+                    raise EvaluationError("Object keys must not be null")
+                result[fn_tostring(key)] = self.evaluate_node(value_node, bindings)
+            return result
+
+        if kind == "for":
+            return self.for_expression(node, bindings)
+
+        raise UnsupportedError(f"expression {kind} is not supported")
+
+    def call(self, name: str, argument_nodes: List[tuple], bindings: Dict[str, Any]) -> Any:
+        if name in ("can", "try"):
+            for argument in argument_nodes:
+                try:
+                    value = self.evaluate_node(argument, bindings)
+                except EvaluationError:
+                    continue
+                if name == "can":
+                    return UNKNOWN if contains_unknown(value) else True
+                return value
+            if name == "can":
+                return False
+            raise EvaluationError("try: no expression succeeded")
+
+        if name not in FUNCTIONS:
+            raise UnsupportedError(f"function {name}() is not supported")
+        arguments = [self.evaluate_node(argument, bindings) for argument in argument_nodes]
+        if any(contains_unknown(argument) for argument in arguments):
+            return UNKNOWN
+        try:
+            return FUNCTIONS[name](*arguments)
+        except TypeError as e:
+            raise EvaluationError(f"{name}: {e}")
+
+    def binary(self, operator: str, left: Any, right: Any) -> Any:
+        if left is UNKNOWN or right is UNKNOWN:
+            return UNKNOWN
+        if operator == "==":
+            return hcl_equal(left, right)
+        if operator == "!=":
+            return not hcl_equal(left, right)
+        if operator in ("&&", "||"):
+            left, right = require(left, "bool", operator), require(right, "bool", operator)
+            return (left and right) if operator == "&&" else (left or right)
+        left, right = require(left, "number", operator), require(right, "number", operator)
+        if operator in ("/", "%") and right == 0:
+            raise EvaluationError("Division by zero")
+        return {
+            "<": lambda: left < right, ">": lambda: left > right,
+            "<=": lambda: left <= right, ">=": lambda: left >= right,
+            "+": lambda: left + right, "-": lambda: left - right, "*": lambda: left * right,
+            "/": lambda: left / right, "%": lambda: left % right,
+        }[operator]()
+
+    def for_expression(self, node: tuple, bindings: Dict[str, Any]) -> Any:
+        _, kind, key_name, value_name, collection_node, key_node, value_node, condition_node = node
+        collection = self.evaluate_node(collection_node, bindings)
+        if collection is UNKNOWN:
+            return UNKNOWN
+        if isinstance(collection, dict):
+            items = [(key, collection[key]) for key in sorted(collection)]
+        elif isinstance(collection, list):
+            items = list(enumerate(collection))
+        else:
+            raise EvaluationError(f"Iteration over a {type_name(collection)} value")
+
+        results: Any = {} if kind == "object" else []
+        for key, value in items:
+            scope = dict(bindings)
+            scope[value_name] = value
+            if key_name:
+                scope[key_name] = key
+            if condition_node is not None:
+                keep = self.evaluate_node(condition_node, scope)
+                if keep is UNKNOWN:
+                    return UNKNOWN
+                if not require(keep, "bool", "for condition"):
+                    continue
+            if kind == "object":
+                result_key = fn_tostring(self.evaluate_node(key_node, scope))
+                if result_key in results:
+                    raise EvaluationError(f"Duplicate object key {result_key!r}")
+                results[result_key] = self.evaluate_node(value_node, scope)
+            else:
+                results.append(self.evaluate_node(value_node, scope))
+        return results
+
+
+# Rendering variable values as .tfvars content
+
+def hcl_string(value: str) -> str:
+    """Quote a string so HCL reads it back unchanged"""
+    escaped = []
+    for pos, char in enumerate(value):
+        if char in ('"', "\\"):
+            escaped.append("\\" + char)
+        elif char in "\n\r\t":
+            escaped.append({"\n": "\\n", "\r": "\\r", "\t": "\\t"}[char])
+        elif ord(char) < 0x20 or ord(char) == 0x7F:
+            escaped.append(f"\\u{ord(char):04x}")
+        elif char in "$%" and value[pos + 1:pos + 2] == "{":
+            escaped.append(char + char)
+        else:
+            escaped.append(char)
+    return '"' + "".join(escaped) + '"'
+
+
+def hcl_value(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if is_number(value):
+        return number_to_string(value)
+    if isinstance(value, str):
+        return hcl_string(value)
+    if isinstance(value, list):
+        return "[" + ", ".join(hcl_value(item) for item in value) + "]"
+    if isinstance(value, dict):
+        return "{\n" + "".join(f"  {hcl_string(key)} = {hcl_value(item)}\n" for key, item in value.items()) + "}"
+    raise TypeError(f"cannot render {type_name(value)} as HCL")
+
+
+def render_tfvars(values: Dict[str, Any]) -> str:
+    """terraform.tfvars content assigning the given values"""
+    return "".join(f"{name} = {hcl_value(value)}\n" for name, value in values.items())
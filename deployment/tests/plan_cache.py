@@ -0,0 +1,134 @@
+# Terraform Plan Cache
+# Stores the planned values of `terraform plan` on disk so property tests only plan
+# configurations they have not seen before
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+CACHE_VERSION = 1
+LOCK_FILE = ".terraform.lock.hcl"
+
+# Files that make up the configuration: the .tf files and the files they read with file()
+CONFIG_PATTERNS = ("*.tf", "functions/**/*")
+
+# python-terraform runs plan with -detailed-exitcode: 2 means the plan succeeded with changes
+PLAN_OK = (0, 2)
+
+
+class TerraformPlanError(Exception):
+    """Raised when terraform plan or show fails"""
+
+
+class PlanCache:
+    """
+    Planned values keyed by a hash of the configuration, the rendered tfvars and
+    the provider lock.
+
+    Entries are single JSON files written atomically, so the cache can be shared
+    by consecutive pytest runs and by concurrent xdist workers. Failed plans are
+    never stored.
+
+    The source tree does not commit a provider lock, so the lock written by the
+    first `terraform init` is kept next to the entries and copied into every
+    later workspace. All workspaces then plan with the same provider versions,
+    and clearing the cache re-resolves them.
+    """
+
+    def __init__(self, cache_dir: Path, terraform_dir: Path, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.terraform_dir = terraform_dir
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._config_digest: Optional[str] = None
+
+    def config_digest(self) -> str:
+        """Hash of the Terraform configuration files (computed once per session)"""
+        if self._config_digest is None:
+            sha256 = hashlib.sha256()
+            paths = {path for pattern in CONFIG_PATTERNS for path in self.terraform_dir.glob(pattern)}
+            for path in sorted(path for path in paths if path.is_file()):
+                sha256.update(path.relative_to(self.terraform_dir).as_posix().encode("utf-8") + b"\0")
+                sha256.update(hashlib.sha256(path.read_bytes()).digest())
+            self._config_digest = sha256.hexdigest()
+        return self._config_digest
+
+    def lock_path(self) -> Path:
+        """The committed provider lock if there is one, otherwise the one pinned by the cache"""
+        source_lock = self.terraform_dir / LOCK_FILE
+        return source_lock if source_lock.is_file() else self.cache_dir / LOCK_FILE
+
+    def provider_lock(self) -> Optional[str]:
+        try:
+            return self.lock_path().read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def pin_providers(self, workspace_dir: Path) -> None:
+        """Copy the pinned provider lock into a workspace before terraform init"""
+        lock_path = self.lock_path()
+        if lock_path.is_file() and not (workspace_dir / LOCK_FILE).is_file():
+            shutil.copyfile(lock_path, workspace_dir / LOCK_FILE)
+
+    def record_providers(self, workspace_dir: Path) -> None:
+        """Keep the lock written by terraform init when no lock is pinned yet"""
+        workspace_lock = workspace_dir / LOCK_FILE
+        if workspace_lock.is_file() and not self.lock_path().is_file():
+            self._write(self.cache_dir / LOCK_FILE, workspace_lock.read_text(encoding="utf-8"))
+
+    def key(self, tfvars: str) -> str:
+        payload = json.dumps([CACHE_VERSION, self.config_digest(), self.provider_lock() or "", tfvars])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        try:
+            return json.loads((self.cache_dir / f"{key}.json").read_text(encoding="utf-8"))["planned_values"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def put(self, key: str, planned_values: Dict) -> None:
+        if self.enabled:
+            self._write(self.cache_dir / f"{key}.json", json.dumps({"planned_values": planned_values}))
+
+    def _write(self, path: Path, content: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def plan(self, tfvars: str, workspaces) -> Dict:
+        """
+        Planned values of the configuration with the given tfvars content.
+
+        A workspace is only taken from the WorkspacePool when terraform has to
+        run, so fully cached runs never init.
+        """
+        if self.provider_lock() is None:
+            # The first init pins the providers that are part of the key
+            workspaces.prepare()
+        key = self.key(tfvars)
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        with workspaces.acquire(tfvars) as (workspace_dir, tf):
+            return_code, stdout, stderr = tf.plan(capture_output=True, var_file="terraform.tfvars", out="tfplan")
+            if return_code not in PLAN_OK:
+                raise TerraformPlanError(f"Terraform plan failed: {stderr}")
+            return_code, plan_json, stderr = tf.show("tfplan", json=True, capture_output=True)
+            if return_code != 0:
+                raise TerraformPlanError(f"Terraform show failed: {stderr}")
+
+        planned_values = json.loads(plan_json).get("planned_values", {})
+        self.put(key, planned_values)
+        return planned_values
@@ -32,13 +32,19 @@ def install_dependencies():
 
 
 def run_property_tests():
-    """Run property-based tests."""
-    print("Running property-based tests...")
+    """Run property-based tests across all cores."""
+    # Number of xdist workers; 'auto' uses one per CPU core
+    workers = os.environ.get('TEST_WORKERS', 'auto')
+    print(f"Running property-based tests ({workers} workers)...")
     
-    # Run only property tests
+    # Run only property tests. Every worker initializes its own Terraform
+    # workspaces; tests are dealt out longest-first from the durations of
+    # the previous run (see duration_schedule.py)
     result = subprocess.run([
         sys.executable, '-m', 'pytest', 
         '-m', 'property',
+        '-n', workers,
+        '--dist', 'load',
         '--tb=short',
         '-v'
     ], cwd=Path(__file__).parent)
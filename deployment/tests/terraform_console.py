@@ -0,0 +1,310 @@
+# Terraform Console Worker
+# Long-lived `terraform console` processes that evaluate batches of expressions
+
+"""
+`terraform console` only stays alive as a REPL when stdin is a terminal (piped
+input prints the last result and exits on the first error), so each worker
+runs it on a pseudo-terminal. Variables are fixed when the console starts,
+so there is one worker per variable set; TerraformConsole keeps the most
+recently used ones running.
+
+A batch is written in one go, every expression wrapped in jsonencode() and
+followed by a frame marker:
+
+    jsonencode(<expression 0>)
+    upper("@@frame-<nonce>-0")
+    jsonencode(<expression 1>)
+    upper("@@frame-<nonce>-1")
+
+The console prints each marker as "@@FRAME-<NONCE>-<i>" (quoted), which can
+never be confused with the echoed input. Between two markers there is either
+a single quoted JSON result or the diagnostics of a failed expression.
+"""
+
+import json
+import os
+import re
+import select
+import signal
+import struct
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+    import pty
+    import termios
+except ImportError:  # Windows
+    pty = None
+
+from hcl_evaluator import UNKNOWN, hcl_string, render_tfvars
+
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07]*\x07|\x1b[@-Z\\-_]")
+BOX_CHARACTERS = "\u2577\u2502\u2575"
+GO_ESCAPES = {"a": "\a", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v",
+              "\\": "\\", '"': '"', "'": "'"}
+PROMPT = "> "
+UNKNOWN_OUTPUT = "(known after apply)"
+SENSITIVE_OUTPUT = "(sensitive value)"
+
+# Wide enough that readline never wraps an echoed expression
+TERMINAL_COLUMNS = 10000
+
+
+class ConsoleError(Exception):
+    """The console could not be started or stopped responding"""
+
+
+class ConsoleTimeout(ConsoleError):
+    """A batch did not complete within its deadline"""
+
+
+class ConsoleExited(ConsoleError):
+    """The console process exited"""
+
+
+class ExpressionError(ConsoleError):
+    """Terraform could not evaluate an expression"""
+
+    def __init__(self, expression: str, message: str):
+        super().__init__(f"{expression}: {message}")
+        self.expression = expression
+        self.message = message
+
+
+def unquote(text: str) -> str:
+    """Decode a double-quoted string as printed by terraform console (Go escapes)"""
+    if len(text) < 2 or not (text.startswith('"') and text.endswith('"')):
+        raise ValueError(f"not a quoted string: {text!r}")
+    body = text[1:-1]
+    decoded = bytearray()
+    pos = 0
+    while pos < len(body):
+        char = body[pos]
+        if char != "\\":
+            decoded += char.encode("utf-8")
+            pos += 1
+            continue
+        escape = body[pos + 1:pos + 2]
+        if escape in GO_ESCAPES:
+            decoded += GO_ESCAPES[escape].encode("utf-8")
+            pos += 2
+        elif escape in ("x", "u", "U"):
+            width = {"x": 2, "u": 4, "U": 8}[escape]
+            code = int(body[pos + 2:pos + 2 + width], 16)
+            decoded += bytes([code]) if escape == "x" else chr(code).encode("utf-8")
+            pos += 2 + width
+        else:
+            raise ValueError(f"invalid escape \\{escape} in {text!r}")
+    return decoded.decode("utf-8", errors="replace")
+
+
+def console_string(value: str) -> str:
+    """Quote a string as an ASCII-only HCL literal, safe to type into the console"""
+    return "".join(char if ord(char) < 0x80 else
+                   f"\\u{ord(char):04x}" if ord(char) <= 0xFFFF else f"\\U{ord(char):08x}"
+                   for char in hcl_string(value))
+
+
+def screen_lines(output: str) -> List[str]:
+    """Terminal output as the lines a user would see (escape sequences and redraws removed)"""
+    lines = []
+    for line in ANSI_ESCAPE.sub("", output).replace("\r\n", "\n").split("\n"):
+        # Readline redraws a line after a carriage return; keep what is left visible
+        lines.append(next((part for part in reversed(line.split("\r")) if part), ""))
+    return lines
+
+
+class ConsoleWorker:
+    """One `terraform console` process running in a workspace"""
+
+    def __init__(self, workspace_dir: Path, var_file: str = "terraform.tfvars",
+                 start_timeout: float = 120.0, timeout: float = 30.0):
+        self.workspace_dir = workspace_dir
+        self.var_file = var_file
+        self.start_timeout = start_timeout
+        self.timeout = timeout
+        self.process: Optional[subprocess.Popen] = None
+        self.master_fd: Optional[int] = None
+        self.output = ""
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self) -> None:
+        if pty is None:
+            raise ConsoleError("terraform console workers need a POSIX pseudo-terminal")
+        master_fd, slave_fd = pty.openpty()
+        fcntl.ioctl(slave_fd, termios.TIOCSWINSZ, struct.pack("HHHH", 50, TERMINAL_COLUMNS, 0, 0))
+        try:
+            self.process = subprocess.Popen(
+                ["terraform", "console", f"-var-file={self.var_file}"],
+                stdin=slave_fd, stdout=slave_fd, stderr=slave_fd,
+                cwd=self.workspace_dir,
+                env={**os.environ, "TERM": "dumb", "TF_IN_AUTOMATION": "1"},
+                start_new_session=True, close_fds=True,
+            )
+        finally:
+            os.close(slave_fd)
+        os.set_blocking(master_fd, False)
+        self.master_fd = master_fd
+        self.output = ""
+        try:
+            self._exchange(b"", lambda lines: lines[-1].startswith(PROMPT.rstrip()),
+                           time.monotonic() + self.start_timeout)
+        except ConsoleError as e:
+            output = "\n".join(screen_lines(self.output)).strip()
+            self.stop()
+            raise ConsoleError(f"terraform console did not start: {e}\n{output}")
+
+    def stop(self) -> None:
+        if self.process is not None:
+            if self.process.poll() is None:
+                try:
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            self.process.wait()
+            self.process = None
+        if self.master_fd is not None:
+            os.close(self.master_fd)
+            self.master_fd = None
+
+    def _exchange(self, data: bytes, done: Callable[[List[str]], bool], deadline: float) -> None:
+        """Write data while collecting output until done(lines) holds"""
+        while True:
+            if done(screen_lines(self.output)):
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ConsoleTimeout("timed out waiting for terraform console")
+            readable, writable, _ = select.select([self.master_fd], [self.master_fd] if data else [], [],
+                                                  min(remaining, 1.0))
+            if writable:
+                written = os.write(self.master_fd, data)
+                data = data[written:]
+            if readable:
+                try:
+                    chunk = os.read(self.master_fd, 65536)
+                except OSError:  # EIO once the process has exited
+                    chunk = b""
+                if not chunk:
+                    raise ConsoleExited(f"terraform console exited with code {self.process.wait()}")
+                self.output += chunk.decode("utf-8", errors="replace")
+
+    def evaluate(self, expressions: List[str]) -> List[Any]:
+        """Values of single-line expressions, in order; raises ExpressionError for the first failure"""
+        if not self.running:
+            self.start()
+        nonce = uuid.uuid4().hex[:12]
+        frame = re.compile(rf'^"@@FRAME-{nonce.upper()}-(\d+)"$')
+        lines = []
+        for index, expression in enumerate(expressions):
+            if "\n" in expression:
+                raise ValueError(f"expressions must be single-line: {expression!r}")
+            lines.append(f"jsonencode({expression})")
+            lines.append(f'upper("@@frame-{nonce}-{index}")')
+
+        self.output = ""
+        last = len(expressions) - 1
+        deadline = time.monotonic() + self.timeout + 0.01 * len(expressions)
+        try:
+            self._exchange(("\n".join(lines) + "\n").encode("utf-8"),
+                           lambda screen: any(frame.match(line) and int(frame.match(line).group(1)) == last
+                                              for line in screen),
+                           deadline)
+        except ConsoleError:
+            self.stop()
+            raise
+
+        segments: Dict[int, List[str]] = {}
+        current: List[str] = []
+        for line in screen_lines(self.output):
+            match = frame.match(line)
+            if match:
+                segments[int(match.group(1))] = current
+                current = []
+            else:
+                current.append(line)
+
+        values = []
+        for index, expression in enumerate(expressions):
+            values.append(self._result(expression, segments.get(index, [])))
+        return values
+
+    def _result(self, expression: str, segment: List[str]) -> Any:
+        results = [line for line in segment if line.startswith('"') or line in (UNKNOWN_OUTPUT, SENSITIVE_OUTPUT)]
+        if len(results) > 1:
+            raise ConsoleError(f"unexpected console output for {expression}: {results}")
+        if not results:
+            message = "\n".join(line.strip(BOX_CHARACTERS + " ") for line in segment
+                                if line.strip() and not line.startswith(PROMPT.rstrip()))
+            raise ExpressionError(expression, message.strip() or "no result")
+        if results[0] == UNKNOWN_OUTPUT:
+            return UNKNOWN
+        if results[0] == SENSITIVE_OUTPUT:
+            raise ExpressionError(expression, "value is sensitive")
+        return json.loads(unquote(results[0]))
+
+
+class TerraformConsole:
+    """
+    evaluate(variables, expressions) answered by long-lived console workers.
+
+    Each distinct variable set gets a worker in its own workspace from the
+    WorkspacePool; up to max_workers stay running, least recently used first
+    out. A worker that crashes is restarted and the batch retried once.
+    """
+
+    def __init__(self, workspaces, max_workers: int = 4, timeout: float = 30.0, start_timeout: float = 120.0):
+        self.workspaces = workspaces
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self._workers: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _worker(self, tfvars: str) -> ConsoleWorker:
+        if tfvars in self._workers:
+            self._workers.move_to_end(tfvars)
+            return self._workers[tfvars][0]
+        while len(self._workers) >= self.max_workers:
+            self._close(next(iter(self._workers)))
+        stack = ExitStack()
+        workspace_dir, _ = stack.enter_context(self.workspaces.acquire(tfvars))
+        worker = ConsoleWorker(workspace_dir, start_timeout=self.start_timeout, timeout=self.timeout)
+        self._workers[tfvars] = (worker, stack)
+        return worker
+
+    def _close(self, tfvars: str) -> None:
+        worker, stack = self._workers.pop(tfvars)
+        worker.stop()
+        stack.close()
+
+    def evaluate(self, variables: Dict[str, Any], expressions: List[str]) -> List[Any]:
+        """Values of the expressions with the given variable values, in order"""
+        if not expressions:
+            return []
+        tfvars = render_tfvars(variables)
+        with self._lock:
+            worker = self._worker(tfvars)
+            try:
+                return worker.evaluate(expressions)
+            except ConsoleExited:
+                return worker.evaluate(expressions)
+            except ConsoleError as e:
+                if not isinstance(e, ExpressionError):
+                    self._close(tfvars)
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            while self._workers:
+                self._close(next(iter(self._workers)))
@@ -0,0 +1,97 @@
+# Unit Tests for Bundle Attribution
+# Source map VLQ decoding, per-module byte totals on a hand-built map and builds without maps
+
+import json
+
+import pytest
+
+from bundle_budget import (UNMAPPED, BundleAnalyzer, attribute_bytes, compare_reports, decode_mappings,
+                           module_name, summary_lines)
+
+
+class TestDecodeMappings:
+    """decode_mappings yields absolute columns and source indexes from relative VLQ fields"""
+
+    @pytest.mark.parametrize("mappings, expected", [
+        # One four-field segment at the origin
+        ("AAAA", [(0, 0, 0)]),
+        # Columns and sources are relative to the previous segment; "gB" is the two-digit VLQ for 16
+        ("AAAA,gBCAA", [(0, 0, 0), (0, 16, 1)]),
+        # The column restarts on every line, the source index does not; "D" is -1
+        ("AAAA,QCAA;;EDAA", [(0, 0, 0), (0, 8, 1), (2, 2, 0)]),
+        # One-field segments end a mapped range; the name field of five-field segments is ignored
+        ("ACAAC,Q,EAAAA", [(0, 0, 1), (0, 8, None), (0, 10, 1)]),
+        # Empty lines and empty segments
+        (";;", []),
+    ])
+    def test_decode_mappings(self, mappings, expected):
+        assert list(decode_mappings(mappings)) == expected
+
+
+class TestAttributeBytes:
+    """attribute_bytes assigns every generated byte to exactly one module"""
+
+    SOURCE_MAP = {
+        "version": 3,
+        "sources": [
+            "webpack://kb-engine/./src/App.js",
+            "webpack://kb-engine/./node_modules/@mui/material/Button/Button.js",
+        ],
+        # Line 0: App.js [0, 8), Button.js [8, 16), unmapped [16, 19)
+        # Line 1: no segments
+        # Line 2: unmapped [0, 2), App.js from column 2
+        "mappings": "AAAA,QCAA,Q;;EDAA",
+    }
+    CODE = "var a=1;var b=2;//x\n/* banner */\n  x(ä);"
+
+    def test_module_names(self):
+        assert [module_name(source) for source in self.SOURCE_MAP["sources"]] == [
+            "src/App.js", "node_modules/@mui/material"]
+
+    def test_bytes_per_source(self):
+        sizes = attribute_bytes(self.CODE, self.SOURCE_MAP)
+
+        assert sizes == {
+            "src/App.js": 8 + 6,  # "x(ä);" is 6 bytes in UTF-8
+            "node_modules/@mui/material": 8,
+            UNMAPPED: 3 + 12 + 2 + 2,  # trailing comment, banner line, indent, two newlines
+        }
+        assert sum(sizes.values()) == len(self.CODE.encode("utf-8"))
+
+    def test_without_mappings_everything_is_unmapped(self):
+        assert attribute_bytes("a\nb", {"sources": [], "mappings": ""}) == {UNMAPPED: 3}
+
+
+class TestSourceMaps:
+    """Chunks without a source map are measured whole and reported as unattributed"""
+
+    @pytest.fixture
+    def build_dir(self, tmp_path):
+        js = tmp_path / "static" / "js"
+        js.mkdir(parents=True)
+        (js / "main.1a2b3c4d.js").write_text(TestAttributeBytes.CODE, encoding="utf-8")
+        (js / "main.1a2b3c4d.js.map").write_text(json.dumps(TestAttributeBytes.SOURCE_MAP))
+        (js / "vendors.5e6f7a8b.chunk.js").write_text("var v=1;" * 1000)
+        (tmp_path / "asset-manifest.json").write_text(json.dumps({"files": {
+            "main.js": "/static/js/main.1a2b3c4d.js",
+            "main.js.map": "/static/js/main.1a2b3c4d.js.map",
+            "static/js/vendors.chunk.js": "/static/js/vendors.5e6f7a8b.chunk.js",
+        }}))
+        return tmp_path
+
+    def test_report_lists_unattributed_chunks(self, build_dir, caplog):
+        report = BundleAnalyzer(build_dir).analyze("r1")
+
+        assert set(report["chunks"]["main.js"]["modules"]) == {"src/App.js", "node_modules/@mui/material", UNMAPPED}
+        assert report["chunks"]["vendors.js"]["modules"] == {}
+        assert report["unattributed"] == ["vendors.js"]
+        assert "Module attribution unavailable for 1 of 2 chunk(s)" in caplog.text
+        assert summary_lines(report)[-1] == "  Module attribution unavailable for 1 chunk(s) (no source maps)"
+
+    def test_growth_of_an_unattributed_chunk_says_so(self, build_dir):
+        report = BundleAnalyzer(build_dir).analyze("r2")
+        previous = {"chunks": {"vendors.js": dict(report["chunks"]["vendors.js"], gzip=1)}}
+
+        [problem] = compare_reports(previous, report, {"min_regression_bytes": 0})
+        assert problem.splitlines()[0].startswith("vendors.js grew")
+        assert problem.splitlines()[1] == "    module attribution unavailable (no source map)"
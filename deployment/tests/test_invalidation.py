@@ -0,0 +1,94 @@
+# Unit Tests for CloudFront Invalidation Planning
+# Table-driven checks of wildcard collapsing and the path-budget fallback
+
+import pytest
+
+from invalidation import WILDCARD_ALL, collapse_paths, plan_invalidation
+from manifest import ManifestDiff
+
+
+class TestCollapsePaths:
+    """
+    collapse_paths merges sibling paths into wildcard prefixes until the set
+    fits the CloudFront path budget, and falls back to /* when it cannot.
+    """
+
+    @pytest.mark.parametrize("paths, max_paths, max_wildcards, expected", [
+        # At or under the threshold nothing is merged
+        (["/b.txt", "/a.txt"], 2, 15, ["/a.txt", "/b.txt"]),
+        ([], 3000, 15, []),
+        # One over the threshold merges the largest sibling group
+        (["/a/1", "/a/2", "/a/3", "/b/1"], 3, 15, ["/a/*", "/b/1"]),
+        # Equal group sizes: the deepest prefix is merged first
+        (["/x/y/1", "/x/y/2", "/z/1", "/z/2"], 3, 15, ["/x/y/*", "/z/1", "/z/2"]),
+        # Wildcards merge again into their parent
+        (["/a/b/*", "/a/c/*", "/a/d"], 2, 15, ["/a/*"]),
+        # Enough wildcard budget: two prefixes
+        (["/a/1", "/a/2", "/b/1", "/b/2"], 2, 2, ["/a/*", "/b/*"]),
+    ])
+    def test_collapse_paths(self, paths, max_paths, max_wildcards, expected):
+        """Paths are merged into the expected wildcard prefixes"""
+        assert collapse_paths(paths, max_paths, max_wildcards) == expected
+
+    @pytest.mark.parametrize("paths, max_paths, max_wildcards", [
+        # Siblings at the bucket root can only merge into /*
+        (["/a.html", "/b.html", "/c.html"], 2, 15),
+        # Every group has a single member, so nothing can be merged
+        (["/a/1", "/b/1", "/c/1"], 2, 15),
+        # The second wildcard would exceed the wildcard budget
+        (["/a/1", "/a/2", "/b/1", "/b/2"], 2, 1),
+    ])
+    def test_overflow_falls_back_to_everything(self, paths, max_paths, max_wildcards):
+        """Path sets that cannot fit the budget invalidate /*"""
+        assert collapse_paths(paths, max_paths, max_wildcards) == [WILDCARD_ALL]
+
+
+class TestPlanInvalidation:
+    """
+    plan_invalidation only invalidates mutable paths an upload touched, and
+    reports how many live objects stay cached.
+    """
+
+    LIVE = ["index.html", "manifest.json", "robots.txt", "static/js/main.1a2b3c4d.js",
+            "static/media/a.svg", "static/media/b.svg", "static/media/logo.6ce24c58.svg"]
+
+    def diff(self, changed=(), added=(), deleted=(), full_upload=False) -> ManifestDiff:
+        touched = set(changed) | set(added)
+        return ManifestDiff(
+            added=list(added),
+            changed=list(changed),
+            unchanged=[key for key in self.LIVE if key not in touched],
+            deleted=list(deleted),
+            full_upload=full_upload,
+        )
+
+    @pytest.mark.parametrize("changes, max_paths, expected_paths, invalidated", [
+        # Nothing mutable changed: no invalidation at all
+        ({"changed": ["static/js/main.1a2b3c4d.js"]}, 3000, [], 0),
+        # index.html is also served for / through default_root_object
+        ({"changed": ["index.html"]}, 3000, ["/", "/index.html"], 1),
+        # Content-hashed additions are skipped, mutable ones are not
+        ({"added": ["static/js/787.4f1e2d3c.chunk.js", "robots.txt"]}, 3000, ["/robots.txt"], 1),
+        # Deleted mutable files are invalidated too
+        ({"deleted": ["old.txt"]}, 3000, ["/old.txt"], 0),
+        # Over budget: siblings collapse and cover the hashed logo as well
+        ({"changed": ["static/media/a.svg", "static/media/b.svg"]}, 1, ["/static/media/*"], 3),
+        # Root-level paths over budget: everything
+        ({"changed": ["index.html", "manifest.json"]}, 2, [WILDCARD_ALL], 7),
+    ])
+    def test_plan_invalidation(self, changes, max_paths, expected_paths, invalidated):
+        """The plan lists the expected paths and counts the objects they cover"""
+        diff = self.diff(**changes)
+        plan = plan_invalidation(diff, max_paths=max_paths)
+
+        assert plan.paths == expected_paths
+        assert plan.invalidated_objects == invalidated
+        assert plan.kept_objects == len(diff.added + diff.changed + diff.unchanged) - invalidated
+
+    def test_full_upload_invalidates_everything(self):
+        """Without a previous manifest the edge may hold anything"""
+        plan = plan_invalidation(ManifestDiff(added=list(self.LIVE), full_upload=True))
+
+        assert plan.paths == [WILDCARD_ALL]
+        assert plan.invalidated_objects == len(self.LIVE)
+        assert plan.kept_objects == 0
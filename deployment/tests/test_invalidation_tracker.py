@@ -0,0 +1,87 @@
+# Unit Tests for the CloudFront Invalidation Tracker
+# Invalidation states over scripted GetInvalidation responses, deadlines and backoff bounds
+
+import threading
+import time
+
+import pytest
+
+from invalidation_tracker import COMPLETED, InvalidationTracker, TrackedInvalidation
+
+
+class FakeCloudFront:
+    """Answers GetInvalidation from a scripted list of statuses per invalidation"""
+
+    def __init__(self, statuses):
+        self.statuses = {key: list(value) for key, value in statuses.items()}
+        self.polls = {key: 0 for key in statuses}
+        self.lock = threading.Lock()
+
+    def get_invalidation(self, DistributionId, Id):
+        with self.lock:
+            key = (DistributionId, Id)
+            self.polls[key] += 1
+            script = self.statuses[key]
+            status = script.pop(0) if len(script) > 1 else script[0]
+        return {"Invalidation": {"Id": Id, "Status": status}}
+
+
+def tracker(client) -> InvalidationTracker:
+    return InvalidationTracker(client, base_delay=0.01, max_delay=0.02)
+
+
+class TestWait:
+    """wait() polls every invalidation until it completed or the deadline passed"""
+
+    def test_completes_after_polling(self):
+        client = FakeCloudFront({("E1", "I1"): ["InProgress", "InProgress", COMPLETED]})
+        invalidation = TrackedInvalidation("E1", "I1")
+
+        [result] = tracker(client).wait([invalidation])
+
+        assert result is invalidation
+        assert invalidation.completed and invalidation.status == COMPLETED
+        assert invalidation.seconds is not None and invalidation.seconds >= 0
+        assert client.polls[("E1", "I1")] == 3
+
+    def test_deadline_leaves_invalidation_in_progress(self):
+        client = FakeCloudFront({("E1", "I1"): ["InProgress"]})
+        invalidation = TrackedInvalidation("E1", "I1")
+
+        start = time.monotonic()
+        tracker(client).wait([invalidation], timeout=0.1)
+
+        assert time.monotonic() - start < 1
+        assert not invalidation.completed and invalidation.status == "InProgress"
+        assert invalidation.seconds is None
+
+    def test_distributions_are_tracked_independently(self):
+        client = FakeCloudFront({
+            ("E1", "I1"): [COMPLETED],
+            ("E2", "I2"): ["InProgress"] * 3 + [COMPLETED],
+            ("E3", "I3"): ["InProgress"],
+        })
+        invalidations = [TrackedInvalidation(distribution, invalidation)
+                         for distribution, invalidation in client.statuses]
+
+        results = tracker(client).wait(invalidations, timeout=0.5)
+
+        assert [result.status for result in results] == [COMPLETED, COMPLETED, "InProgress"]
+        assert client.polls[("E1", "I1")] == 1
+        assert client.polls[("E2", "I2")] == 4
+
+    def test_nothing_to_wait_for(self):
+        client = FakeCloudFront({})
+
+        assert tracker(client).wait([]) == []
+
+
+class TestBackoff:
+    """Delays are jittered between the base delay and three times the last one, capped"""
+
+    @pytest.mark.parametrize("delay", [2.0, 5.0, 20.0])
+    def test_next_delay_bounds(self, delay):
+        backoff = InvalidationTracker(None, base_delay=2.0, max_delay=30.0)
+
+        for _ in range(100):
+            assert 2.0 <= backoff.next_delay(delay) <= min(30.0, delay * 3)
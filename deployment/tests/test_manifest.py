@@ -0,0 +1,37 @@
+# Unit Tests for the Delta Uploader
+# Bootstrapping from a bucket without a manifest, against moto's S3
+
+from hashing import FileHasher
+from manifest import MANIFEST_KEY, DeltaUploader
+from transfer import MB
+
+
+class TestBootstrap:
+    """The first upload lists the bucket: matching ETags are kept, leftovers deleted"""
+
+    def test_bootstrap_uses_listed_etags(self, s3_bucket, tmp_path):
+        engine, bucket_name = s3_bucket
+        (tmp_path / "index.html").write_text("<html>new</html>")
+        (tmp_path / "robots.txt").write_text("User-agent: *")
+        s3 = engine.s3
+        s3.put_object(Bucket=bucket_name, Key="robots.txt", Body=b"User-agent: *")
+        s3.put_object(Bucket=bucket_name, Key="index.html", Body=b"<html>old</html>")
+        s3.put_object(Bucket=bucket_name, Key="old.js", Body=b"leftover")
+
+        diff = DeltaUploader(engine, bucket_name, tmp_path).upload()
+
+        assert (diff.added, diff.unchanged, diff.deleted) == (["index.html"], ["robots.txt"], ["old.js"])
+        keys = {obj["Key"] for obj in s3.list_objects_v2(Bucket=bucket_name)["Contents"]}
+        assert keys == {"index.html", "robots.txt", MANIFEST_KEY}
+        assert s3.get_object(Bucket=bucket_name, Key="index.html")["Body"].read() == b"<html>new</html>"
+
+    def test_multipart_etags_match(self, s3_bucket, tmp_path):
+        """Files above the multipart threshold carry the <md5 of part md5s>-<parts> ETag"""
+        engine, bucket_name = s3_bucket
+        engine.transfer_config.multipart_threshold = engine.transfer_config.multipart_chunksize = 5 * MB
+        (tmp_path / "big.js").write_bytes(b"x" * (11 * MB))
+        hasher = FileHasher(multipart_threshold=5 * MB, multipart_chunksize=5 * MB)
+        uploader = DeltaUploader(engine, bucket_name, tmp_path, hasher=hasher)
+        uploader.upload_file("big.js", {"cache_control": "no-cache", "content_type": "application/javascript"})
+
+        assert uploader.matching_etags(["big.js"], uploader.list_bucket_etags()) == ["big.js"]
@@ -0,0 +1,77 @@
+# Unit Tests for the Object Metadata Policy
+# Rule table classification, and drift detection and repair against moto's S3
+
+import pytest
+
+from object_policy import (IMMUTABLE_CACHE_CONTROL, MANIFEST_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL,
+                           STATIC_CACHE_CONTROL, MetadataAuditor, policy_for)
+
+
+class TestPolicyFor:
+    """The first matching rule decides Cache-Control; variants add Content-Encoding"""
+
+    @pytest.mark.parametrize("key, kind, cache_control, content_type, content_encoding", [
+        ("static/js/main.1a2b3c4d.js", "hashed", IMMUTABLE_CACHE_CONTROL, "application/javascript", None),
+        ("static/js/787.4f1e2d3c.chunk.js.map", "hashed", IMMUTABLE_CACHE_CONTROL, "application/json", None),
+        ("static/css/main.0a1b2c3d.css.br", "hashed", IMMUTABLE_CACHE_CONTROL, "text/css", "br"),
+        ("index.html", "html", REVALIDATE_CACHE_CONTROL, "text/html; charset=utf-8", None),
+        ("index.html.gz", "html", REVALIDATE_CACHE_CONTROL, "text/html; charset=utf-8", "gzip"),
+        ("sw.js", "service_worker", REVALIDATE_CACHE_CONTROL, "application/javascript", None),
+        ("manifest.json", "web_manifest", MANIFEST_CACHE_CONTROL, "application/manifest+json", None),
+        ("robots.txt", "static", STATIC_CACHE_CONTROL, "text/plain; charset=utf-8", None),
+    ])
+    def test_policy_for(self, key, kind, cache_control, content_type, content_encoding):
+        policy = policy_for(key)
+
+        assert (policy.kind, policy.cache_control, policy.content_type, policy.content_encoding) == (
+            kind, cache_control, content_type, content_encoding)
+
+
+class TestMetadataAuditor:
+    """Objects whose stored headers differ from the policy are found and rewritten in place"""
+
+    @pytest.fixture
+    def bucket(self, s3_bucket):
+        """A bucket with one correct object and two drifted ones"""
+        engine, bucket_name = s3_bucket
+        s3 = engine.s3
+        s3.put_object(Bucket=bucket_name, Key="index.html", Body=b"<html></html>",
+                      CacheControl=REVALIDATE_CACHE_CONTROL, ContentType="text/html; charset=utf-8")
+        # Uploaded by a plain sync: default type and a day-long cache
+        s3.put_object(Bucket=bucket_name, Key="releases/r1/robots.txt", Body=b"User-agent: *",
+                      CacheControl="max-age=86400", ContentType="binary/octet-stream")
+        s3.put_object(Bucket=bucket_name, Key="static/js/main.1a2b3c4d.js.br", Body=b"\x1b\x00",
+                      CacheControl=IMMUTABLE_CACHE_CONTROL, ContentType="application/javascript")
+        return engine, bucket_name
+
+    KEYS = {
+        "index.html": "index.html",
+        "releases/r1/robots.txt": "robots.txt",
+        "static/js/main.1a2b3c4d.js.br": "static/js/main.1a2b3c4d.js.br",
+    }
+
+    def test_audit_finds_drift(self, bucket):
+        engine, bucket_name = bucket
+        drifts = MetadataAuditor(engine, bucket_name).audit(self.KEYS)
+
+        assert {drift.key: drift.fields for drift in drifts} == {
+            # Checked against the policy of its build name, not of its release key
+            "releases/r1/robots.txt": {
+                "CacheControl": ("max-age=86400", STATIC_CACHE_CONTROL),
+                "ContentType": ("binary/octet-stream", "text/plain; charset=utf-8"),
+            },
+            "static/js/main.1a2b3c4d.js.br": {"ContentEncoding": (None, "br")},
+        }
+        assert drifts[0].describe().startswith("releases/r1/robots.txt (static): CacheControl: ")
+
+    def test_fix_rewrites_metadata_and_keeps_content(self, bucket):
+        engine, bucket_name = bucket
+        auditor = MetadataAuditor(engine, bucket_name)
+
+        auditor.fix(auditor.audit(self.KEYS))
+
+        assert auditor.audit(self.KEYS) == []
+        head = engine.s3.head_object(Bucket=bucket_name, Key="static/js/main.1a2b3c4d.js.br")
+        assert (head["CacheControl"], head["ContentEncoding"]) == (IMMUTABLE_CACHE_CONTROL, "br")
+        body = engine.s3.get_object(Bucket=bucket_name, Key="releases/r1/robots.txt")["Body"].read()
+        assert body == b"User-agent: *"
@@ -0,0 +1,119 @@
+# Unit Tests for the Deploy Pipeline
+# Dependency order, failure propagation and cancellation of the stage graph
+
+import threading
+
+import pytest
+
+import pipeline
+from errors import DeploymentError
+from pipeline import Pipeline, Stage
+
+
+class TestValidation:
+    """Graphs with unknown dependencies or cycles are rejected before anything runs"""
+
+    @pytest.mark.parametrize("stages, message", [
+        ([Stage("upload", lambda results: None, ["build"])], "unknown stage 'build'"),
+        ([Stage("a", lambda results: None, ["b"]), Stage("b", lambda results: None, ["a"])], "cycle"),
+    ])
+    def test_invalid_graph(self, stages, message):
+        with pytest.raises(DeploymentError, match=message):
+            Pipeline(stages)
+
+
+class TestRun:
+    """Stages start once their dependencies have finished and see their results"""
+
+    def test_dependency_order(self):
+        order = []
+
+        def stage(name, value):
+            def func(results):
+                order.append(name)
+                return value(results)
+            return func
+
+        results = Pipeline([
+            Stage("activate", stage("activate", lambda results: results["upload"] + 1), ["upload"]),
+            Stage("upload", stage("upload", lambda results: results["build"] + results["infrastructure"]),
+                  ["build", "infrastructure"]),
+            Stage("build", stage("build", lambda results: 1)),
+            Stage("infrastructure", stage("infrastructure", lambda results: 10)),
+        ]).run()
+
+        assert results == {"build": 1, "infrastructure": 10, "upload": 11, "activate": 12}
+        assert order[2:] == ["upload", "activate"]
+
+    def test_independent_stages_overlap(self):
+        """Both stages must be running at once to pass the barrier"""
+        barrier = threading.Barrier(2, timeout=5)
+        results = Pipeline([
+            Stage("build", lambda results: barrier.wait() is not None),
+            Stage("infrastructure", lambda results: barrier.wait() is not None),
+        ]).run()
+
+        assert results == {"build": True, "infrastructure": True}
+
+    def test_failure_stops_the_graph(self):
+        """The first error is re-raised, dependents never start and running siblings are cancelled"""
+        cancelled = threading.Event()
+        running = threading.Event()
+        started = []
+
+        def terraform(results):
+            started.append("infrastructure")
+            running.set()
+            assert cancelled.wait(5)
+            return "stopped"
+
+        def build(results):
+            running.wait(5)
+            raise DeploymentError("Frontend build failed")
+
+        stages = [
+            Stage("build", build),
+            Stage("infrastructure", terraform),
+            Stage("upload", lambda results: started.append("upload"), ["build", "infrastructure"]),
+        ]
+        with pytest.raises(DeploymentError, match="Frontend build failed"):
+            Pipeline(stages, on_cancel=cancelled.set).run()
+
+        assert started == ["infrastructure"]
+        assert cancelled.is_set()
+
+
+class TestInterrupt:
+    """Ctrl-C in the main thread cancels queued stages and stops the running ones"""
+
+    def test_keyboard_interrupt_cancels_stages(self, monkeypatch):
+        cancelled = threading.Event()
+        started = threading.Event()
+        ran = []
+
+        def npm_build(results):
+            ran.append("build")
+            started.set()
+            assert cancelled.wait(5)
+
+        real_wait = pipeline.wait
+
+        def interrupted_wait(futures, **kwargs):
+            if not cancelled.is_set():
+                started.wait(5)
+                raise KeyboardInterrupt
+            return real_wait(futures, **kwargs)
+
+        monkeypatch.setattr(pipeline, "wait", interrupted_wait)
+        stages = [
+            Stage("build", npm_build),
+            # Queued behind build on the single worker
+            Stage("infrastructure", lambda results: ran.append("infrastructure")),
+            Stage("upload", lambda results: ran.append("upload"), ["build", "infrastructure"]),
+        ]
+        calls = []
+        with pytest.raises(KeyboardInterrupt):
+            Pipeline(stages, max_workers=1, on_cancel=lambda: (calls.append(1), cancelled.set())).run()
+
+        assert ran == ["build"]
+        assert calls == [1]
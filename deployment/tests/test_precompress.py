@@ -0,0 +1,69 @@
+# Unit Tests for the Precompression Stage
+# Cached variants are placed once, so warm runs leave the build tree untouched
+
+import gzip
+
+import brotli
+import pytest
+
+from hashing import FileHasher
+from manifest import build_manifest
+from precompress import Precompressor
+
+
+@pytest.fixture
+def build_dir(tmp_path):
+    build_dir = tmp_path / "build"
+    for index in range(50):
+        path = build_dir / "static" / "js" / f"{index}.{index:08x}.chunk.js"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"console.log({index});" * 50)
+    (build_dir / "index.html").write_text("<html><body>kb-engine</body></html>")
+    (build_dir / "logo.png").write_bytes(b"\x89PNG")
+    return build_dir
+
+
+def precompress_and_hash(build_dir, cache_dir):
+    """One deploy: precompress, then hash the build tree for the manifest, each with its cache file"""
+    precompressor = Precompressor(build_dir, cache_dir / "compression", max_workers=1,
+                                  hasher=FileHasher(cache_dir / "hashes-precompress.json"))
+    result = precompressor.run()
+    hasher = FileHasher(cache_dir / "hashes-build.json")
+    build_manifest(build_dir, hasher)
+    return result, precompressor.hasher, hasher
+
+
+class TestPrecompressor:
+
+    def test_variants_decompress_to_the_source(self, build_dir, tmp_path):
+        result, _, _ = precompress_and_hash(build_dir, tmp_path / "cache")
+
+        source = (build_dir / "index.html").read_bytes()
+        assert brotli.decompress((build_dir / "index.html.br").read_bytes()) == source
+        assert gzip.decompress((build_dir / "index.html.gz").read_bytes()) == source
+        assert not (build_dir / "logo.png.br").exists()
+        assert (result.files, result.variants, result.compressed) == (51, 102, 102)
+
+    def test_warm_run_rehashes_nothing(self, build_dir, tmp_path):
+        """Unchanged variants are not rewritten, so neither the sources nor the variants are read again"""
+        precompress_and_hash(build_dir, tmp_path / "cache")
+        stats = {path: path.stat() for path in build_dir.rglob("*.br")}
+
+        result, precompress_hasher, build_hasher = precompress_and_hash(build_dir, tmp_path / "cache")
+
+        assert result.compressed == 0 and result.cache_hits == 102
+        assert precompress_hasher.misses == 0
+        assert build_hasher.misses == 0 and build_hasher.hits == 154
+        assert all(path.stat().st_ino == stat.st_ino and path.stat().st_mtime_ns == stat.st_mtime_ns
+                   for path, stat in stats.items())
+
+    def test_changed_source_replaces_its_variants(self, build_dir, tmp_path):
+        precompress_and_hash(build_dir, tmp_path / "cache")
+        (build_dir / "index.html").write_text("<html><body>changed</body></html>")
+
+        result, _, build_hasher = precompress_and_hash(build_dir, tmp_path / "cache")
+
+        assert result.compressed == 2
+        assert brotli.decompress((build_dir / "index.html.br").read_bytes()) == b"<html><body>changed</body></html>"
+        # The source and its two variants
+        assert build_hasher.misses == 3
@@ -0,0 +1,160 @@
+# Unit Tests for Versioned Releases
+# Shared content-hashed keys, per-release unhashed files and pruning, against moto's S3
+
+from collections import Counter
+
+import pytest
+
+from errors import DeploymentError
+from releases import ReleaseManager, release_prefix
+
+
+def write_build(build_dir, version: int, chunks: int = 20) -> None:
+    """A CRA-like build: hashed chunks (the first one changes with the version) and unhashed root files"""
+    for index in range(chunks):
+        digest = f"{1000 * version if index == 0 else 1000 + index:08x}"
+        path = build_dir / "static" / "js" / f"{index}.{digest}.chunk.js"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"chunk {index} {digest}")
+    for stale in build_dir.glob("static/js/0.*"):
+        if stale.name != f"0.{1000 * version:08x}.chunk.js":
+            stale.unlink()
+    (build_dir / "index.html").write_text(f"<html>{version}</html>")
+    (build_dir / "robots.txt").write_text("User-agent: *")
+
+
+def bucket_keys(engine, bucket_name):
+    return {obj["Key"] for obj in engine.s3.list_objects_v2(Bucket=bucket_name).get("Contents", [])}
+
+
+@pytest.fixture
+def releases(s3_bucket):
+    engine, bucket_name = s3_bucket
+    return ReleaseManager(engine, bucket_name)
+
+
+@pytest.fixture
+def operations(s3_bucket):
+    """Counter of the S3 operations sent from now on"""
+    engine, _ = s3_bucket
+    counter = Counter()
+    engine.s3.meta.events.register("before-call.s3", lambda model, **kwargs: counter.update([model.name]))
+    return counter
+
+
+class TestPublish:
+    """
+    Content-hashed files live once at their plain key, unhashed files under
+    the release prefix that first published them; nothing is copied.
+    """
+
+    def test_hashed_files_use_shared_keys(self, releases, s3_bucket, tmp_path):
+        """The first release puts chunks at the root and root files under its prefix"""
+        engine, bucket_name = s3_bucket
+        write_build(tmp_path, 1)
+        releases.publish("r1", tmp_path)
+
+        keys = bucket_keys(engine, bucket_name)
+        assert "static/js/0.000003e8.chunk.js" in keys
+        assert not any(key.startswith(release_prefix("r1") + "static/") for key in keys)
+        assert release_prefix("r1") + "index.html" in keys
+
+    def test_delta_uploads_only_changed_files(self, releases, operations, tmp_path):
+        """A one-chunk change uploads that chunk and index.html and copies nothing"""
+        write_build(tmp_path, 1)
+        releases.publish("r1", tmp_path)
+        releases.activate("r1")
+        operations.clear()
+
+        write_build(tmp_path, 2)
+        result = releases.publish("r2", tmp_path)
+        releases.activate("r2")
+
+        assert result.uploaded == 2
+        # Only this publish's transfers, not r1's on the same engine
+        assert sorted(transfer.key for transfer in result.transfers) == [
+            release_prefix("r2") + "index.html", "static/js/0.000007d0.chunk.js"]
+        assert operations["CopyObject"] == 1  # index.html to the root
+        assert operations["PutObject"] == 4  # two files, the release manifest and the pointer
+
+    def test_unchanged_files_stay_in_their_release(self, releases, tmp_path):
+        """The manifest records which release prefix holds each unhashed file"""
+        write_build(tmp_path, 1)
+        releases.publish("r1", tmp_path)
+        releases.activate("r1")
+        write_build(tmp_path, 2)
+        releases.publish("r2", tmp_path)
+
+        files = releases.load_release_manifest("r2")["files"]
+        assert files["robots.txt"]["release"] == "r1"
+        assert files["index.html"]["release"] == "r2"
+        assert files["static/js/1.000003e9.chunk.js"]["release"] is None
+
+    def test_first_release_skips_assets_already_in_the_bucket(self, releases, s3_bucket, tmp_path):
+        """Shared keys whose ETag matches the local file (left by a sync deploy) are not uploaded again"""
+        engine, bucket_name = s3_bucket
+        write_build(tmp_path, 1)
+        for path in (tmp_path / "static" / "js").iterdir():
+            engine.s3.put_object(Bucket=bucket_name, Key=f"static/js/{path.name}", Body=path.read_bytes())
+        engine.s3.put_object(Bucket=bucket_name, Key="static/js/1.000003e9.chunk.js", Body=b"other content")
+
+        result = releases.publish("r1", tmp_path)
+
+        # The mismatching chunk, index.html and robots.txt
+        assert result.uploaded == 3
+        body = engine.s3.get_object(Bucket=bucket_name, Key="static/js/1.000003e9.chunk.js")["Body"].read()
+        assert body == b"chunk 1 000003e9"
+
+    @pytest.mark.parametrize("build_id", ["r1", "r2"])
+    def test_published_release_is_never_overwritten(self, releases, s3_bucket, tmp_path, build_id):
+        """Publishing a different build under an existing id fails, whether that release is live or older"""
+        engine, bucket_name = s3_bucket
+        for version in (1, 2):
+            write_build(tmp_path, version)
+            releases.publish(f"r{version}", tmp_path)
+            releases.activate(f"r{version}")
+
+        write_build(tmp_path, 3)
+        with pytest.raises(DeploymentError, match=f"Release {build_id} already exists"):
+            releases.publish(build_id, tmp_path)
+
+        body = engine.s3.get_object(Bucket=bucket_name, Key=release_prefix(build_id) + "index.html")["Body"].read()
+        assert body == f"<html>{build_id[1]}</html>".encode()
+        assert releases.verify("r2") == []
+
+
+class TestActivate:
+    """Activation copies only the root files that differ from the live release"""
+
+    def test_rollback_restores_root_files(self, releases, s3_bucket, tmp_path):
+        engine, bucket_name = s3_bucket
+        for version in (1, 2):
+            write_build(tmp_path, version)
+            releases.publish(f"r{version}", tmp_path)
+            releases.activate(f"r{version}")
+
+        diff = releases.activate("r1")
+
+        assert diff.changed == ["index.html"]
+        assert engine.s3.get_object(Bucket=bucket_name, Key="index.html")["Body"].read() == b"<html>1</html>"
+        assert releases.verify("r1") == []
+
+
+class TestPrune:
+    """Pruning keeps the releases kept ones reuse files from, and their shared assets"""
+
+    def test_prune_removes_unreferenced_releases_and_assets(self, releases, s3_bucket, tmp_path):
+        engine, bucket_name = s3_bucket
+        for version in (1, 2, 3):
+            write_build(tmp_path, version)
+            releases.publish(f"r{version}", tmp_path)
+            releases.activate(f"r{version}")
+
+        pruned = releases.prune(1)
+
+        keys = bucket_keys(engine, bucket_name)
+        # r3 still serves robots.txt from r1, so r1 stays complete, chunks included
+        assert pruned == ["r2"]
+        assert "static/js/0.000003e8.chunk.js" in keys
+        assert "static/js/0.000007d0.chunk.js" not in keys
+        assert "static/js/0.00000bb8.chunk.js" in keys
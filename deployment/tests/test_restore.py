@@ -0,0 +1,141 @@
+# Unit Tests for Version-Based Restore
+# Version selection at a point in time and restores, against moto's versioned S3
+
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from manifest import MANIFEST_KEY
+from releases import ReleaseManager, release_prefix
+from restore import VersionRestorer
+
+BUCKET = "kb-engine-frontend-history"
+
+
+def next_second() -> datetime:
+    """Wait until a new second has started; moto keeps LastModified to the second"""
+    time.sleep(1.05 - datetime.now().microsecond / 1e6)
+    return datetime.now(timezone.utc)
+
+
+def put(s3, key: str, body: str) -> str:
+    return s3.put_object(Bucket=BUCKET, Key=key, Body=body.encode("utf-8"))["VersionId"]
+
+
+@pytest.fixture(scope="class")
+def history():
+    """
+    A versioned bucket with writes before, at and after a restore point:
+    returns (restorer, point in time, {key: version id current at that point}).
+    """
+    moto = pytest.importorskip("moto")
+    from transfer import TransferEngine
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+        with moto.mock_aws():
+            engine = TransferEngine(region_name="us-east-1")
+            s3 = engine.s3
+            s3.create_bucket(Bucket=BUCKET)
+            s3.put_bucket_versioning(Bucket=BUCKET, VersioningConfiguration={"Status": "Enabled"})
+
+            current = {key: put(s3, key, f"{key} v1")
+                       for key in ("index.html", "robots.txt", "old.txt", "gone.txt", "back.txt",
+                                   "static/js/main.1a2b3c4d.js")}
+            next_second()
+            s3.delete_object(Bucket=BUCKET, Key="gone.txt")
+            s3.delete_object(Bucket=BUCKET, Key="back.txt")
+            point = next_second()
+            next_second()
+
+            put(s3, "index.html", "index.html v2")
+            s3.delete_object(Bucket=BUCKET, Key="old.txt")
+            put(s3, "back.txt", "back.txt v2")
+            put(s3, "new.txt", "new.txt v1")
+            put(s3, "static/js/main.1a2b3c4d.js", "main v2")
+
+            yield VersionRestorer(engine, BUCKET), point, current
+
+
+class TestRestorePlan:
+    """VersionRestorer.plan picks, per key, the version that was current at the restore point"""
+
+    @pytest.mark.parametrize("key, outcome", [
+        # Overwritten after the point: the earlier version is copied back
+        ("index.html", "copy"),
+        # Not written since: nothing to do
+        ("robots.txt", "unchanged"),
+        # Deleted after the point (latest is a delete marker): restored
+        ("old.txt", "copy"),
+        # Created after the point: absent at the restore point
+        ("new.txt", "delete"),
+        # Deleted before the point and recreated after: a delete marker was current
+        ("back.txt", "delete"),
+        # Deleted before the point and still deleted: nothing to do
+        ("gone.txt", None),
+    ])
+    def test_version_selection(self, history, key, outcome):
+        restorer, point, current = history
+        plan = restorer.plan(point)
+
+        copies = dict(plan.copies)
+        actual = ("copy" if key in copies else "delete" if key in plan.deletes
+                  else "unchanged" if key in plan.unchanged else None)
+        assert actual == outcome
+        if outcome == "copy":
+            assert copies[key] == current[key]
+
+    def test_prefix_and_keys_limit_the_plan(self, history):
+        restorer, point, _ = history
+
+        assert [key for key, _ in restorer.plan(point, "static/").copies] == ["static/js/main.1a2b3c4d.js"]
+        plan = restorer.plan(point, keys={"robots.txt", "new.txt"})
+        assert (plan.copies, plan.deletes, plan.unchanged) == ([], ["new.txt"], ["robots.txt"])
+
+    def test_nothing_before_the_first_write(self, history):
+        """Every live key is newer than a point before the bucket was written"""
+        restorer, _, _ = history
+        plan = restorer.plan(datetime(2000, 1, 1, tzinfo=timezone.utc))
+
+        assert plan.copies == [] and plan.unchanged == []
+        assert sorted(plan.deletes) == ["back.txt", "index.html", "new.txt", "robots.txt",
+                                        "static/js/main.1a2b3c4d.js"]
+
+
+class TestRestore:
+    """Restoring copies the selected versions back in place and can delete newer keys"""
+
+    def test_restore_round_trip(self, s3_bucket):
+        engine, bucket_name = s3_bucket
+        s3 = engine.s3
+        s3.put_object(Bucket=bucket_name, Key="index.html", Body=b"v1")
+        s3.put_object(Bucket=bucket_name, Key="sw.js", Body=b"v1")
+        point = next_second()
+        next_second()
+        s3.put_object(Bucket=bucket_name, Key="index.html", Body=b"v2")
+        s3.delete_object(Bucket=bucket_name, Key="sw.js")
+        s3.put_object(Bucket=bucket_name, Key="new.txt", Body=b"v1")
+
+        restorer = VersionRestorer(engine, bucket_name)
+        restorer.restore(restorer.plan(point), delete_newer=True)
+
+        assert s3.get_object(Bucket=bucket_name, Key="index.html")["Body"].read() == b"v1"
+        assert s3.get_object(Bucket=bucket_name, Key="sw.js")["Body"].read() == b"v1"
+        live = [obj["Key"] for obj in s3.list_objects_v2(Bucket=bucket_name)["Contents"]]
+        assert sorted(live) == ["index.html", "sw.js"]
+
+    def test_pruned_release_manifest(self, s3_bucket, tmp_path):
+        """A pruned release is found through the last stored version of its manifest"""
+        engine, bucket_name = s3_bucket
+        (tmp_path / "index.html").write_text("<html></html>")
+        releases = ReleaseManager(engine, bucket_name)
+        releases.publish("r1", tmp_path)
+        written = engine.s3.head_object(Bucket=bucket_name, Key=release_prefix("r1") + MANIFEST_KEY)["LastModified"]
+        releases.prune(0)
+
+        restorer = VersionRestorer(engine, bucket_name)
+        assert releases.load_release_manifest("r1") is None
+        assert restorer.release_point_in_time("r1") == written
+        assert restorer.release_manifest("r1")["files"]["index.html"]["release"] == "r1"
@@ -0,0 +1,69 @@
+# Unit Tests for Deploy Targets
+# Parsing --targets lists and files, target environments and the per-target summary
+
+import json
+
+import pytest
+
+from errors import DeploymentError
+from targets import DeployTarget, TargetResult, format_summary, mismatched_targets, parse_targets
+
+
+class TestParseTargets:
+    """--targets takes environment names or a JSON file of target specs"""
+
+    def test_environment_names(self):
+        """Each name is an environment resolved from its own Terraform state"""
+        targets = parse_targets("dev, prod")
+
+        assert [(target.name, target.workspace, target.bucket_name) for target in targets] == [
+            ("dev", "dev", None), ("prod", "prod", None)]
+
+    def test_targets_file(self, tmp_path):
+        """Targets outside the Terraform configuration name their bucket and distribution"""
+        path = tmp_path / "targets.json"
+        path.write_text(json.dumps([
+            {"name": "prod-eu", "workspace": "prod", "region": "eu-west-1"},
+            {"name": "preview", "bucket_name": "kb-engine-fe-preview", "distribution_id": "E123"},
+        ]))
+
+        assert parse_targets(str(path)) == [
+            DeployTarget("prod-eu", workspace="prod", region="eu-west-1"),
+            DeployTarget("preview", workspace="preview", bucket_name="kb-engine-fe-preview", distribution_id="E123"),
+        ]
+
+    @pytest.mark.parametrize("content", [
+        '[{"name": "dev"}, {"name": "dev"}]',
+        '[{"name": "dev", "bucket": "typo"}]',
+        '[]',
+        'not json',
+    ])
+    def test_invalid_targets_file(self, tmp_path, content):
+        path = tmp_path / "targets.json"
+        path.write_text(content)
+
+        with pytest.raises(DeploymentError):
+            parse_targets(str(path))
+
+
+class TestTargetEnvironments:
+    """A bundle is built for one environment; targets of other environments are reported"""
+
+    def test_environment_defaults_to_the_workspace(self):
+        targets = [DeployTarget("prod"), DeployTarget("prod-eu", workspace="prod"),
+                   DeployTarget("preview", bucket_name="kb-engine-fe-preview", environment="prod")]
+
+        assert [target.environment for target in targets] == ["prod", "prod", "prod"]
+        assert mismatched_targets(targets, "prod") == []
+        assert [target.name for target in mismatched_targets(targets, "dev")] == ["prod", "prod-eu", "preview"]
+
+    def test_summary_names_the_build_of_each_target(self):
+        results = [
+            TargetResult(DeployTarget("staging"), build_id="1a2b3c4d5e6f", build_environment="prod"),
+            TargetResult(DeployTarget("prod"), build_id="1a2b3c4d5e6f", build_environment="prod", verified=True),
+        ]
+
+        header, staging, mismatch, prod = format_summary(results)
+        assert "BUILD" in header
+        assert "1a2b3c4d5e6f (prod)" in staging and "1a2b3c4d5e6f (prod)" in prod
+        assert mismatch.strip() == "built for prod, deployed to staging"
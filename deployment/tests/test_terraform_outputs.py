@@ -0,0 +1,114 @@
+# Unit Tests for Terraform Output Resolution
+# Which local state an environment's outputs are read from, in both state layouts
+
+import json
+
+import pytest
+
+from errors import DeploymentError
+from terraform_outputs import TerraformOutputs, environment_workspace
+
+
+def write_state(path, environment: str, bucket: str, serial: int = 1) -> None:
+    """A minimal local state: one tagged resource and the bucket output"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        "version": 4,
+        "lineage": f"lineage-{environment}",
+        "serial": serial,
+        "outputs": {"s3_bucket_name": {"value": bucket, "type": "string"}},
+        "resources": [{
+            "type": "aws_s3_bucket",
+            "name": "frontend",
+            "instances": [{"attributes": {"id": bucket, "tags_all": {"Environment": environment}}}],
+        }],
+    }))
+
+
+class FakeTerraform:
+    """Runner that answers `terraform output -json -state=...` from the state file"""
+
+    def __init__(self):
+        self.commands = []
+
+    def __call__(self, command, cwd):
+        self.commands.append(command)
+        state_file = next(arg.split("=", 1)[1] for arg in command if arg.startswith("-state="))
+        with open(state_file, encoding="utf-8") as f:
+            return json.dumps(json.load(f)["outputs"])
+
+
+@pytest.fixture
+def terraform():
+    return FakeTerraform()
+
+
+class TestEnvironmentWorkspace:
+    """Environments resolve to their own workspace, or the default one they were applied to"""
+
+    @pytest.mark.parametrize("states, environment, expected", [
+        # Nothing applied yet: the environment gets its own workspace
+        ({}, "dev", "dev"),
+        # Single stack applied to the default workspace
+        ({"terraform.tfstate": "dev"}, "dev", "default"),
+        # The default workspace holds another environment
+        ({"terraform.tfstate": "dev"}, "prod", "prod"),
+        # Workspace per environment
+        ({"terraform.tfstate.d/prod/terraform.tfstate": "prod"}, "prod", "prod"),
+        # Its own workspace wins over a default state of the same environment
+        ({"terraform.tfstate": "prod", "terraform.tfstate.d/prod/terraform.tfstate": "prod"}, "prod", "prod"),
+    ])
+    def test_environment_workspace(self, tmp_path, states, environment, expected):
+        for path, state_environment in states.items():
+            write_state(tmp_path / path, state_environment, f"bucket-{state_environment}")
+        assert environment_workspace(tmp_path, environment) == expected
+
+
+class TestTerraformOutputs:
+    """Outputs are read from the resolved state file and cached by its serial"""
+
+    def test_default_workspace_layout(self, tmp_path, terraform):
+        """A stack applied without workspaces is read from terraform.tfstate"""
+        write_state(tmp_path / "terraform.tfstate", "dev", "bucket-dev")
+        outputs = TerraformOutputs(tmp_path, tmp_path / "cache", environment="dev", runner=terraform)
+
+        assert outputs.state_path == tmp_path / "terraform.tfstate"
+        assert outputs.value("s3_bucket_name") == "bucket-dev"
+
+    def test_workspace_per_environment_layout(self, tmp_path, terraform, monkeypatch):
+        """Each environment is read from terraform.tfstate.d/<env>/ without selecting it"""
+        monkeypatch.delenv("TF_WORKSPACE", raising=False)
+        write_state(tmp_path / "terraform.tfstate", "dev", "bucket-dev")
+        write_state(tmp_path / "terraform.tfstate.d" / "prod" / "terraform.tfstate", "prod", "bucket-prod")
+        (tmp_path / ".terraform").mkdir()
+        (tmp_path / ".terraform" / "environment").write_text("dev")
+
+        prod = TerraformOutputs(tmp_path, tmp_path / "cache", environment="prod", runner=terraform)
+        selected = TerraformOutputs(tmp_path, tmp_path / "cache")
+
+        assert prod.value("s3_bucket_name") == "bucket-prod"
+        assert terraform.commands == [["terraform", "output", "-json",
+                                       f"-state={tmp_path / 'terraform.tfstate.d' / 'prod' / 'terraform.tfstate'}"]]
+        assert selected.workspace == "dev"
+        assert selected.state_path == tmp_path / "terraform.tfstate.d" / "dev" / "terraform.tfstate"
+
+    def test_missing_environment_raises(self, tmp_path, terraform):
+        """An environment that was never applied has no state to read"""
+        write_state(tmp_path / "terraform.tfstate", "dev", "bucket-dev")
+        outputs = TerraformOutputs(tmp_path, tmp_path / "cache", environment="staging", runner=terraform)
+
+        with pytest.raises(DeploymentError, match="staging"):
+            outputs.get()
+        assert terraform.commands == []
+
+    def test_outputs_cached_until_the_serial_changes(self, tmp_path, terraform):
+        state_path = tmp_path / "terraform.tfstate.d" / "prod" / "terraform.tfstate"
+        write_state(state_path, "prod", "bucket-prod")
+        TerraformOutputs(tmp_path, tmp_path / "cache", environment="prod", runner=terraform).get()
+        TerraformOutputs(tmp_path, tmp_path / "cache", environment="prod", runner=terraform).get()
+        assert len(terraform.commands) == 1
+
+        write_state(state_path, "prod", "bucket-prod-2", serial=2)
+        outputs = TerraformOutputs(tmp_path, tmp_path / "cache", environment="prod", runner=terraform)
+        assert outputs.value("s3_bucket_name") == "bucket-prod-2"
+        assert len(terraform.commands) == 2
@@ -1,12 +1,29 @@
 # Property-Based Tests for Terraform Configuration
 # Tests universal properties that should hold across all valid configurations
 
+import os
+import re
+import string
 import pytest
-import json
-import tempfile
 from hypothesis import given, strategies as st, settings
-from pathlib import Path
-from python_terraform import Terraform
+
+from hcl_evaluator import render_tfvars
+from plan_cache import PLAN_OK
+from terraform_console import console_string
+
+
+# Allowed values from terraform/variables.tf
+PRICE_CLASSES = ['PriceClass_All', 'PriceClass_200', 'PriceClass_100']
+LOG_RETENTION_DAYS = [1, 3, 5, 7, 14, 30, 60, 90, 120, 150, 180, 365, 400, 545, 731, 1827, 3653]
+
+# Validation conditions from terraform/variables.tf, with VALUE in place of the variable
+VALIDATION_CONDITIONS = [
+    'can(regex("^[a-z0-9-]+$", VALUE))',
+    'length(VALUE)',
+    'can(regex("^[a-zA-Z0-9][a-zA-Z0-9-]{1,61}[a-zA-Z0-9]\\\\.[a-zA-Z]{2,}$", VALUE))',
+    'can(regex("^[a-zA-Z0-9_-]+$", VALUE))',
+    'can(regex("^[a-zA-Z0-9+\\\\-=._:/@\\\\s]+$", VALUE))',
+]
 
 
 # Test data generators for property-based testing
@@ -16,7 +33,7 @@ def valid_project_names(draw):
     # Must be 3-20 characters, lowercase letters, numbers, and hyphens only
     length = draw(st.integers(min_value=3, max_value=20))
     chars = st.text(
-        alphabet=st.characters(whitelist_categories=('Ll', 'Nd'), whitelist_chars='-'),
+        alphabet=string.ascii_lowercase + string.digits + '-',
         min_size=length,
         max_size=length
     ).filter(lambda x: x and not x.startswith('-') and not x.endswith('-'))
@@ -43,15 +60,52 @@ def valid_regions(draw):
 @st.composite
 def valid_api_domains(draw):
     """Generate valid API Gateway domain names."""
-    # Simple domain pattern for testing
+    # The validation rule accepts a single label followed by a TLD
     subdomain = draw(st.text(
-        alphabet=st.characters(whitelist_categories=('Ll', 'Nd'), whitelist_chars='-'),
+        alphabet=string.ascii_lowercase + string.digits + '-',
         min_size=3,
         max_size=10
     ).filter(lambda x: x and not x.startswith('-') and not x.endswith('-')))
     
-    domain = draw(st.sampled_from(['example.com', 'test.org', 'api.local']))
-    return f"{subdomain}.{domain}"
+    tld = draw(st.sampled_from(['com', 'org', 'local']))
+    return f"{subdomain}.{tld}"
+
+
+@st.composite
+def valid_variable_sets(draw):
+    """Generate complete variable sets that pass every validation rule."""
+    tag_keys = st.text(alphabet=string.ascii_letters + string.digits + '-_.', min_size=1, max_size=20)
+    tag_values = st.text(alphabet=string.ascii_letters + string.digits + '+-=._:/@ ', min_size=1, max_size=30)
+    return {
+        'project_name': draw(valid_project_names()),
+        'environment': draw(valid_environments()),
+        'aws_region': draw(valid_regions()),
+        'api_gateway_domain': draw(st.one_of(st.just(''), valid_api_domains())),
+        'api_gateway_stage': draw(st.sampled_from(['prod', 'v1', 'dev_2'])),
+        'cloudfront_price_class': draw(st.sampled_from(PRICE_CLASSES)),
+        'log_retention_days': draw(st.sampled_from(LOG_RETENTION_DAYS)),
+        'tags': draw(st.dictionaries(tag_keys, tag_values, max_size=3)),
+    }
+
+
+@st.composite
+def invalid_variable_sets(draw):
+    """Generate variable sets where exactly one variable breaks its validation rule."""
+    variables = draw(valid_variable_sets())
+    name, value = draw(st.one_of(
+        st.tuples(st.just('project_name'), st.one_of(
+            st.text(max_size=2),
+            st.text(min_size=21, max_size=30),
+            st.text(alphabet=string.ascii_uppercase, min_size=3, max_size=20),
+        )),
+        st.tuples(st.just('environment'), st.text(max_size=10).filter(lambda x: x not in ['dev', 'staging', 'prod'])),
+        st.tuples(st.just('api_gateway_domain'), st.sampled_from(['not-a-domain', 'invalid..domain.com', '-bad.com'])),
+        st.tuples(st.just('api_gateway_stage'), st.sampled_from(['', 'prod/v1', 'v 1'])),
+        st.tuples(st.just('log_retention_days'), st.integers(0, 4000).filter(lambda x: x not in LOG_RETENTION_DAYS)),
+        st.tuples(st.just('tags'), st.just({'Owner': 'frontend-team!'})),
+    ))
+    variables[name] = value
+    return variables
 
 
 class TestTerraformVariableSubstitution:
@@ -70,7 +124,7 @@ class TestTerraformVariableSubstitution:
     @settings(max_examples=100, deadline=30000)  # 30 second timeout per example
     def test_terraform_variable_substitution(
         self, 
-        terraform_workspace, 
+        terraform_plan, 
         project_name, 
         environment, 
         region, 
@@ -83,8 +137,6 @@ class TestTerraformVariableSubstitution:
         For any valid variable values, all resources created should reflect 
         those variable values in their configuration (e.g., environment tag, naming).
         """
-        temp_dir, tf = terraform_workspace
-        
         # Create terraform.tfvars with test values
         tfvars_content = f'''
 project_name = "{project_name}"
@@ -98,32 +150,12 @@ tags = {{
 }}
 '''
         
-        tfvars_path = temp_dir / "terraform.tfvars"
-        tfvars_path.write_text(tfvars_content)
-        
-        # Run terraform plan to get the planned configuration
-        return_code, stdout, stderr = tf.plan(
-            capture_output=True,
-            var_file="terraform.tfvars",
-            out="tfplan"
-        )
-        
-        # Terraform plan should succeed
-        assert return_code == 0, f"Terraform plan failed: {stderr}"
-        
-        # Get the plan output in JSON format for analysis
-        return_code, plan_json, stderr = tf.show(
-            "tfplan",
-            json=True,
-            capture_output=True
-        )
-        
-        assert return_code == 0, f"Terraform show failed: {stderr}"
-        
-        plan_data = json.loads(plan_json)
+        # Plan the configuration (served from the plan cache when already planned);
+        # raises TerraformPlanError if terraform plan or show fails
+        planned_values = terraform_plan(tfvars_content)
         
         # Verify variable substitution in planned resources
-        planned_changes = plan_data.get('planned_values', {}).get('root_module', {}).get('resources', [])
+        planned_changes = planned_values.get('root_module', {}).get('resources', [])
         
         # Check that resources use the provided variables
         for resource in planned_changes:
@@ -151,7 +183,7 @@ class TestTerraformDefaultValueHandling:
     """
 
     @pytest.mark.property
-    def test_terraform_default_value_handling(self, terraform_workspace, test_api_domain):
+    def test_terraform_default_value_handling(self, terraform_plan, test_api_domain):
         """
         **Feature: aws-infrastructure, Property 12: Terraform default value handling**
         **Validates: Requirements 6.3**
@@ -159,36 +191,14 @@ class TestTerraformDefaultValueHandling:
         For any variable with a defined default value, running terraform without 
         providing that variable should use the default value in resource creation.
         """
-        temp_dir, tf = terraform_workspace
-        
         # Create minimal terraform.tfvars with only required variables
         tfvars_content = f'''
 api_gateway_domain = "{test_api_domain}"
 '''
         
-        tfvars_path = temp_dir / "terraform.tfvars"
-        tfvars_path.write_text(tfvars_content)
-        
-        # Run terraform plan
-        return_code, stdout, stderr = tf.plan(
-            capture_output=True,
-            var_file="terraform.tfvars",
-            out="tfplan"
-        )
-        
-        assert return_code == 0, f"Terraform plan failed: {stderr}"
-        
-        # Get the plan output in JSON format
-        return_code, plan_json, stderr = tf.show(
-            "tfplan",
-            json=True,
-            capture_output=True
-        )
-        
-        assert return_code == 0, f"Terraform show failed: {stderr}"
-        
-        plan_data = json.loads(plan_json)
-        planned_changes = plan_data.get('planned_values', {}).get('root_module', {}).get('resources', [])
+        # Plan the configuration (served from the plan cache when already planned)
+        planned_values = terraform_plan(tfvars_content)
+        planned_changes = planned_values.get('root_module', {}).get('resources', [])
         
         # Verify default values are used
         for resource in planned_changes:
@@ -223,10 +233,10 @@ class TestTerraformInputValidation:
             st.just('invalid..domain.com'),  # Double dots
         )
     )
-    @settings(max_examples=50)
+    @settings(max_examples=1000)
     def test_terraform_input_validation(
         self, 
-        terraform_workspace, 
+        terraform_config, 
         invalid_project_name, 
         invalid_environment, 
         invalid_domain
@@ -237,60 +247,137 @@ class TestTerraformInputValidation:
         
         For any variable with validation rules, providing an invalid value should 
         cause terraform to reject the configuration before making any AWS API calls.
-        """
-        temp_dir, tf = terraform_workspace
         
+        The validation blocks are evaluated in-process; TestHCLEvaluatorFidelity
+        checks a sample of the verdicts against terraform plan.
+        """
         # Test invalid project_name
         if invalid_project_name is not None:
-            tfvars_content = f'''
-project_name = "{invalid_project_name}"
-api_gateway_domain = "api.example.com"
-'''
-            tfvars_path = temp_dir / "terraform.tfvars"
-            tfvars_path.write_text(tfvars_content)
-            
-            return_code, stdout, stderr = tf.plan(
-                capture_output=True,
-                var_file="terraform.tfvars"
-            )
-            
-            # Should fail validation
-            assert return_code != 0, f"Should reject invalid project_name: {invalid_project_name}"
-            assert "validation failed" in stderr.lower() or "invalid value" in stderr.lower()
+            evaluation = terraform_config.evaluate({'project_name': invalid_project_name})
+            assert 'project_name' in evaluation.failed_variables(), \
+                f"Should reject invalid project_name: {invalid_project_name!r}"
         
         # Test invalid environment
         if invalid_environment:
-            tfvars_content = f'''
-environment = "{invalid_environment}"
-api_gateway_domain = "api.example.com"
-'''
-            tfvars_path = temp_dir / "terraform.tfvars"
-            tfvars_path.write_text(tfvars_content)
-            
-            return_code, stdout, stderr = tf.plan(
-                capture_output=True,
-                var_file="terraform.tfvars"
-            )
-            
-            # Should fail validation
-            assert return_code != 0, f"Should reject invalid environment: {invalid_environment}"
+            evaluation = terraform_config.evaluate({'environment': invalid_environment})
+            assert 'environment' in evaluation.failed_variables(), \
+                f"Should reject invalid environment: {invalid_environment!r}"
         
         # Test invalid domain
         if invalid_domain:
-            tfvars_content = f'''
-api_gateway_domain = "{invalid_domain}"
-'''
-            tfvars_path = temp_dir / "terraform.tfvars"
-            tfvars_path.write_text(tfvars_content)
-            
-            return_code, stdout, stderr = tf.plan(
-                capture_output=True,
-                var_file="terraform.tfvars"
-            )
-            
-            # Should fail validation
-            assert return_code != 0, f"Should reject invalid domain: {invalid_domain}"
+            evaluation = terraform_config.evaluate({'api_gateway_domain': invalid_domain})
+            assert 'api_gateway_domain' in evaluation.failed_variables(), \
+                f"Should reject invalid domain: {invalid_domain!r}"
+
+
+class TestTerraformNamingProperties:
+    """
+    Feature: aws-infrastructure, Property 11: Terraform variable substitution
+    Tests resource names and tags for many variable sets, evaluated in-process.
+    """
 
+    @pytest.mark.property
+    @given(
+        variables=valid_variable_sets(),
+        bucket_suffix=st.binary(min_size=4, max_size=4).map(bytes.hex)
+    )
+    @settings(max_examples=1000)
+    def test_resource_naming_and_tagging(self, terraform_config, variables, bucket_suffix):
+        """
+        **Feature: aws-infrastructure, Property 11: Terraform variable substitution**
+        **Validates: Requirements 6.1, 6.5**
+        
+        For any valid variable values, the bucket name is a valid S3 bucket name built 
+        from project_name and environment, and every tagged resource carries the 
+        Project, Environment and ManagedBy tags plus the custom tags.
+        """
+        evaluation = terraform_config.evaluate(
+            variables,
+            resources={'random_id.bucket_suffix': {'hex': bucket_suffix}}
+        )
+        assert evaluation.valid, f"Generated variables should pass validation: {evaluation.errors}"
+        
+        name_prefix = f"{variables['project_name']}-{variables['environment']}"
+        bucket_name = evaluation.local('bucket_name')
+        assert bucket_name == f"{name_prefix}-frontend-{bucket_suffix}"
+        assert re.fullmatch(r'[a-z0-9][a-z0-9-]{1,61}[a-z0-9]', bucket_name), f"Invalid S3 bucket name: {bucket_name}"
+        
+        for address, name in evaluation.resource_attributes('name').items():
+            assert isinstance(name, str), f"{address} name should be known at plan time: {name}"
+        
+        reserved = {'Project', 'Environment', 'ManagedBy', 'Name', 'Purpose', 'ContentType'}
+        for address, tags in evaluation.resource_attributes('tags').items():
+            assert tags['Project'] == variables['project_name'], f"{address} Project tag: {tags}"
+            assert tags['Environment'] == variables['environment'], f"{address} Environment tag: {tags}"
+            assert tags['ManagedBy'] == 'Terraform', f"{address} ManagedBy tag: {tags}"
+            for key, value in variables['tags'].items():
+                if key not in reserved:
+                    assert tags.get(key) == value, f"{address} should keep custom tag {key}: {tags}"
+
+
+class TestHCLEvaluatorFidelity:
+    """
+    Cross-checks the in-process HCL evaluator against terraform plan on a small 
+    sample of variable sets, so the fast properties stay faithful to Terraform.
+    """
+
+    @pytest.mark.property
+    @pytest.mark.slow
+    @given(variables=st.one_of(valid_variable_sets(), invalid_variable_sets()))
+    @settings(max_examples=10, deadline=None)
+    def test_evaluator_matches_terraform_plan(self, terraform_config, terraform_pool, terraform_plan, 
+                                              terraform_console, variables):
+        """
+        For any variable set, terraform plan rejects it exactly when the evaluator 
+        does, with the same validation messages, and plans the same tags and locals.
+        """
+        evaluation = terraform_config.evaluate(variables)
+        tfvars_content = render_tfvars(variables)
+        
+        if not evaluation.valid:
+            with terraform_pool.acquire(tfvars_content) as (temp_dir, tf):
+                return_code, stdout, stderr = tf.plan(capture_output=True, var_file="terraform.tfvars")
+            
+            assert return_code not in PLAN_OK, f"Terraform accepted variables the evaluator rejects: {evaluation.errors}"
+            # Diagnostics are wrapped and framed with box-drawing characters
+            diagnostics = " ".join(stderr.replace("\u2502", " ").split())
+            for error in evaluation.errors:
+                assert f"var.{error.variable}" in diagnostics, f"Terraform should reject {error.variable}: {stderr}"
+                assert " ".join(error.message.split()) in diagnostics, f"Missing message {error.message!r}: {stderr}"
+            return
+        
+        local_names = ['name_prefix', 'common_tags']
+        console_locals = terraform_console.evaluate(variables, [f"local.{name}" for name in local_names])
+        for name, value in zip(local_names, console_locals):
+            assert evaluation.local(name) == value, f"local.{name} differs from terraform console"
+        
+        # Raises TerraformPlanError if terraform rejects what the evaluator accepts
+        planned_values = terraform_plan(tfvars_content)
+        expected_tags = evaluation.resource_attributes('tags')
+        for resource in planned_values.get('root_module', {}).get('resources', []):
+            expected = expected_tags.get(f"{resource['type']}.{resource['name']}")
+            if expected is not None:
+                assert resource.get('values', {}).get('tags') == expected, \
+                    f"Tags of {resource['address']} differ from the evaluator"
+    
+    @pytest.mark.property
+    @pytest.mark.slow
+    @given(values=st.lists(st.text(max_size=30), min_size=20, max_size=100))
+    @settings(max_examples=5, deadline=None)
+    def test_validation_functions_match_console(self, terraform_config, terraform_console, values):
+        """
+        For any strings, regex() and length() in the validation conditions give 
+        the same results in the evaluator as in terraform console. Each example 
+        is one console batch of several hundred expressions.
+        """
+        evaluation = terraform_config.evaluate({})
+        expressions = [condition.replace('VALUE', console_string(value)) 
+                       for value in values for condition in VALIDATION_CONDITIONS]
+        
+        results = terraform_console.evaluate({}, expressions)
+        
+        for expression, result in zip(expressions, results):
+            assert evaluation.evaluate(expression) == result, f"Evaluator differs from terraform on {expression}"
 
 
 class TestS3PublicAccessBlocking:
@@ -0,0 +1,130 @@
+# Terraform Workspace Pool
+# Pre-initialized copies of the Terraform configuration, handed out per test example
+
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from python_terraform import Terraform
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Files a test run leaves behind in a workspace; removed before it is handed out again
+RUN_FILES = ("terraform.tfvars", "*.auto.tfvars", "tfplan", "terraform.tfstate", "terraform.tfstate.backup",
+             ".terraform.tfstate.lock.info")
+RUN_DIRS = ("terraform.tfstate.d",)
+
+# Not copied from the source tree into the template
+SOURCE_IGNORE = shutil.ignore_patterns(".terraform", "*.tfstate*", "*.tfvars", "tfplan")
+
+Workspace = Tuple[Path, Terraform]
+
+
+class WorkspaceError(Exception):
+    """Raised when a workspace cannot be initialized"""
+
+
+@contextmanager
+def exclusive(lock_path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on lock_path across processes"""
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def reset_workspace(workspace_dir: Path, tfvars: Optional[str] = None) -> None:
+    """Remove the state, plan and tfvars of the previous run and write the new tfvars"""
+    for pattern in RUN_FILES:
+        for path in workspace_dir.glob(pattern):
+            path.unlink()
+    for name in RUN_DIRS:
+        shutil.rmtree(workspace_dir / name, ignore_errors=True)
+    if tfvars is not None:
+        (workspace_dir / "terraform.tfvars").write_text(tfvars)
+
+
+class WorkspacePool:
+    """
+    Session-level pool of initialized Terraform workspaces.
+
+    `terraform init` runs once per process, in a template copy of the
+    configuration, with TF_PLUGIN_CACHE_DIR pointing at a plugin cache shared
+    by all workers and runs. Providers are unpacked into the cache once and
+    linked from there, so further workspaces are cheap copies of the template
+    (symlinks included). Workspaces are handed out per example and reset by
+    swapping the tfvars and wiping the state instead of copying and
+    initializing again.
+
+    Terraform does not support concurrent writes to the plugin cache, so
+    initialization is serialized across workers with a lock file.
+    """
+
+    def __init__(self, terraform_dir: Path, root_dir: Path, plan_cache, plugin_cache_dir: Path):
+        self.terraform_dir = terraform_dir
+        self.root_dir = root_dir
+        self.plan_cache = plan_cache
+        self.plugin_cache_dir = plugin_cache_dir
+        self._template: Optional[Path] = None
+        self._idle: List[Workspace] = []
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def prepare(self) -> Path:
+        """Initialize the template workspace (once)"""
+        with self._lock:
+            if self._template is None:
+                template = self.root_dir / "template"
+                shutil.copytree(self.terraform_dir, template, ignore=SOURCE_IGNORE, dirs_exist_ok=True)
+                self.plan_cache.pin_providers(template)
+                with exclusive(self.plugin_cache_dir / ".init.lock"):
+                    return_code, stdout, stderr = Terraform(working_dir=str(template)).init(capture_output=True)
+                if return_code != 0:
+                    raise WorkspaceError(f"Terraform init failed: {stderr}")
+                self.plan_cache.record_providers(template)
+                self._template = template
+            return self._template
+
+    def _checkout(self) -> Workspace:
+        template = self.prepare()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+            workspace_dir = self.root_dir / f"workspace-{self._created}"
+        shutil.copytree(template, workspace_dir, symlinks=True)
+        return workspace_dir, Terraform(working_dir=str(workspace_dir))
+
+    @contextmanager
+    def acquire(self, tfvars: Optional[str] = None) -> Iterator[Workspace]:
+        """Hand out a clean (directory, Terraform) workspace, with tfvars written if given"""
+        workspace = self._checkout()
+        try:
+            reset_workspace(workspace[0], tfvars)
+            yield workspace
+        finally:
+            with self._lock:
+                self._idle.append(workspace)
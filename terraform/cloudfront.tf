@@ -50,6 +50,12 @@ resource "aws_cloudfront_distribution" "main" {
 
     # Attach security headers policy
     response_headers_policy_id = aws_cloudfront_response_headers_policy.security_headers.id
+
+    # Serve precompressed Brotli/gzip variants uploaded by the deploy pipeline
+    function_association {
+      event_type   = "viewer-request"
+      function_arn = aws_cloudfront_function.precompressed_assets.arn
+    }
   }
 
   # Ordered cache behavior for API requests (conditional)
@@ -112,6 +118,15 @@ resource "aws_cloudfront_distribution" "main" {
   ]
 }
 
+# CloudFront Function routing requests to precompressed .br/.gz objects
+resource "aws_cloudfront_function" "precompressed_assets" {
+  name    = "${local.name_prefix}-precompressed-assets"
+  runtime = "cloudfront-js-2.0"
+  comment = "Serve precompressed Brotli/gzip variants for ${local.name_prefix}"
+  publish = true
+  code    = file("${path.module}/functions/precompressed-assets.js")
+}
+
 # CloudFront response headers policy for security headers
 resource "aws_cloudfront_response_headers_policy" "security_headers" {
   name    = "${local.name_prefix}-security-headers"
@@ -138,5 +153,14 @@ resource "aws_cloudfront_response_headers_policy" "security_headers" {
       override        = false
     }
   }
+
+  # Precompressed variants are selected by Accept-Encoding
+  custom_headers_config {
+    items {
+      header   = "Vary"
+      value    = "Accept-Encoding"
+      override = false
+    }
+  }
 }
 
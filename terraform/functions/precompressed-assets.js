@@ -0,0 +1,37 @@
+// CloudFront Function (viewer-request)
+// Serves the precompressed .br/.gz variants uploaded by
+// deployment/scripts/precompress.py. The extension list must match
+// ELIGIBLE_EXTENSIONS in that module.
+
+var ELIGIBLE = /\.(html|js|css|svg|json|txt|map|xml)$/;
+
+function accepts(header, encoding) {
+  return header.split(',').some(function (part) {
+    var fields = part.trim().split(';');
+    if (fields[0].trim().toLowerCase() !== encoding) {
+      return false;
+    }
+    // Honour an explicit "q=0" refusal
+    return !fields.slice(1).some(function (param) {
+      return /^\s*q=0(\.0*)?\s*$/.test(param);
+    });
+  });
+}
+
+function handler(event) {
+  var request = event.request;
+  var uri = request.uri === '/' ? '/index.html' : request.uri;
+  var header = request.headers['accept-encoding'];
+
+  if (!header || !ELIGIBLE.test(uri)) {
+    return request;
+  }
+
+  if (accepts(header.value, 'br')) {
+    request.uri = uri + '.br';
+  } else if (accepts(header.value, 'gzip')) {
+    request.uri = uri + '.gz';
+  }
+
+  return request;
+}
@@ -103,6 +103,11 @@ resource "aws_s3_bucket_lifecycle_configuration" "frontend" {
       noncurrent_days = 30
     }
 
+    # Remove delete markers left once pruned releases have expired
+    expiration {
+      expired_object_delete_marker = true
+    }
+
     # Delete incomplete multipart uploads after 7 days
     abort_incomplete_multipart_upload {
       days_after_initiation = 7